@@ -0,0 +1,57 @@
+"""Headless driver for ChatHandler implementations (no Tk window needed)."""
+import threading
+import time
+from typing import List, Optional
+
+class HeadlessDriver:
+    """Sends messages through a ChatHandler and collects replies via its callbacks"""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.replies: List[str] = []
+        self.chunk_times: List[float] = []
+        self._sent_at: Optional[float] = None
+        self._first_chunk: Optional[float] = None
+        self._done = threading.Condition()
+        handler.set_response_callback(self._on_response)
+        handler.set_chunk_callback(self._on_chunk)
+
+    def _on_chunk(self, chunk: str, tab: int = None) -> None:
+        now = time.perf_counter()
+        if self._first_chunk is None:
+            self._first_chunk = now
+        self.chunk_times.append(now)
+
+    def _on_response(self, reply: str, tab: int = None) -> None:
+        with self._done:
+            self.replies.append(reply)
+            self._done.notify_all()
+
+    def wait_for(self, count: int, timeout: float = 30.0) -> None:
+        """Block until `count` replies have arrived in total"""
+        deadline = time.monotonic() + timeout
+        with self._done:
+            while len(self.replies) < count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"only {len(self.replies)}/{count} replies after {timeout}s")
+                self._done.wait(remaining)
+
+    def send(self, message: str, timeout: float = 30.0) -> float:
+        """Send one message and wait for its reply; returns time to first chunk (or to the reply)"""
+        expected = len(self.replies) + 1
+        self._first_chunk = None
+        self._sent_at = time.perf_counter()
+        self.handler.send_message(message)
+        self.wait_for(expected, timeout)
+        first = self._first_chunk or time.perf_counter()
+        return first - self._sent_at
+
+    def burst(self, messages: List[str], timeout: float = 60.0) -> float:
+        """Send all messages at once and wait for every reply; returns total seconds"""
+        expected = len(self.replies) + len(messages)
+        started = time.perf_counter()
+        for message in messages:
+            self.handler.send_message(message)
+        self.wait_for(expected, timeout)
+        return time.perf_counter() - started
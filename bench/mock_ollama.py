@@ -0,0 +1,320 @@
+"""Stand-in Ollama server for benchmarks.
+
+Implements the parts of the Ollama HTTP API Jay uses (/api/chat, /api/generate,
+/api/tags, /api/ps, /api/show, /api/embed) with configurable first-token
+latency, token rate and model load time, plus the OpenAI-compatible
+/v1/models and /v1/chat/completions endpoints of llama.cpp-style servers.
+Replies echo the prompt. When tools are offered, a user message containing
+`name({...})` for an offered tool gets that call back instead.
+
+    python bench/mock_ollama.py --port 11435 --latency 0.2 --token-rate 40
+"""
+import argparse
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+DEFAULT_MODELS = ["mock-small:latest", "mock-large:latest"]
+EMBEDDING_DIM = 64
+TOOL_CALL = re.compile(r"(\w+)\((\{.*?\})\)")
+
+class MockOllamaServer:
+    """Mock Ollama daemon running in a background thread"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, models: Optional[List[str]] = None,
+                 latency: float = 0.05, token_rate: float = 200.0, reply_tokens: int = 20,
+                 load_time: float = 0.0):
+        self.models = models or list(DEFAULT_MODELS)
+        self.latency = latency
+        self.token_rate = token_rate
+        self.reply_tokens = reply_tokens
+        self.load_time = load_time
+        self.loaded: Dict[str, float] = {}  # model -> load timestamp
+        self.requests: List[str] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def address(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"{host}:{port}"
+
+    def start(self) -> "MockOllamaServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "MockOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _load(self, model: str, keep_alive: Any) -> float:
+        """Mark model loaded (or unloaded for keep_alive=0); returns load duration in seconds"""
+        with self._lock:
+            if keep_alive in (0, "0", "0s"):
+                self.loaded.pop(model, None)
+                return 0.0
+            if model in self.loaded:
+                return 0.0
+            self.loaded[model] = time.time()
+        time.sleep(self.load_time)
+        return self.load_time
+
+    def _reply_tokens(self, prompt: str, limit: Optional[int]) -> List[str]:
+        words = ("echo: " + prompt).split() or ["echo:"]
+        count = self.reply_tokens if limit is None or limit < 0 else min(limit, self.reply_tokens)
+        return [(" " if i else "") + words[i % len(words)] for i in range(count)]
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def _send_json(self, payload: Any, status: int = 200) -> None:
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _start_stream(self) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+            def _write_chunk(self, payload: Any) -> None:
+                data = (json.dumps(payload) + "\n").encode()
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+            def _end_stream(self) -> None:
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+            def do_GET(self) -> None:
+                server.requests.append(f"GET {self.path}")
+                if self.path == "/api/tags":
+                    self._send_json({"models": [_model_entry(m) for m in server.models]})
+                elif self.path == "/api/ps":
+                    with server._lock:
+                        loaded = list(server.loaded)
+                    self._send_json({"models": [_model_entry(m) for m in loaded]})
+                elif self.path == "/api/version":
+                    self._send_json({"version": "0.0.0-mock"})
+                elif self.path == "/v1/models":
+                    self._send_json({"object": "list", "data": [
+                        {"id": m, "object": "model", "owned_by": "mock", "meta": {"n_ctx_train": 8192}}
+                        for m in server.models
+                    ]})
+                else:
+                    self._send_json({"error": "not found"}, 404)
+
+            def do_POST(self) -> None:
+                server.requests.append(f"POST {self.path}")
+                length = int(self.headers.get("Content-Length") or 0)
+                request = json.loads(self.rfile.read(length) or b"{}")
+                model = request.get("model", "")
+                if self.path in ("/api/chat", "/api/generate", "/api/show", "/api/embed",
+                                 "/v1/chat/completions") and model not in server.models:
+                    self._send_json({"error": f"model '{model}' not found"}, 404)
+                elif self.path == "/v1/chat/completions":
+                    self._completion(request)
+                elif self.path == "/api/chat":
+                    self._generate(request, chat=True)
+                elif self.path == "/api/generate":
+                    self._generate(request, chat=False)
+                elif self.path == "/api/show":
+                    self._send_json(_show_entry(model))
+                elif self.path == "/api/embed":
+                    inputs = request.get("input") or []
+                    inputs = [inputs] if isinstance(inputs, str) else inputs
+                    self._send_json({"model": model, "embeddings": [_embedding(text) for text in inputs]})
+                else:
+                    self._send_json({"error": "not found"}, 404)
+
+            def _generate(self, request: Dict[str, Any], chat: bool) -> None:
+                model = request["model"]
+                started = time.perf_counter()
+                load = server._load(model, request.get("keep_alive"))
+                messages = request.get("messages") or []
+                prompt = messages[-1]["content"] if chat and messages else request.get("prompt", "")
+
+                # Bare load/unload requests carry no prompt
+                if (chat and not messages) or (not chat and not prompt):
+                    reason = "unload" if request.get("keep_alive") in (0, "0", "0s") else "load"
+                    final = {"model": model, "done": True, "done_reason": reason}
+                    final.update({"message": {"role": "assistant", "content": ""}} if chat else {"response": ""})
+                    return self._send_json(final)
+
+                calls = _tool_calls(request, messages) if chat else []
+                options = request.get("options") or {}
+                tokens = [] if calls else server._reply_tokens(prompt, options.get("num_predict"))
+                prompt_tokens = sum(len(m.get("content") or "") for m in messages) // 4 if chat else len(prompt) // 4
+                time.sleep(server.latency)
+                prompt_eval = time.perf_counter() - started - load
+
+                def part(content: str, done: bool) -> Dict[str, Any]:
+                    payload = {"model": model, "created_at": "2024-01-01T00:00:00Z", "done": done}
+                    if chat:
+                        payload["message"] = {"role": "assistant", "content": content}
+                    else:
+                        payload["response"] = content
+                    return payload
+
+                def final(content: str) -> Dict[str, Any]:
+                    payload = part(content, True)
+                    if calls:
+                        payload["message"]["tool_calls"] = calls
+                    eval_duration = max(time.perf_counter() - started - load - prompt_eval, 1e-6)
+                    payload.update({
+                        "done_reason": "stop",
+                        "total_duration": int((time.perf_counter() - started) * 1e9),
+                        "load_duration": int(load * 1e9),
+                        "prompt_eval_count": prompt_tokens,
+                        "prompt_eval_duration": int(prompt_eval * 1e9),
+                        "eval_count": len(tokens),
+                        "eval_duration": int(eval_duration * 1e9),
+                    })
+                    return payload
+
+                delay = 1.0 / server.token_rate if server.token_rate > 0 else 0.0
+                if not request.get("stream", True):
+                    time.sleep(delay * len(tokens))
+                    return self._send_json(final("".join(tokens)))
+
+                self._start_stream()
+                try:
+                    for token in tokens:
+                        self._write_chunk(part(token, False))
+                        time.sleep(delay)
+                    self._write_chunk(final(""))
+                    self._end_stream()
+                except (BrokenPipeError, ConnectionResetError):
+                    # Client cancelled the stream
+                    pass
+
+            def _completion(self, request: Dict[str, Any]) -> None:
+                """OpenAI-style chat completion with usage and llama.cpp-style timings"""
+                started = time.perf_counter()
+                messages = request.get("messages") or []
+                prompt = _text(messages[-1]["content"]) if messages else ""
+                tokens = server._reply_tokens(prompt, request.get("max_tokens"))
+                prompt_tokens = sum(len(_text(m.get("content"))) for m in messages) // 4
+                time.sleep(server.latency)
+                prompt_ms = (time.perf_counter() - started) * 1000
+                delay = 1.0 / server.token_rate if server.token_rate > 0 else 0.0
+
+                def stats() -> Dict[str, Any]:
+                    predicted_ms = max((time.perf_counter() - started) * 1000 - prompt_ms, 1e-3)
+                    return {
+                        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                                  "total_tokens": prompt_tokens + len(tokens)},
+                        "timings": {"prompt_n": prompt_tokens, "prompt_ms": prompt_ms,
+                                    "predicted_n": len(tokens), "predicted_ms": predicted_ms},
+                    }
+
+                base = {"id": "chatcmpl-mock", "created": int(time.time()), "model": request["model"]}
+                if not request.get("stream"):
+                    time.sleep(delay * len(tokens))
+                    message = {"role": "assistant", "content": "".join(tokens)}
+                    return self._send_json({**base, "object": "chat.completion", **stats(),
+                                            "choices": [{"index": 0, "message": message, "finish_reason": "stop"}]})
+
+                def event(payload: Dict[str, Any]) -> None:
+                    data = f"data: {json.dumps(payload)}\n\n".encode()
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                    self.wfile.flush()
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    chunk = {**base, "object": "chat.completion.chunk"}
+                    for token in tokens:
+                        event({**chunk, "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]})
+                        time.sleep(delay)
+                    event({**chunk, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+                    event({**chunk, "choices": [], **stats()})
+                    data = b"data: [DONE]\n\n"
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                    self._end_stream()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        return Handler
+
+def _text(content: Any) -> str:
+    """Text of a chat-completions message content (a string or a list of parts)"""
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if part.get("type") == "text")
+    return content or ""
+
+def _model_entry(name: str) -> Dict[str, Any]:
+    size = 2_000_000_000 if "large" in name else 500_000_000
+    return {
+        "name": name, "model": name, "size": size, "size_vram": 0,
+        "digest": hashlib.sha256(name.encode()).hexdigest(),
+        "modified_at": "2024-01-01T00:00:00Z",
+        "details": {"format": "gguf", "family": "mock", "parameter_size": "7B" if "large" in name else "1B",
+                    "quantization_level": "Q4_K_M"},
+    }
+
+def _show_entry(name: str) -> Dict[str, Any]:
+    entry = _model_entry(name)
+    return {
+        "modelfile": f"FROM {name}", "parameters": "", "template": "{{ .Prompt }}",
+        "details": entry["details"], "model_info": {"mock.context_length": 8192},
+        "capabilities": ["completion", "tools"],
+    }
+
+def _tool_calls(request: Dict[str, Any], messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Calls of offered tools written as name({...}) in the last user message"""
+    names = {tool["function"]["name"] for tool in request.get("tools") or []}
+    if not names or not messages or messages[-1].get("role") != "user":
+        return []
+    return [{"function": {"name": name, "arguments": json.loads(arguments)}}
+            for name, arguments in TOOL_CALL.findall(messages[-1].get("content") or "") if name in names]
+
+def _embedding(text: str) -> List[float]:
+    """Deterministic unit vector derived from the text's words"""
+    vector = [0.0] * EMBEDDING_DIM
+    for word in text.lower().split():
+        digest = hashlib.md5(word.encode()).digest()
+        vector[digest[0] % EMBEDDING_DIM] += 1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock Ollama server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds before the first token")
+    parser.add_argument("--token-rate", type=float, default=200.0, help="tokens per second")
+    parser.add_argument("--reply-tokens", type=int, default=20)
+    parser.add_argument("--load-time", type=float, default=0.0, help="seconds to 'load' a cold model")
+    args = parser.parse_args()
+
+    mock = MockOllamaServer(args.host, args.port, latency=args.latency, token_rate=args.token_rate,
+                            reply_tokens=args.reply_tokens, load_time=args.load_time)
+    print(f"Mock Ollama listening on http://{mock.address}")
+    mock._server.serve_forever()
@@ -0,0 +1,257 @@
+"""Headless benchmark suite for Jay.
+
+Runs against the mock Ollama server (no daemon, no display needed) and compares
+results with a stored baseline:
+
+    python bench/run_benchmarks.py                    # run and compare with bench/baseline.json
+    python bench/run_benchmarks.py --update-baseline  # store this machine's results as the baseline
+
+Exits with status 1 when any benchmark regresses past the tolerance.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(os.path.dirname(BENCH_DIR), "src")
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, SRC_DIR)
+
+from mock_ollama import MockOllamaServer
+
+DEFAULT_TOLERANCE = 0.25
+ABSOLUTE_SLACK = 0.005  # seconds; differences below this are noise
+MODEL = "mock-small:latest"
+
+def bench_import() -> float:
+    """Fresh-process import time of the chat core (best of 3)"""
+    times = []
+    for _ in range(3):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import OllamaHandler"], cwd=SRC_DIR, check=True)
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+def bench_initialize() -> float:
+    """Handler initialize (model load request) plus model listing"""
+    from OllamaHandler import OllamaHandler
+    started = time.perf_counter()
+    handler = OllamaHandler(model=MODEL)
+    handler.initialize()
+    handler.get_available_models()
+    elapsed = time.perf_counter() - started
+    handler.dispatcher.shutdown()
+    return elapsed
+
+def _driver(stream: bool = True, backend: str = "ollama"):
+    from Backends import create_backend
+    from headless import HeadlessDriver
+    options = {"base_url": f"http://{os.environ['OLLAMA_HOST']}/v1"} if backend == "openai" else {}
+    handler = create_backend(backend, stream=stream, **options)
+    handler.model = MODEL
+    handler.initialize()
+    return handler, HeadlessDriver(handler)
+
+def bench_ttft(runs: int = 10, backend: str = "ollama") -> float:
+    """Median time to first streamed chunk"""
+    handler, driver = _driver(backend=backend)
+    values = [driver.send(f"hello number {i}") for i in range(runs)]
+    handler.dispatcher.shutdown()
+    return statistics.median(values)
+
+def bench_burst(count: int = 20) -> float:
+    """Total time to answer a burst of messages sent at once (checks reply order)"""
+    handler, driver = _driver()
+    messages = [f"burst {i}" for i in range(count)]
+    elapsed = driver.burst(messages)
+    expected = [f"echo: {m}" for m in messages]
+    if [r[:len(e)] for r, e in zip(driver.replies, expected)] != expected:
+        raise AssertionError("burst replies arrived out of order")
+    handler.dispatcher.shutdown()
+    return elapsed
+
+def bench_tool_round_trip(runs: int = 5) -> float:
+    """Median reply time of a message that makes the model call two tools (two requests per turn)"""
+    from Tools import ToolRegistry, default_tools
+    handler, driver = _driver()
+    tools = ToolRegistry(default_tools())
+    handler.set_tools(tools)
+    values = []
+    for i in range(runs):
+        started = time.perf_counter()
+        driver.send(f'calculate({{"expression": "6 * {i}"}}) at current_time({{"timezone": "Asia/Tokyo"}})')
+        values.append(time.perf_counter() - started)
+    # The mock echoes the last tool result, not the message
+    if "calculate(" in driver.replies[-1]:
+        raise AssertionError(f"tools were not called: {driver.replies[-1]!r}")
+    handler.dispatcher.shutdown()
+    tools.shutdown()
+    return statistics.median(values)
+
+def bench_cli_round_trip(runs: int = 3) -> float:
+    """One `cli.py --prompt` process answered by a running daemon (best of runs)"""
+    check = "import sys, cli, OllamaHandler; sys.exit(bool({'tkinter', 'PIL'} & set(sys.modules)))"
+    if subprocess.run([sys.executable, "-c", check], cwd=SRC_DIR).returncode:
+        raise RuntimeError("the headless entry point imports tkinter or PIL")
+    with tempfile.TemporaryDirectory() as home:
+        env = {**os.environ, "XDG_DATA_HOME": home, "XDG_CONFIG_HOME": home, "XDG_RUNTIME_DIR": home}
+        cli = os.path.join(SRC_DIR, "cli.py")
+        socket_path = os.path.join(home, "jay", "jay.sock")
+        daemon = subprocess.Popen([sys.executable, cli, "--serve", "--model", MODEL], env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            deadline = time.monotonic() + 10
+            while not os.path.exists(socket_path):
+                if time.monotonic() > deadline or daemon.poll() is not None:
+                    raise RuntimeError("the CLI daemon did not start")
+                time.sleep(0.02)
+            times = []
+            for _ in range(runs):
+                started = time.perf_counter()
+                subprocess.run([sys.executable, cli, "--prompt", "hello"], env=env, check=True,
+                               stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
+                times.append(time.perf_counter() - started)
+        finally:
+            daemon.terminate()
+            daemon.wait()
+    return min(times)
+
+def bench_build_prompt(turns: int) -> float:
+    """Time to trim a history of `turns` turns to the context budget"""
+    from ContextManager import ContextWindowManager
+    context = ContextWindowManager(lambda summary, messages: summary)
+    history = [{"role": "system", "content": "system prompt " * 20}]
+    for i in range(turns):
+        history.append({"role": "user", "content": f"question {i} " * 10})
+        history.append({"role": "assistant", "content": f"answer {i} " * 40})
+    started = time.perf_counter()
+    for _ in range(10):
+        context.build_prompt(history)
+    return (time.perf_counter() - started) / 10
+
+def bench_send_with_history(turns: int = 1000, runs: int = 5) -> float:
+    """Median round trip of one message on top of a long history"""
+    handler, driver = _driver(stream=False)
+    for i in range(turns):
+        handler.messages.append({"role": "user", "content": f"question {i} " * 10})
+        handler.messages.append({"role": "assistant", "content": f"answer {i} " * 40})
+    values = []
+    for i in range(runs):
+        started = time.perf_counter()
+        driver.send(f"one more question {i}")
+        values.append(time.perf_counter() - started)
+    handler.dispatcher.shutdown()
+    return statistics.median(values)
+
+def bench_memory_search(rows: int = 100_000, dim: int = 768) -> float:
+    """Median top-k lookup in a memory-mapped vector index of `rows` turns"""
+    import numpy as np
+    from LongTermMemory import VectorIndex
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as path:
+        index = VectorIndex(path)
+        index.reset("bench", dim)
+        for start in range(0, rows, 10_000):
+            index.append(rng.standard_normal((10_000, dim), dtype=np.float32), list(range(start, start + 10_000)))
+        index = VectorIndex(path)  # reopen: search the memory-mapped files
+        query = rng.standard_normal(dim, dtype=np.float32)
+        index.search(query, 3)
+        values = []
+        for _ in range(20):
+            started = time.perf_counter()
+            index.search(query, 3)
+            values.append(time.perf_counter() - started)
+    return statistics.median(values)
+
+def bench_transcript(messages: int = 500) -> Optional[float]:
+    """Time to append messages to the transcript widget (needs a display)"""
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception:
+        return None
+    from TranscriptView import TranscriptView
+    root.withdraw()
+    view = TranscriptView(root, font=("Arial", 11), max_lines=1000)
+    started = time.perf_counter()
+    for i in range(messages):
+        view.add("user" if i % 2 == 0 else "assistant", f"message {i}\n" + "lorem ipsum " * 30)
+        root.update_idletasks()
+    elapsed = time.perf_counter() - started
+    root.destroy()
+    return elapsed
+
+BENCHMARKS: Dict[str, Callable[[], Optional[float]]] = {
+    "startup_import": bench_import,
+    "startup_initialize": bench_initialize,
+    "ttft_median": bench_ttft,
+    "ttft_median_openai": lambda: bench_ttft(backend="openai"),
+    "burst_20": bench_burst,
+    "tool_round_trip": bench_tool_round_trip,
+    "cli_round_trip": bench_cli_round_trip,
+    "build_prompt_100_turns": lambda: bench_build_prompt(100),
+    "build_prompt_5000_turns": lambda: bench_build_prompt(5000),
+    "send_with_1000_turns": bench_send_with_history,
+    "memory_search_100k": bench_memory_search,
+    "transcript_render_500": bench_transcript,
+}
+
+def compare(results: Dict[str, Optional[float]], baseline: Dict[str, float], tolerance: float) -> bool:
+    """Print results next to the baseline; returns True if anything regressed"""
+    regressed = False
+    print(f"{'benchmark':<26} {'result':>10} {'baseline':>10} {'change':>8}")
+    for name, value in results.items():
+        if value is None:
+            print(f"{name:<26} {'skipped':>10}")
+            continue
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<26} {value * 1000:>8.1f}ms {'-':>10}")
+            continue
+        change = (value - base) / base if base else 0.0
+        flag = ""
+        if value > base * (1 + tolerance) and value - base > ABSOLUTE_SLACK:
+            flag = "  REGRESSION"
+            regressed = True
+        print(f"{name:<26} {value * 1000:>8.1f}ms {base * 1000:>8.1f}ms {change:>+7.0%}{flag}")
+    return regressed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run Jay's headless benchmarks")
+    parser.add_argument("--update-baseline", action="store_true", help="store results as the new baseline")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed relative slowdown")
+    parser.add_argument("--latency", type=float, default=0.05, help="mock first-token latency (s)")
+    parser.add_argument("--token-rate", type=float, default=200.0, help="mock tokens per second")
+    parser.add_argument("--only", nargs="*", help="run only these benchmarks")
+    args = parser.parse_args()
+
+    with MockOllamaServer(latency=args.latency, token_rate=args.token_rate) as mock:
+        # The ollama module reads OLLAMA_HOST when first imported
+        os.environ["OLLAMA_HOST"] = mock.address
+        results = {}
+        for name, bench in BENCHMARKS.items():
+            if args.only and name not in args.only:
+                continue
+            results[name] = bench()
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({k: v for k, v in results.items() if v is not None}, f, indent=4)
+        print(f"Baseline written to {args.baseline}")
+        compare(results, {}, args.tolerance)
+        sys.exit(0)
+
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        baseline = {}
+    sys.exit(1 if compare(results, baseline, args.tolerance) else 0)
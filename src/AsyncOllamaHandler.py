@@ -0,0 +1,307 @@
+import asyncio
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+import ollama
+from OllamaHandler import OllamaHandler, PREFILL_OPTIONS
+from ChatSession import ChatSession
+from Dispatcher import FairQueue
+from ModelOptions import load_options
+from Metrics import TurnMetrics
+from Tools import as_call
+
+DEFAULT_TIMEOUT = 120.0
+CONNECT_TIMEOUT = 5.0
+MAX_CONNECTIONS = 8
+
+class AsyncOllamaHandler(OllamaHandler):
+    """Ollama chat handler driven by one asyncio loop in a single background thread.
+
+    Every request goes through one ollama.AsyncClient, so the HTTP connection pool
+    to the server stays open between turns. Chat turns run one at a time, taking
+    turns across sessions (FIFO within a session), while metadata calls (list,
+    show, ps) run concurrently.
+    """
+
+    def __init__(self, model: Optional[str] = None, name: Optional[str] = None, stream: bool = True,
+                 host: Optional[str] = None, timeout: float = DEFAULT_TIMEOUT):
+        super().__init__(model, name, stream)
+        self.host = host
+        self.timeout = timeout
+        # Loads and unloads are rare; the residency manager uses its own blocking client
+        self.residency.client = ollama.Client(host=host)
+        self.catalog_client = self.residency.client
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._client = None
+        self._busy = False  # a chat turn is running
+        self._waiters = FairQueue()  # futures of turns waiting for their go, per session
+        self._current = None  # (task, session key) of the running turn
+        self._tasks = {}  # task -> session key
+        self._depth_callback = None
+        self._ready = asyncio.Event()
+        self._ready.set()
+
+    def initialize(self) -> None:
+        """Start the event loop and load the model"""
+        self._thread.start()
+        self._call(self._open_client())
+        if self.model:
+            # Load model into memory
+            self.residency.activate(self.model, wait=True)
+        self.upsert_system_prompt()
+
+    def cleanup(self) -> None:
+        """Cancel pending work, unload models and stop the loop"""
+        self._cancel_tasks(None)
+        self.cancel_prefill()
+        if self.response_cache:
+            self.response_cache.save()
+        self.residency.shutdown()
+        try:
+            self._call(self._client._client.aclose(), timeout=CONNECT_TIMEOUT)
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    async def _open_client(self) -> None:
+        self._client = ollama.AsyncClient(
+            host=self.host,
+            timeout=httpx.Timeout(self.timeout, connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS),
+        )
+
+    def _call(self, coro, timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout or self.timeout)
+
+    def get_available_models(self) -> List[str]:
+        """Get list of installed Ollama models"""
+        try:
+            models_data = self._call(self._client.list())
+            return sorted([m["model"] for m in models_data["models"]], key=str.lower)
+        except Exception as e:
+            raise Exception(f"Failed to get Ollama models: {e}")
+
+    def get_running_models(self) -> List[str]:
+        """Get models currently loaded in memory"""
+        return [m["model"] for m in self._call(self._client.ps())["models"]]
+
+    def get_model_details(self, models: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Fetch `show` metadata for several models concurrently"""
+        names = models or self.get_available_models()
+
+        async def show_all():
+            results = await asyncio.gather(*(self._client.show(n) for n in names), return_exceptions=True)
+            return {n: r for n, r in zip(names, results) if not isinstance(r, Exception)}
+
+        return self._call(show_all())
+
+    def set_queue_callback(self, callback: Callable[[int], None]) -> None:
+        """Set callback receiving the number of pending requests"""
+        self._depth_callback = callback
+
+    def set_workers(self, workers: int) -> None:
+        """Turns are always served one at a time on the loop"""
+        pass
+
+    def hold(self) -> None:
+        """Queue messages without sending them (e.g. while the model warms up)"""
+        self._ready.clear()
+
+    def release(self) -> None:
+        """Start sending queued messages"""
+        if self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._ready.set)
+        else:
+            self._ready.set()
+
+    def pending_count(self) -> int:
+        """Number of queued and in-flight requests"""
+        return len(self._tasks)
+
+    def _notify_depth(self) -> None:
+        if self._depth_callback:
+            self._depth_callback(self.pending_count())
+
+    def send_message(self, message: str, attachments: Optional[List[Any]] = None) -> None:
+        """Queue message with optional Attachments; the reply arrives through the response callback"""
+        self.cancel_prefill()
+        # History only notes the attachments that could be read (see _build_prompt)
+        user_message = {"role": "user", "content": message}
+        session = self.session
+        with self._history_lock:
+            session.pending += 1
+        self._loop.call_soon_threadsafe(self._start_turn, user_message, session.generation, session, attachments)
+
+    def _start_turn(self, user_message: Dict[str, Any], generation: int, session: ChatSession,
+                    attachments: Optional[List[Any]] = None) -> None:
+        task = self._loop.create_task(self._turn(user_message, generation, session, attachments))
+        self._tasks[task] = session.key
+        task.add_done_callback(lambda t: self._tasks.pop(t, None))
+        self._notify_depth()
+
+    async def _acquire_turn(self, key: int) -> None:
+        """Wait until this session's turn comes up (round-robin across sessions)"""
+        if not self._busy and not len(self._waiters):
+            self._busy = True
+            return
+        waiter = self._loop.create_future()
+        self._waiters.put(key, waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # Cancelled right after being handed the turn: pass it on
+            if waiter.done() and not waiter.cancelled():
+                self._release_turn()
+            raise
+
+    def _release_turn(self) -> None:
+        while len(self._waiters):
+            waiter = self._waiters.pop()
+            if not waiter.done():
+                waiter.set_result(None)  # _busy stays set for the next turn
+                return
+        self._busy = False
+
+    async def _turn(self, user_message: Dict[str, Any], generation: int, session: ChatSession,
+                    attachments: Optional[List[Any]] = None) -> None:
+        parts = []
+        result, error, cancelled = None, None, False
+        turn = TurnMetrics(self.model, self.backend)
+        try:
+            await self._ready.wait()
+            await self._acquire_turn(session.key)
+            try:
+                self._current = (asyncio.current_task(), session.key)
+                turn.restart()
+                try:
+                    # Memory recall makes a blocking embedding request; attachments may still be loading
+                    prompt = await self._loop.run_in_executor(None, self._build_prompt, user_message, session,
+                                                              attachments)
+                    cache_key, result = self._cached_reply(prompt, session.key)
+                    if result is None:
+                        result, used_tools = await self._reply_async(prompt, parts, turn, session.key)
+                        turn.finish()
+                        if not used_tools:
+                            self._cache_reply(cache_key, result)
+                except asyncio.CancelledError:
+                    cancelled, result = True, "".join(parts)
+                except Exception as e:
+                    error = e
+                finally:
+                    self._current = None
+                self._complete_reply(user_message, generation, result, error, cancelled, turn, session)
+            finally:
+                self._release_turn()
+        except asyncio.CancelledError:
+            # Cancelled while still waiting in the queue
+            pass
+        finally:
+            self._tasks.pop(asyncio.current_task(), None)
+            self._session_done(session)
+            for attachment in attachments or []:
+                attachment.close()
+            self._notify_depth()
+
+    async def _reply_async(self, prompt: List[Dict[str, Any]], parts: List[str], turn: TurnMetrics,
+                           key: int) -> Tuple[str, bool]:
+        """Generate a reply, answering tool calls with one follow-up request (see OllamaHandler._reply)"""
+        calls = []
+        reply = await self._generate_async(prompt, parts, turn, key, calls)
+        if not calls:
+            return reply, False
+        # The tools run on their own pool; the loop keeps serving other sessions' chunks meanwhile
+        results = await self._loop.run_in_executor(None, self.tools.run, calls)
+        follow_up = prompt + [{"role": "assistant", "content": reply, "tool_calls": calls}] + results
+        return reply + await self._generate_async(follow_up, parts, turn, key), True
+
+    async def _generate_async(self, prompt: List[Dict[str, Any]], parts: List[str], turn: TurnMetrics,
+                              key: int, calls: Optional[List[Dict[str, Any]]] = None) -> str:
+        tools = self._tool_specs() if calls is not None else None
+        try:
+            if self.is_streaming():
+                return await self._stream_reply_async(prompt, parts, turn, key, tools, calls)
+            response = await self._client.chat(model=self.model, messages=prompt, keep_alive=self.residency.keep_alive,
+                                               options=self.options, tools=tools)
+        except ollama.ResponseError as e:
+            if not tools or "does not support tools" not in str(e):
+                raise
+            self._no_tool_models.add(self.model)
+            return await self._generate_async(prompt, parts, turn, key)
+        turn.first_token()
+        turn.apply_response(response)
+        if calls is not None:
+            calls.extend(as_call(call) for call in response['message'].get('tool_calls') or [])
+        return response['message']['content'] or ""
+
+    async def _stream_reply_async(self, prompt: List[Dict[str, Any]], parts: List[str], turn: TurnMetrics,
+                                  key: int, tools: Optional[List[Dict[str, Any]]] = None,
+                                  calls: Optional[List[Dict[str, Any]]] = None) -> str:
+        """Stream a reply, forwarding chunks as they arrive; returns the text of this request"""
+        start = len(parts)
+        stream = await self._client.chat(model=self.model, messages=prompt, keep_alive=self.residency.keep_alive,
+                                         options=self.options, tools=tools, stream=True)
+        try:
+            async for chunk in stream:
+                message = chunk['message']
+                self._add_chunk(parts, message['content'], turn, key)
+                if calls is not None:
+                    calls.extend(as_call(call) for call in message.get('tool_calls') or [])
+                turn.apply_response(chunk)
+        finally:
+            # Closing the stream drops the HTTP response so Ollama stops generating
+            await stream.aclose()
+        return "".join(parts[start:])
+
+    def cancel_current(self) -> bool:
+        """Stop the reply being generated for the active session"""
+        current = self._current
+        if current is None or current[1] != self.session.key:
+            return False
+        self._loop.call_soon_threadsafe(current[0].cancel)
+        return True
+
+    def cancel_all(self) -> None:
+        """Stop the active session's reply and drop its queued requests"""
+        self._cancel_tasks(self.session.key)
+
+    def close_session(self, key: int) -> None:
+        """Close a tab, dropping its pending requests (its history stays stored)"""
+        self._cancel_tasks(key)
+        super().close_session(key)
+
+    def _cancel_tasks(self, key: Optional[int]) -> None:
+        """Cancel the turns of one session (None: all sessions)"""
+        def cancel():
+            for task, task_key in list(self._tasks.items()):
+                if key is None or task_key == key:
+                    task.cancel()
+        if self._loop.is_running():
+            self._loop.call_soon_threadsafe(cancel)
+
+    def _prefill_loop(self) -> asyncio.AbstractEventLoop:
+        """Warm-ups run on the handler's own loop"""
+        return self._loop
+
+    async def _send_prefill(self, prompt: List[Dict[str, Any]], turn: TurnMetrics) -> None:
+        """Send the warm-up request over the shared connection pool"""
+        stream = await self._client.chat(model=self.model, messages=prompt, keep_alive=self.residency.keep_alive,
+                                         options={**load_options(self.options), **PREFILL_OPTIONS}, stream=True)
+        try:
+            async for chunk in stream:
+                turn.first_token()
+                turn.apply_response(chunk)
+        finally:
+            await stream.aclose()
+
+    def _summarize(self, summary: str, messages: List[Dict[str, Any]]) -> str:
+        """Fold messages into the running summary over the shared connection pool"""
+        async def summarize():
+            prompt = self._summary_prompt(summary, messages)
+            response = await self._client.chat(model=self.model, messages=prompt, keep_alive=self.residency.keep_alive,
+                                               options=load_options(self.options))
+            return response['message']['content'].strip()
+
+        return self._call(summarize())
@@ -0,0 +1,267 @@
+import io
+import math
+import mmap
+import os
+import re
+import threading
+from bisect import bisect_right
+from collections import Counter, defaultdict
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+CHUNK_BYTES = 2000  # about 500 tokens; chunks end at a line break where possible
+MMAP_THRESHOLD = 1 << 20  # larger files are memory-mapped instead of read
+MAX_IMAGE_SIDE = 1024
+MAX_QUERY_TERMS = 16
+MAX_TERM_HITS = 5000  # a term found more often is too common to rank by
+PASTE_LIMIT = 2000  # pasted text longer than this becomes an attachment
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".bmp"}
+STOP_WORDS = {
+    "about", "and", "are", "can", "does", "for", "from", "has", "have", "how", "into", "please", "show",
+    "tell", "that", "the", "there", "this", "was", "were", "what", "when", "where", "which", "who", "why", "with",
+    "you", "your",
+}
+
+def _size(size: int) -> str:
+    for unit in ("bytes", "KB", "MB"):
+        if size < 1024 or unit == "MB":
+            return f"{size} {unit}" if unit == "bytes" else f"{size:.1f} {unit}"
+        size /= 1024
+
+def with_note(message: str, names: Sequence[str]) -> str:
+    """Message text as shown and stored, listing the attached files"""
+    if not names:
+        return message
+    note = f"📎 {', '.join(names)}"
+    return f"{message}\n{note}" if message else note
+
+def loaded_names(attachments: Sequence["Attachment"]) -> List[str]:
+    """Names of the attachments that could be read (waits for the ones still being read)"""
+    for attachment in attachments:
+        attachment.wait()
+    return [a.name for a in attachments if not a.error]
+
+def query_terms(text: str) -> List[str]:
+    """Lowercase keywords of a question (short and common words dropped)"""
+    terms = []
+    for word in re.findall(r"[\w.\-/:]{3,}", text.lower()):
+        word = word.strip(".-/:")
+        if len(word) >= 3 and word not in STOP_WORDS and word not in terms:
+            terms.append(word)
+    return terms[:MAX_QUERY_TERMS]
+
+class Attachment:
+    """A file or pasted text attached to a message, loaded in the background.
+
+    Text (and text extracted from PDFs) is split into chunks of about
+    CHUNK_BYTES at line breaks; large files are memory-mapped and only the
+    chunk offsets are kept. Images are downscaled to MAX_IMAGE_SIDE and
+    re-encoded for `images=`. `excerpts` picks the chunks that match a
+    question, so a huge log adds only a bounded part of itself to the prompt.
+    """
+
+    def __init__(self, name: str, path: Optional[str] = None, text: Optional[str] = None):
+        self.name = name
+        self.path = path
+        self.kind = "image" if path and os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS else "text"
+        self.size = os.path.getsize(path) if path else len(text.encode("utf-8"))
+        self.image: Optional[bytes] = None
+        self.error: Optional[str] = None
+        self._text = text
+        self._data = None  # bytes or mmap of the text
+        self._file = None
+        self._starts: List[int] = []  # byte offset of each chunk
+        self._ready = threading.Event()
+
+    @classmethod
+    def from_path(cls, path: str) -> "Attachment":
+        return cls(os.path.basename(path), path=path)
+
+    @classmethod
+    def from_text(cls, text: str, name: str = "pasted text") -> "Attachment":
+        return cls(name, text=text)
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    @property
+    def label(self) -> str:
+        if self.error:
+            return f"{self.name} (failed: {self.error})"
+        if not self.ready:
+            return f"{self.name} (reading…)"
+        if self.kind == "image":
+            return f"{self.name} (image)"
+        return f"{self.name} ({_size(self.size)}, {len(self._starts)} parts)"
+
+    def start(self, on_ready: Optional[Callable[["Attachment"], None]] = None) -> "Attachment":
+        """Read and chunk (or downscale) in a background thread; on_ready is called from it"""
+        def run():
+            self.load()
+            if on_ready:
+                on_ready(self)
+        threading.Thread(target=run, daemon=True).start()
+        return self
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def load(self) -> "Attachment":
+        """Read and chunk (or downscale) now; a failure is kept in `error`"""
+        try:
+            self._load()
+        except Exception as e:
+            self.error = str(e) or type(e).__name__
+        finally:
+            self._ready.set()
+        return self
+
+    def _load(self) -> None:
+        if self.kind == "image":
+            self.image = self._load_image()
+            return
+        if self._text is not None:
+            self._data = self._text.encode("utf-8")
+            self._text = None
+        elif self.path.lower().endswith(".pdf"):
+            self._data = self._pdf_text().encode("utf-8")
+        elif self.size >= MMAP_THRESHOLD:
+            self._file = open(self.path, "rb")
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            with open(self.path, "rb") as f:
+                self._data = f.read()
+        if b"\0" in self._data[:8192]:
+            self.close()
+            raise ValueError("not a text file")
+        self._starts = self._chunk_starts(self._data)
+
+    @staticmethod
+    def _chunk_starts(data) -> List[int]:
+        starts = []
+        position, end_of_data = 0, len(data)
+        while position < end_of_data:
+            starts.append(position)
+            end = min(position + CHUNK_BYTES, end_of_data)
+            if end < end_of_data:
+                newline = data.rfind(b"\n", position, end)
+                if newline > position:
+                    end = newline + 1
+            position = end
+        return starts
+
+    def _pdf_text(self) -> str:
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            raise RuntimeError("reading PDFs needs pypdf (pip install pypdf)")
+        reader = PdfReader(self.path)
+        return "\n\n".join(f"[page {i + 1}]\n{page.extract_text() or ''}" for i, page in enumerate(reader.pages))
+
+    def _load_image(self) -> bytes:
+        # PIL is only needed (and imported) once an image is attached
+        from PIL import Image, ImageOps
+        with Image.open(self.path) as image:
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((MAX_IMAGE_SIDE, MAX_IMAGE_SIDE))
+            output = io.BytesIO()
+            if image.mode in ("RGBA", "LA", "P"):
+                image.save(output, "PNG", optimize=True)
+            else:
+                image.convert("RGB").save(output, "JPEG", quality=90)
+        return output.getvalue()
+
+    def _chunk(self, index: int) -> str:
+        end = self._starts[index + 1] if index + 1 < len(self._starts) else len(self._data)
+        return self._data[self._starts[index]:end].decode("utf-8", errors="replace")
+
+    def _occurrences(self, term: str) -> Iterator[int]:
+        """Offsets of term as written in lower, Capitalized or UPPER case"""
+        # bytes.find is a fast C scan; a case-insensitive regex over a large file is many times slower
+        for variant in dict.fromkeys((term, term.capitalize(), term.upper())):
+            needle = variant.encode("utf-8")
+            position = self._data.find(needle)
+            while position != -1:
+                yield position
+                position = self._data.find(needle, position + 1)
+
+    def _scores(self, terms: List[str]) -> Dict[int, float]:
+        """Chunk index -> tf-idf relevance to the query terms"""
+        counts: Dict[int, Counter] = defaultdict(Counter)
+        for term in terms:
+            hits, found = Counter(), 0
+            for position in self._occurrences(term):
+                hits[bisect_right(self._starts, position) - 1] += 1
+                found += 1
+                if found > MAX_TERM_HITS:
+                    break
+            else:
+                for chunk, n in hits.items():
+                    counts[chunk][term] = n
+        frequency = Counter(term for terms_found in counts.values() for term in terms_found)
+        total = len(self._starts)
+        return {
+            chunk: sum((1 + math.log(n)) * math.log(1 + total / frequency[term]) for term, n in found.items())
+            for chunk, found in counts.items()
+        }
+
+    def excerpts(self, question: str, max_chars: int) -> str:
+        """The text, or its chunks most relevant to the question that fit in max_chars"""
+        if self.error or not self._starts:
+            return ""
+        if len(self._data) <= max_chars:
+            return f"Attached file {self.name}:\n{self._chunk_text(range(len(self._starts)))}"
+
+        scores = self._scores(query_terms(question))
+        last = len(self._starts) - 1
+        if scores:
+            best = sorted(scores, key=lambda chunk: (-scores[chunk], chunk))
+            # Then the text around the best matches
+            ranked = best + [n for chunk in best for n in (chunk - 1, chunk + 1) if 0 <= n <= last]
+        else:
+            # Nothing matches: the start and the end (newest lines of a log)
+            ranked = [0] + list(range(last, 0, -1))
+        picked, used = set(), 0
+        for chunk in ranked:
+            end = self._starts[chunk + 1] if chunk < last else len(self._data)
+            if chunk in picked:
+                continue
+            if used + end - self._starts[chunk] > max_chars:
+                break
+            picked.add(chunk)
+            used += end - self._starts[chunk]
+        header = f"Attached file {self.name} ({_size(self.size)}; the {len(picked)} most relevant of {len(self._starts)} parts):"
+        return f"{header}\n{self._chunk_text(sorted(picked), marks=True)}"
+
+    def _chunk_text(self, chunks: Sequence[int], marks: bool = False) -> str:
+        if not marks:
+            return "".join(self._chunk(i) for i in chunks)
+        parts, line, position = [], 1, 0
+        for i in chunks:
+            # Slices of an mmap are bytes; consecutive slices read the file at most once
+            line += self._data[position:self._starts[i]].count(b"\n")
+            position = self._starts[i]
+            parts.append(f"--- line {line} ---\n{self._chunk(i).rstrip()}")
+        return "\n".join(parts)
+
+    def close(self) -> None:
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._data = None
+        if self._file:
+            self._file.close()
+            self._file = None
+
+def attachment_message(user_message: Dict[str, str], attachments: Sequence[Attachment],
+                       max_chars: int) -> Dict[str, object]:
+    """The user message as sent: relevant excerpts of attached text first, images in `images`"""
+    for attachment in attachments:
+        attachment.wait()
+    texts = [a for a in attachments if a.kind == "text" and not a.error]
+    images = [a.image for a in attachments if a.image]
+    share = max_chars // max(1, len(texts))
+    parts = [a.excerpts(user_message["content"], share) for a in texts]
+    message = {"role": "user", "content": "\n\n".join([p for p in parts if p] + [user_message["content"]])}
+    if images:
+        message["images"] = images
+    return message
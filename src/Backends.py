@@ -0,0 +1,40 @@
+from typing import Any, Callable, Dict, List
+from Handler import ChatHandler
+
+DEFAULT_BACKEND = "ollama"
+
+# name -> factory(**options) creating an uninitialized ChatHandler
+_BACKENDS: Dict[str, Callable[..., ChatHandler]] = {}
+
+def register_backend(name: str, factory: Callable[..., ChatHandler]) -> None:
+    """Make a chat backend selectable by name (config.json "backend" and settings)"""
+    _BACKENDS[name] = factory
+
+def backend_names() -> List[str]:
+    return sorted(_BACKENDS)
+
+def create_backend(name: str, **options: Any) -> ChatHandler:
+    """Create a backend with its options from config.json "backends" -> name"""
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown backend '{name}' (available: {', '.join(backend_names())})")
+    return _BACKENDS[name](**options)
+
+def _ollama(**options: Any) -> ChatHandler:
+    from OllamaHandler import OllamaHandler
+    return OllamaHandler(stream=options.get("stream", True))
+
+def _ollama_async(**options: Any) -> ChatHandler:
+    from AsyncOllamaHandler import AsyncOllamaHandler
+    return AsyncOllamaHandler(stream=options.get("stream", True), host=options.get("host"))
+
+def _openai(**options: Any) -> ChatHandler:
+    from OpenAIHandler import OpenAIHandler, DEFAULT_BASE_URL
+    return OpenAIHandler(
+        stream=options.get("stream", True),
+        base_url=options.get("base_url", DEFAULT_BASE_URL),
+        api_key=options.get("api_key")
+    )
+
+register_backend("ollama", _ollama)
+register_backend("ollama-async", _ollama_async)
+register_backend("openai", _openai)
@@ -0,0 +1,58 @@
+from typing import Any, Callable, Dict, List, Optional
+from ContextManager import ContextWindowManager, DEFAULT_BUDGET, DEFAULT_PINNED_TURNS
+
+MAX_SNAPSHOTS = 4  # models whose conversation a session remembers
+
+class ChatSession:
+    """Conversation state of one chat tab: history, rolling summary and system prompt.
+
+    A stored session whose tab is in the background and has no pending
+    request is swapped out: its messages and summary are dropped and reloaded
+    from the ConversationStore when the tab is shown again.
+    """
+
+    def __init__(self, key: int, summarize: Callable[[str, List[Dict[str, Any]]], str],
+                 budget: int = DEFAULT_BUDGET, pinned_turns: int = DEFAULT_PINNED_TURNS):
+        self.key = key  # tab id, also the dispatcher group
+        self.session_id: Optional[int] = None  # ConversationStore id once the first turn is saved
+        self.title: Optional[str] = None
+        self.system_prompt: Optional[str] = None  # None: the default prompt
+        self.messages: List[Dict[str, Any]] = []
+        self.context = ContextWindowManager(summarize, budget, pinned_turns)
+        self.generation = 0  # bumped when the history is cleared; stale replies are dropped
+        self.pending = 0  # queued and in-flight requests
+        self.loaded = True
+        self.snapshots: Dict[str, Dict[str, Any]] = {}  # model -> conversation left with that model
+
+    @property
+    def label(self) -> str:
+        return self.title or "New chat"
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Conversation state to pick up again later"""
+        return {
+            "session_id": self.session_id, "title": self.title, "system_prompt": self.system_prompt,
+            "messages": list(self.messages), "context": self.context.snapshot(),
+        }
+
+    def save_snapshot(self, model: str) -> None:
+        """Remember the conversation held with model (only the newest MAX_SNAPSHOTS models are kept)"""
+        self.snapshots.pop(model, None)
+        self.snapshots[model] = self.snapshot()
+        while len(self.snapshots) > MAX_SNAPSHOTS:
+            del self.snapshots[next(iter(self.snapshots))]
+
+    def restore(self, snapshot: Dict[str, Any]) -> None:
+        """Continue a conversation from `snapshot`, with the same messages and summary"""
+        self.session_id, self.title = snapshot["session_id"], snapshot["title"]
+        self.system_prompt = snapshot["system_prompt"]
+        self.messages = list(snapshot["messages"])
+        self.context.restore(snapshot["context"])
+        self.loaded = True
+
+    def swap_out(self) -> None:
+        """Drop in-memory history (the store keeps it) and model snapshots"""
+        self.messages = []
+        self.snapshots.clear()
+        self.context.reset()
+        self.loaded = False
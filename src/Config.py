@@ -0,0 +1,200 @@
+import copy
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, ConfigDict, Field, PositiveFloat, PositiveInt, ValidationError
+from Paths import config_dir
+
+CONFIG_NAME = "config.json"
+LEGACY_CONFIG_FILE = "config.json"  # read from the working directory if there is no config yet
+SAVE_DELAY = 0.5  # seconds; saves within this window are written once
+WATCH_INTERVAL = 2.0
+
+class OptionProfile(BaseModel):
+    """Ollama options of one model (None: server default). Other Ollama options are passed through."""
+
+    model_config = ConfigDict(extra="allow")
+
+    num_ctx: Optional[int] = Field(None, gt=0)
+    num_thread: Optional[int] = Field(None, gt=0)
+    num_batch: Optional[int] = Field(None, gt=0)
+    num_gpu: Optional[int] = Field(None, ge=0)  # 0: CPU only
+    num_predict: Optional[int] = Field(None, ge=-2)
+    temperature: Optional[float] = Field(None, ge=0)
+
+class AppConfig(BaseModel):
+    """Schema of config.json. Unknown keys are kept as they are."""
+
+    model_config = ConfigDict(extra="allow", validate_assignment=True)
+
+    backend: str = "ollama"
+    backends: Dict[str, Dict[str, Any]] = Field(default_factory=dict)
+    model: Optional[str] = None
+    model_options: Dict[str, OptionProfile] = Field(default_factory=dict)  # model (or "*") -> options
+    name: Optional[str] = None
+    fast_start: bool = True
+    workers: int = Field(1, ge=1)
+    context_budget: int = Field(3072, gt=0)
+    pinned_turns: int = Field(4, ge=0)
+    history_turns: int = Field(20, ge=0)
+    model_snapshots: bool = False  # switching back to a model continues its conversation
+    transcript_max_lines: int = Field(2000, gt=0)
+    window_position: Optional[Tuple[int, int]] = None  # character; None: bottom-right
+    chat_bubble_size: Tuple[PositiveInt, PositiveInt] = (750, 500)
+    chat_bubble_position: Optional[Tuple[int, int]] = None  # None: centered
+    open_sessions: List[int] = Field(default_factory=list)  # stored sessions open as tabs
+    active_session: Optional[int] = None
+    response_cache: bool = False
+    response_cache_size: int = Field(256, gt=0)
+    response_cache_ttl: Optional[float] = Field(24 * 60 * 60, ge=0)
+    metrics_log: Optional[str] = None
+    idle_timeout: Optional[float] = Field(30 * 60, ge=0)  # None keeps models loaded, 0 unloads after each reply
+    memory_budget_mb: Optional[int] = Field(None, gt=0)
+    prewarm: bool = True
+    recent_models: List[str] = Field(default_factory=list)
+    speculative_prefill: bool = False
+    prefill_pause_ms: int = Field(600, gt=0)
+    memory: bool = False
+    memory_model: str = "nomic-embed-text"
+    memory_top_k: int = Field(3, gt=0)
+    tools: bool = True  # the clock and the calculator
+    tool_paths: List[str] = Field(default_factory=list)  # folders the file tools may look into; empty: no file tools
+    tool_clipboard: bool = False  # let the model read the clipboard
+    tool_timeouts: Dict[str, PositiveFloat] = Field(default_factory=dict)  # tool name -> seconds
+
+def _drop_invalid(data: Dict[str, Any], loc: Tuple[Any, ...]) -> Optional[Tuple[str, Any]]:
+    """Remove the innermost object entry on an error path (a list or tuple goes as a whole).
+
+    Returns the dotted name and the value removed, e.g. ("model_options.a.num_ctx", -1),
+    or None if an earlier error already removed it.
+    """
+    container, path = data, [loc[0]]
+    for part in loc[1:]:
+        value = container.get(path[-1])
+        if not isinstance(value, dict) or part not in value:
+            break
+        container = value
+        path.append(part)
+    if path[-1] not in container:
+        return None
+    return ".".join(map(str, path)), container.pop(path[-1])
+
+def parse_config(data: Any) -> AppConfig:
+    """Validate raw config data; invalid settings are reported and fall back to their defaults"""
+    if not isinstance(data, dict):
+        print(f"Ignoring config: expected an object, got {type(data).__name__}")
+        return AppConfig()
+    # Only the invalid entry of a map (one option of one profile) is dropped, not the whole map
+    data = copy.deepcopy(data)
+    while True:
+        try:
+            return AppConfig.model_validate(data)
+        except ValidationError as e:
+            for error in e.errors():
+                if not error["loc"]:
+                    print(f"Ignoring config: {error['msg']}")
+                    return AppConfig()
+                dropped = _drop_invalid(data, error["loc"])
+                if dropped:
+                    print(f"Ignoring config value {dropped[0]}={dropped[1]!r}: {error['msg']}")
+
+class ConfigStore:
+    """Loads and saves AppConfig at $XDG_CONFIG_HOME/jay/config.json.
+
+    Saves are debounced and written on a background thread; each write goes
+    to a temporary file that is synced and renamed over the config, so a
+    crash leaves either the old or the new file. `watch` polls the file and
+    reports edits made outside the app.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(config_dir(), CONFIG_NAME)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._pending: Optional[Dict[str, Any]] = None
+        self._timer: Optional[threading.Timer] = None
+        self._mtime: Optional[int] = None
+        self._change_callback: Optional[Callable[[AppConfig], None]] = None
+        self._stop = threading.Event()
+
+    def _stat(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def load(self) -> AppConfig:
+        """Read the config (or the legacy ./config.json on first run)"""
+        self._mtime = self._stat()
+        data = self._read(self.path if os.path.exists(self.path) else LEGACY_CONFIG_FILE)
+        return AppConfig() if data is None else parse_config(data)
+
+    def _read(self, path: str) -> Optional[Any]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Failed to read {path}: {e}")
+            return None
+
+    def save(self, config: AppConfig) -> None:
+        """Write config shortly, in the background (later saves replace pending ones)"""
+        data = config.model_dump()
+        with self._lock:
+            self._pending = data
+            if self._timer:
+                self._timer.cancel()
+            self._timer = threading.Timer(SAVE_DELAY, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self) -> None:
+        """Write a pending save now"""
+        with self._lock:
+            data, self._pending = self._pending, None
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+        if data is not None:
+            self._write(data)
+
+    def _write(self, data: Dict[str, Any]) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with self._write_lock:
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f, indent=4)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+                self._mtime = self._stat()
+            except OSError as e:
+                print(f"Failed to save config: {e}")
+
+    def set_change_callback(self, callback: Callable[[AppConfig], None]) -> None:
+        """Set callback receiving the new config after the file was edited (called from thread)"""
+        self._change_callback = callback
+
+    def watch(self, interval: float = WATCH_INTERVAL) -> None:
+        """Poll the file for outside edits until `close`"""
+        def poll():
+            while not self._stop.wait(interval):
+                mtime = self._stat()
+                with self._write_lock:
+                    if mtime is None or mtime == self._mtime:
+                        continue
+                    self._mtime = mtime
+                data = self._read(self.path)
+                # A half-written or broken file is skipped; the next edit is picked up again
+                if data is not None and self._change_callback:
+                    self._change_callback(parse_config(data))
+        threading.Thread(target=poll, daemon=True).start()
+
+    def close(self) -> None:
+        """Stop watching and write any pending save"""
+        self._stop.set()
+        self.flush()
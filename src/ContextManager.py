@@ -0,0 +1,118 @@
+import threading
+from typing import Any, Callable, Dict, List, Tuple
+
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+DEFAULT_BUDGET = 3072  # leaves room for the reply in a 4096-token num_ctx
+DEFAULT_PINNED_TURNS = 4
+SUMMARY_TRIGGER = 0.75  # start folding once unsummarized history fills this share of the budget
+
+def estimate_tokens(message: Dict[str, Any]) -> int:
+    """Rough token count of a chat message (~4 characters per token)"""
+    content = message.get("content") or ""
+    return MESSAGE_OVERHEAD_TOKENS + (len(content) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+class ContextWindowManager:
+    """Keeps prompts under a token budget by folding older turns into a rolling summary.
+
+    The leading system messages are always kept, the most recent turns are pinned,
+    and whatever no longer fits is represented by a cached summary. Summaries are
+    produced on a background thread; the reply path only reads the cached one.
+    """
+
+    def __init__(
+        self,
+        summarize: Callable[[str, List[Dict[str, Any]]], str],
+        budget: int = DEFAULT_BUDGET,
+        pinned_turns: int = DEFAULT_PINNED_TURNS,
+    ):
+        self.summarize = summarize
+        self.budget = budget
+        self.pinned_turns = pinned_turns
+        self.summary = ""
+        self._covered = 0  # number of history messages folded into the summary
+        self._generation = 0
+        self._summarizing = False
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        """Drop the summary (history was cleared or replaced)"""
+        with self._lock:
+            self.summary = ""
+            self._covered = 0
+            self._generation += 1
+            self._summarizing = False
+
+    def snapshot(self) -> Tuple[str, int]:
+        """The summary and the number of history messages it covers"""
+        with self._lock:
+            return self.summary, self._covered
+
+    def restore(self, state: Tuple[str, int]) -> None:
+        """Continue from a snapshot of the same history"""
+        with self._lock:
+            self.summary, self._covered = state
+            self._generation += 1
+            self._summarizing = False
+
+    def summary_message(self, summary: str) -> Dict[str, str]:
+        return {"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"}
+
+    def build_prompt(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Return the messages to send, trimmed to the budget"""
+        split = 0
+        while split < len(messages) and messages[split].get("role") == "system":
+            split += 1
+        system, history = messages[:split], messages[split:]
+
+        with self._lock:
+            summary = self.summary
+            covered = min(self._covered, len(history))
+
+        prefix = list(system)
+        if summary:
+            prefix.append(self.summary_message(summary))
+        available = self.budget - sum(estimate_tokens(m) for m in prefix)
+
+        # Walk back from the newest message; pinned turns (plus a trailing user message) are always kept
+        pinned = 2 * self.pinned_turns + (1 if history and history[-1].get("role") == "user" else 0)
+        pinned_start = max(covered, len(history) - pinned)
+        start = len(history)
+        used = 0
+        for i in range(len(history) - 1, covered - 1, -1):
+            tokens = estimate_tokens(history[i])
+            if i < pinned_start and used + tokens > available:
+                break
+            used += tokens
+            start = i
+
+        unsummarized = sum(estimate_tokens(m) for m in history[covered:])
+        if pinned_start > covered and (start > covered or unsummarized > self.budget * SUMMARY_TRIGGER):
+            self._schedule_summary(history, covered, pinned_start)
+
+        return prefix + history[start:]
+
+    def _schedule_summary(self, history: List[Dict[str, Any]], start: int, end: int) -> None:
+        with self._lock:
+            if self._summarizing:
+                return
+            self._summarizing = True
+            generation = self._generation
+            previous = self.summary
+        chunk = list(history[start:end])
+
+        def run():
+            try:
+                summary = self.summarize(previous, chunk)
+            except Exception as e:
+                print(f"Summarization failed: {e}")
+                summary = None
+            with self._lock:
+                if generation != self._generation:
+                    return
+                self._summarizing = False
+                if summary:
+                    self.summary = summary
+                    self._covered = end
+
+        threading.Thread(target=run, daemon=True).start()
@@ -0,0 +1,162 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from Paths import data_dir
+
+SESSION_NAME_LENGTH = 40
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    model TEXT,
+    system_prompt TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_by_session ON messages(session_id, id);
+"""
+
+class ConversationStore:
+    """Append-only SQLite store (WAL mode) of chat sessions and their messages.
+
+    Turns are inserted as they complete, never rewritten, and reads page
+    backwards from the newest message so loading cost does not grow with history.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(data_dir(), "history.db")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self) -> None:
+        """Add columns introduced after a database was created"""
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(sessions)")}
+        if "system_prompt" not in columns:
+            self._conn.execute("ALTER TABLE sessions ADD COLUMN system_prompt TEXT")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def session_name(text: str) -> str:
+        """Session name derived from its first message (or a title typed by the user)"""
+        return " ".join(text.split())[:SESSION_NAME_LENGTH] or "New chat"
+
+    def create_session(self, name: str, model: Optional[str] = None, system_prompt: Optional[str] = None) -> int:
+        """Create a session and return its id"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO sessions (name, model, system_prompt, created, updated) VALUES (?, ?, ?, ?, ?)",
+                (self.session_name(name), model, system_prompt, now, now)
+            )
+            return cursor.lastrowid
+
+    def get_session(self, session_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, name, model, system_prompt, created, updated FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def rename_session(self, session_id: int, name: str) -> None:
+        with self._lock:
+            self._conn.execute("UPDATE sessions SET name = ? WHERE id = ?", (self.session_name(name), session_id))
+
+    def set_system_prompt(self, session_id: int, system_prompt: Optional[str]) -> None:
+        """Store a session's own system prompt (None: the default prompt)"""
+        with self._lock:
+            self._conn.execute("UPDATE sessions SET system_prompt = ? WHERE id = ?", (system_prompt, session_id))
+
+    def list_sessions(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recently updated sessions first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, name, model, created, updated FROM sessions ORDER BY updated DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def latest_session(self) -> Optional[int]:
+        sessions = self.list_sessions(limit=1)
+        return sessions[0]["id"] if sessions else None
+
+    def delete_session(self, session_id: int) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def append(self, session_id: int, messages: List[Dict[str, Any]]) -> None:
+        """Append messages to a session in one transaction"""
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._conn.executemany(
+                    "INSERT INTO messages (session_id, role, content, created) VALUES (?, ?, ?, ?)",
+                    [(session_id, m["role"], m["content"], now) for m in messages]
+                )
+                self._conn.execute("UPDATE sessions SET updated = ? WHERE id = ?", (now, session_id))
+
+    def turns_after(self, message_id: int, limit: int) -> List[Dict[str, Any]]:
+        """Up to `limit` user/assistant pairs whose user message id is above message_id, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, session_id, role, content FROM messages WHERE id > ? ORDER BY id LIMIT ?",
+                (message_id, 2 * limit + 1)
+            ).fetchall()
+        turns = []
+        for user, reply in zip(rows, rows[1:]):
+            if user["role"] == "user" and reply["role"] == "assistant" and user["session_id"] == reply["session_id"]:
+                turns.append({"id": user["id"], "session_id": user["session_id"],
+                              "user": user["content"], "assistant": reply["content"]})
+        return turns[:limit]
+
+    def get_turns(self, ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """User/assistant pairs by user message id (a turn is stored as two consecutive rows)"""
+        if not ids:
+            return {}
+        wanted = sorted(set(ids) | {i + 1 for i in ids})
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, session_id, role, content FROM messages WHERE id IN ({','.join('?' * len(wanted))})",
+                wanted
+            ).fetchall()
+        by_id = {row["id"]: row for row in rows}
+        turns = {}
+        for i in ids:
+            user, reply = by_id.get(i), by_id.get(i + 1)
+            if user and reply and reply["session_id"] == user["session_id"]:
+                turns[i] = {"id": i, "session_id": user["session_id"],
+                            "user": user["content"], "assistant": reply["content"]}
+        return turns
+
+    def load_recent(self, session_id: int, limit: int, before_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Newest `limit` messages (older than `before_id` if given), oldest first"""
+        query = "SELECT id, role, content, created FROM messages WHERE session_id = ?"
+        params = [session_id]
+        if before_id is not None:
+            query += " AND id < ?"
+            params.append(before_id)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [dict(row) for row in reversed(rows)]
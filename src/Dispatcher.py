@@ -0,0 +1,190 @@
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Callable, Hashable, List, Optional
+
+class FairQueue:
+    """FIFO queues per group, served round-robin (not thread-safe: callers lock).
+
+    A group with many queued items cannot starve the others: each pop takes
+    the head of the next group in turn.
+    """
+
+    def __init__(self):
+        self._groups: "OrderedDict[Hashable, deque]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return sum(len(items) for items in self._groups.values())
+
+    def put(self, group: Hashable, item: Any) -> None:
+        self._groups.setdefault(group, deque()).append(item)
+
+    def pop(self) -> Any:
+        """Head of the next group in turn (IndexError if empty)"""
+        if not self._groups:
+            raise IndexError("pop from an empty FairQueue")
+        group, items = next(iter(self._groups.items()))
+        item = items.popleft()
+        del self._groups[group]
+        if items:
+            self._groups[group] = items  # back of the line
+        return item
+
+    def items(self, group: Hashable = None) -> List[Any]:
+        if group is not None:
+            return list(self._groups.get(group, ()))
+        return [item for items in self._groups.values() for item in items]
+
+class Job:
+    """A unit of work queued on the dispatcher"""
+
+    def __init__(self, seq: int, run: Callable[[threading.Event], Any], on_done: Callable[["Job"], None],
+                 group: Hashable = None):
+        self.seq = seq  # submission order within the group
+        self.run = run
+        self.on_done = on_done
+        self.group = group
+        self.cancel_event = threading.Event()
+        self.result = None
+        self.error = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+class RequestDispatcher:
+    """Request queue served by a small pool of worker threads.
+
+    Jobs are grouped (e.g. per chat session) and groups take turns, so one
+    busy session cannot hold up the others; within a group jobs start in
+    submission order and their completion callbacks also run in submission
+    order, so history appends stay ordered with more than one worker.
+    Worker threads are started lazily on the first submit.
+    """
+
+    def __init__(self, workers: int = 1):
+        self.workers = max(1, workers)
+        self._queue = FairQueue()
+        self._threads = []
+        self._cond = threading.Condition()
+        self._next_seq = {}
+        self._next_done = {}
+        self._active = {}
+        self._stopping = 0  # workers asked to exit
+        self._depth_callback = None
+        self._ready = threading.Event()
+        self._ready.set()
+
+    def hold(self) -> None:
+        """Keep queued jobs waiting until release() is called"""
+        self._ready.clear()
+
+    def release(self) -> None:
+        """Let workers start on queued jobs"""
+        self._ready.set()
+
+    def set_workers(self, workers: int) -> None:
+        """Set pool size (takes effect for threads not yet started)"""
+        self.workers = max(1, workers)
+
+    def set_depth_callback(self, callback: Optional[Callable[[int], None]]) -> None:
+        """Set callback receiving the number of pending jobs whenever it changes"""
+        self._depth_callback = callback
+
+    def submit(self, run: Callable[[threading.Event], Any], on_done: Callable[[Job], None],
+               group: Hashable = None) -> Job:
+        """Queue a job; run(cancel_event) executes on a worker, on_done(job) after it in FIFO order of its group"""
+        with self._cond:
+            seq = self._next_seq.get(group, 0)
+            self._next_seq[group] = seq + 1
+            job = Job(seq, run, on_done, group)
+            self._queue.put(group, job)
+            self._ensure_workers()
+            self._cond.notify_all()
+        self._notify_depth()
+        return job
+
+    def pending_count(self, group: Hashable = None) -> int:
+        """Number of queued plus in-flight jobs (of one group, or all)"""
+        with self._cond:
+            if group is None:
+                return len(self._queue) + len(self._active)
+            return len(self._queue.items(group)) + sum(1 for job in self._active.values() if job.group == group)
+
+    def _jobs(self, group: Hashable = None, queued: bool = True) -> List[Job]:
+        with self._cond:
+            jobs = self._queue.items(group) if queued else []
+            jobs += [job for job in self._active.values() if group is None or job.group == group]
+        return jobs
+
+    def cancel_current(self, group: Hashable = None) -> bool:
+        """Cancel the in-flight job(s) (of one group); returns False if nothing was running"""
+        jobs = self._jobs(group, queued=False)
+        for job in jobs:
+            job.cancel_event.set()
+        return bool(jobs)
+
+    def cancel_all(self, group: Hashable = None) -> None:
+        """Cancel the in-flight job(s) and everything still queued (of one group, or all)"""
+        for job in self._jobs(group):
+            job.cancel_event.set()
+
+    def shutdown(self) -> None:
+        """Cancel all work and stop the worker threads"""
+        self.cancel_all()
+        self.release()
+        with self._cond:
+            self._stopping += len(self._threads)
+            self._threads = []
+            self._cond.notify_all()
+
+    def _ensure_workers(self) -> None:
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._worker, daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _notify_depth(self) -> None:
+        if self._depth_callback:
+            self._depth_callback(self.pending_count())
+
+    def _next_job(self) -> Optional[Job]:
+        """Wait for the next job in turn; None tells the worker to exit"""
+        with self._cond:
+            while True:
+                if self._stopping:
+                    self._stopping -= 1
+                    return None
+                if len(self._queue):
+                    job = self._queue.pop()
+                    self._active[(job.group, job.seq)] = job
+                    return job
+                self._cond.wait()
+
+    def _worker(self) -> None:
+        while True:
+            self._ready.wait()
+            job = self._next_job()
+            if job is None:
+                return
+            self._notify_depth()
+
+            if not job.cancelled:
+                try:
+                    job.result = job.run(job.cancel_event)
+                except Exception as e:
+                    job.error = e
+
+            # Complete strictly in submission order within the group
+            with self._cond:
+                while self._next_done.get(job.group, 0) != job.seq:
+                    self._cond.wait()
+            try:
+                job.on_done(job)
+            except Exception as e:
+                print(f"Dispatcher callback failed: {e}")
+            finally:
+                with self._cond:
+                    self._next_done[job.group] = job.seq + 1
+                    del self._active[(job.group, job.seq)]
+                    self._cond.notify_all()
+                self._notify_depth()
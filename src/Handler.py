@@ -18,7 +18,7 @@ class ChatHandler(Handler):
     """Abstract handler for chat functionality"""
     
     @abstractmethod
-    def send_message(self, message: str) -> str:
+    def send_message(self, message: str, attachments: Optional[list] = None) -> str:
         """Send message and get response"""
         pass
     
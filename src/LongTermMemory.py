@@ -0,0 +1,233 @@
+import json
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import ollama
+from Paths import data_dir
+
+DEFAULT_EMBED_MODEL = "nomic-embed-text"
+DEFAULT_TOP_K = 3
+DEFAULT_MIN_SCORE = 0.5
+BATCH_SIZE = 32
+RERANK_CANDIDATES = 256  # rows re-scored exactly after the binary pre-filter
+SNIPPET_CHARS = 400
+MEMORY_HEADER = "Notes from earlier conversations (use them only if relevant):"
+
+def ollama_embedder(model: str, host: Optional[str] = None) -> Callable[[List[str]], List[List[float]]]:
+    """Embedding function backed by Ollama's /api/embed"""
+    client = ollama.Client(host=host)
+
+    def embed(texts: List[str]) -> List[List[float]]:
+        return client.embed(model=model, input=texts)["embeddings"]
+    return embed
+
+class VectorIndex:
+    """Append-only on-disk vector index, memory-mapped for search.
+
+    Files in `path`: vectors.f32 (unit-length float32 rows), bits.u8 (packed
+    sign bits of each row), ids.i64 (one id per row) and meta.json. Search
+    ranks all rows by Hamming distance of the sign bits, then re-scores the
+    best candidates with exact cosine similarity, so a lookup touches about
+    dim/8 bytes per row instead of dim*4.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.model: Optional[str] = None
+        self.dim = 0
+        self.count = 0
+        self._vectors = None
+        self._bits = None
+        self._ids = None
+        self._lock = threading.Lock()
+        self._load()
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    @property
+    def _bit_bytes(self) -> int:
+        # Whole uint64 words per row so Hamming distances can use 64-bit popcounts
+        return (self.dim + 63) // 64 * 8
+
+    def _load(self) -> None:
+        try:
+            with open(self._file("meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        self.model, self.dim = meta["model"], meta["dim"]
+        # Rows are only complete once present in all three files (appends may be interrupted)
+        try:
+            self.count = min(
+                os.path.getsize(self._file("vectors.f32")) // (4 * self.dim),
+                os.path.getsize(self._file("bits.u8")) // self._bit_bytes,
+                os.path.getsize(self._file("ids.i64")) // 8,
+            )
+        except OSError:
+            self.count = 0
+        self._remap()
+
+    def _remap(self) -> None:
+        if not self.count:
+            self._vectors = self._bits = self._ids = None
+            return
+        self._vectors = np.memmap(self._file("vectors.f32"), dtype=np.float32, mode="r", shape=(self.count, self.dim))
+        self._bits = np.memmap(self._file("bits.u8"), dtype=np.uint8, mode="r",
+                               shape=(self.count, self._bit_bytes)).view(np.uint64)
+        self._ids = np.memmap(self._file("ids.i64"), dtype=np.int64, mode="r", shape=(self.count,))
+
+    def reset(self, model: str, dim: int) -> None:
+        """Drop all rows and start over for another embedding model"""
+        with self._lock:
+            self._vectors = self._bits = self._ids = None
+            for name in ("vectors.f32", "bits.u8", "ids.i64"):
+                # New empty files replace the old ones, whose mappings a running search may still read
+                # (truncating those in place would make it crash with SIGBUS)
+                tmp_path = self._file(name + ".tmp")
+                open(tmp_path, "wb").close()
+                os.replace(tmp_path, self._file(name))
+            self.model, self.dim, self.count = model, dim, 0
+            tmp_path = self._file("meta.json.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"model": model, "dim": dim}, f)
+            os.replace(tmp_path, self._file("meta.json"))
+
+    def last_id(self) -> int:
+        with self._lock:
+            return int(self._ids[-1]) if self.count else 0
+
+    def _sign_bits(self, vectors: np.ndarray) -> np.ndarray:
+        bits = np.packbits(vectors > 0, axis=1)
+        padded = np.zeros((len(vectors), self._bit_bytes), dtype=np.uint8)
+        padded[:, :bits.shape[1]] = bits
+        return padded
+
+    def append(self, vectors: np.ndarray, ids: List[int]) -> None:
+        """Append rows (normalized here) with their ids"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        with self._lock:
+            # Trim a partially written row left by an interrupted append
+            for name, row_bytes in (("vectors.f32", 4 * self.dim), ("bits.u8", self._bit_bytes), ("ids.i64", 8)):
+                with open(self._file(name), "ab") as f:
+                    f.truncate(self.count * row_bytes)
+            with open(self._file("vectors.f32"), "ab") as f:
+                f.write(vectors.tobytes())
+            with open(self._file("bits.u8"), "ab") as f:
+                f.write(self._sign_bits(vectors).tobytes())
+            with open(self._file("ids.i64"), "ab") as f:
+                f.write(np.asarray(ids, dtype=np.int64).tobytes())
+            self.count += len(vectors)
+            self._remap()
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        """(id, cosine similarity) of the k most similar rows, best first"""
+        with self._lock:
+            vectors, bits, ids, count = self._vectors, self._bits, self._ids, self.count
+        if not count:
+            return []
+        query = np.asarray(query, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+        if count > RERANK_CANDIDATES:
+            query_bits = self._sign_bits(query[None, :]).view(np.uint64)
+            # Per-word popcounts summed with a float32 matrix-vector product (BLAS beats an integer reduce)
+            words = np.bitwise_count(bits ^ query_bits)
+            distances = words.astype(np.float32) @ np.ones(words.shape[1], dtype=np.float32)
+            candidates = np.sort(np.argpartition(distances, RERANK_CANDIDATES)[:RERANK_CANDIDATES])
+        else:
+            candidates = np.arange(count)
+        scores = vectors[candidates] @ query
+
+        best = np.argsort(-scores)[:k]
+        return [(int(ids[candidates[row]]), float(scores[row])) for row in best]
+
+class LongTermMemory:
+    """Retrieval memory over past turns in a ConversationStore.
+
+    Stored turns are embedded in batches on a background thread (`schedule`
+    after each persisted turn, and once at start to catch up on older
+    history) and appended to a VectorIndex. `recall` embeds the new message
+    and returns the most similar earlier turns as short snippets.
+    """
+
+    def __init__(self, store, embed: Callable[[List[str]], List[List[float]]], model: str = DEFAULT_EMBED_MODEL,
+                 path: Optional[str] = None, top_k: int = DEFAULT_TOP_K, min_score: float = DEFAULT_MIN_SCORE):
+        self.store = store
+        self.embed = embed
+        self.model = model
+        self.top_k = top_k
+        self.min_score = min_score
+        self.index = VectorIndex(path or os.path.join(data_dir(), "memory"))
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._running = False
+        self._pending = False
+
+    def schedule(self) -> None:
+        """Embed stored turns that are not indexed yet (in the background)"""
+        with self._lock:
+            if self._running:
+                self._pending = True
+                return
+            self._running = True
+        threading.Thread(target=self._index_loop, daemon=True).start()
+
+    def _index_loop(self) -> None:
+        while True:
+            try:
+                while self._index_batch():
+                    pass
+                self.error = None
+            except Exception as e:
+                self.error = str(e)
+                print(f"Failed to update memory index: {e}")
+            with self._lock:
+                if not self._pending or self.error:
+                    self._running = self._pending = False
+                    return
+                self._pending = False
+
+    def _index_batch(self) -> bool:
+        """Embed one batch of new turns; returns whether there may be more"""
+        last_id = self.index.last_id() if self.index.model == self.model else 0
+        turns = self.store.turns_after(last_id, BATCH_SIZE)
+        if not turns:
+            return False
+        vectors = np.asarray(self.embed([self._snippet(t) for t in turns]), dtype=np.float32)
+        if self.index.model != self.model or self.index.dim != vectors.shape[1]:
+            self.index.reset(self.model, vectors.shape[1])
+        self.index.append(vectors, [t["id"] for t in turns])
+        return len(turns) == BATCH_SIZE
+
+    def recall(self, text: str, exclude_session: Optional[int] = None) -> List[str]:
+        """Snippets of the most relevant earlier turns (other sessions only)"""
+        if not text or not self.index.count or self.index.model != self.model:
+            return []
+        query = np.asarray(self.embed([text])[0], dtype=np.float32)
+        if len(query) != self.index.dim:
+            return []
+        # Over-fetch: some hits may belong to the current session or have been deleted
+        hits = [(i, score) for i, score in self.index.search(query, 3 * self.top_k) if score >= self.min_score]
+        turns = self.store.get_turns([i for i, _ in hits])
+        snippets = []
+        for i, _ in hits:
+            turn = turns.get(i)
+            if turn and turn["session_id"] != exclude_session:
+                snippets.append(self._snippet(turn))
+            if len(snippets) == self.top_k:
+                break
+        return snippets
+
+    def message(self, snippets: List[str]) -> Dict[str, str]:
+        """System message carrying recalled snippets"""
+        return {"role": "system", "content": MEMORY_HEADER + "\n" + "\n\n".join(snippets)}
+
+    @staticmethod
+    def _snippet(turn: Dict[str, str]) -> str:
+        text = f"User: {turn['user']}\nJay: {turn['assistant']}"
+        return text if len(text) <= SNIPPET_CHARS else text[:SNIPPET_CHARS - 1] + "…"
@@ -0,0 +1,199 @@
+import csv
+import json
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+class StartupTimer:
+    """Records how long each startup phase took"""
+
+    def __init__(self, origin: Optional[float] = None):
+        self.origin = origin if origin is not None else time.perf_counter()
+        self.phases: List[Tuple[str, float]] = []
+
+    def record(self, name: str, seconds: float) -> None:
+        self.phases.append((name, seconds))
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time the enclosed block as one phase"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def report(self) -> str:
+        """Human-readable breakdown, ending with the time since process start"""
+        width = max([len(name) for name, _ in self.phases] + [len("total")])
+        lines = [f"{name:<{width}}  {seconds * 1000:8.1f} ms" for name, seconds in self.phases]
+        lines.append(f"{'total':<{width}}  {(time.perf_counter() - self.origin) * 1000:8.1f} ms")
+        return "Startup timing:\n" + "\n".join(lines)
+
+NS_PER_SECOND = 1e9
+DEFAULT_WINDOW = 200
+DEFAULT_HISTORY = 10000
+
+# Counters Ollama returns with every finished chat response (durations in nanoseconds)
+RESPONSE_FIELDS = (
+    "total_duration", "load_duration",
+    "prompt_eval_count", "prompt_eval_duration",
+    "eval_count", "eval_duration",
+)
+
+def _field(response: Any, name: str) -> Any:
+    try:
+        return response[name]
+    except (KeyError, TypeError):
+        return None
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of values (None if empty)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+class TurnMetrics:
+    """Timing of one chat turn: client-side wall clock plus the server's own counters"""
+
+    def __init__(self, model: str, backend: str = "ollama", kind: str = "chat"):
+        self.model = model
+        self.backend = backend
+        self.kind = kind  # "chat" or "prefill" (speculative prompt warm-up)
+        self.time = time.time()
+        self.started = time.perf_counter()
+        self.ttft = None
+        self.wall = None
+        self.counters: Dict[str, Optional[int]] = dict.fromkeys(RESPONSE_FIELDS)
+
+    def restart(self) -> None:
+        """Start the clock now (when a queued turn actually begins)"""
+        self.time = time.time()
+        self.started = time.perf_counter()
+
+    def first_token(self) -> None:
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self.started
+
+    def apply_response(self, response: Any) -> None:
+        """Copy duration/count fields from a (final) chat response"""
+        for name in RESPONSE_FIELDS:
+            value = _field(response, name)
+            if value is not None:
+                self.counters[name] = value
+
+    def finish(self) -> None:
+        self.wall = time.perf_counter() - self.started
+        # Servers that only report token counts: time decoding on the client
+        if self.counters["eval_count"] and self.counters["eval_duration"] is None and self.ttft is not None:
+            self.counters["eval_duration"] = int((self.wall - self.ttft) * NS_PER_SECOND) or None
+
+    @property
+    def label(self) -> str:
+        """Model, backend and kind, the key metrics are grouped by"""
+        if self.kind == "chat":
+            return f"{self.model} ({self.backend})"
+        return f"{self.model} ({self.backend} {self.kind})"
+
+    def _seconds(self, name: str) -> Optional[float]:
+        value = self.counters[name]
+        return value / NS_PER_SECOND if value is not None else None
+
+    @property
+    def tokens_per_sec(self) -> Optional[float]:
+        count, duration = self.counters["eval_count"], self.counters["eval_duration"]
+        if not count or not duration:
+            return None
+        return count / (duration / NS_PER_SECOND)
+
+    @property
+    def prompt_eval(self) -> Optional[float]:
+        return self._seconds("prompt_eval_duration")
+
+    @property
+    def load(self) -> Optional[float]:
+        return self._seconds("load_duration")
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "time": self.time, "model": self.model, "backend": self.backend, "kind": self.kind, "wall": self.wall, "ttft": self.ttft,
+            "tokens_per_sec": self.tokens_per_sec, **self.counters,
+        }
+
+    def summary(self) -> str:
+        """Short line shown under a reply"""
+        parts = []
+        if self.ttft is not None:
+            parts.append(f"TTFT {self.ttft:.2f}s")
+        if self.tokens_per_sec is not None:
+            parts.append(f"{self.tokens_per_sec:.1f} tok/s")
+        if self.wall is not None:
+            parts.append(f"{self.wall:.2f}s total")
+        return " · ".join(parts)
+
+# (column label, TurnMetrics attribute) pairs summarized per model
+SUMMARY_COLUMNS = (
+    ("TTFT (s)", "ttft"),
+    ("tok/s", "tokens_per_sec"),
+    ("prompt eval (s)", "prompt_eval"),
+    ("load (s)", "load"),
+    ("wall (s)", "wall"),
+)
+
+class MetricsRecorder:
+    """Per-turn metrics with rolling per-model percentiles and file export.
+
+    Keeps the last `window` turns per model and backend for p50/p95 and up to `history`
+    turns overall for export. With `log_path` every turn is also appended to a
+    JSONL file as it is recorded.
+    """
+
+    def __init__(self, window: int = DEFAULT_WINDOW, history: int = DEFAULT_HISTORY, log_path: Optional[str] = None):
+        self.window = window
+        self.log_path = log_path
+        self._turns: Deque[TurnMetrics] = deque(maxlen=history)
+        self._by_model: Dict[str, Deque[TurnMetrics]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, turn: TurnMetrics) -> None:
+        with self._lock:
+            self._turns.append(turn)
+            self._by_model.setdefault(turn.label, deque(maxlen=self.window)).append(turn)
+        if self.log_path:
+            try:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(turn.as_dict()) + "\n")
+            except OSError as e:
+                print(f"Failed to log metrics: {e}")
+
+    def summary_rows(self) -> List[Dict[str, Any]]:
+        """One row per model and backend: turn count and p50/p95 of each summary column"""
+        with self._lock:
+            models = {model: list(turns) for model, turns in self._by_model.items()}
+        rows = []
+        for model, turns in sorted(models.items()):
+            row = {"model": model, "turns": len(turns)}
+            for label, attr in SUMMARY_COLUMNS:
+                values = [getattr(t, attr) for t in turns if getattr(t, attr) is not None]
+                row[label] = (percentile(values, 50), percentile(values, 95))
+            rows.append(row)
+        return rows
+
+    def export(self, path: str) -> int:
+        """Write recorded turns to CSV (by extension) or JSONL; returns the number written"""
+        with self._lock:
+            rows = [t.as_dict() for t in self._turns]
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            if path.lower().endswith(".csv"):
+                writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()) if rows else ["time", "model"])
+                writer.writeheader()
+                writer.writerows(rows)
+            else:
+                for row in rows:
+                    f.write(json.dumps(row) + "\n")
+        return len(rows)
@@ -0,0 +1,196 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+import ollama
+from Paths import data_dir
+
+DEFAULT_TTL = 60  # seconds before a settings open triggers a background refresh
+
+def _context_length(show: Any) -> Optional[int]:
+    """Context length from `ollama.show` model info (key is prefixed with the architecture)"""
+    info = show["modelinfo"] or {}
+    for key, value in info.items():
+        if key.endswith(".context_length"):
+            return value
+    return None
+
+def _format_context(tokens: Optional[int]) -> str:
+    if not tokens:
+        return ""
+    return f"{tokens // 1024}k ctx" if tokens >= 1024 else f"{tokens} ctx"
+
+class ModelInfo:
+    """One installed model with the metadata shown in settings"""
+
+    def __init__(self, name: str, digest: str = "", size: int = 0):
+        self.name = name
+        self.digest = digest
+        self.size = size
+        self.details: Dict[str, Any] = {}
+        self.resident = False
+
+    def label(self) -> str:
+        """Menu label, e.g. "● llama3.2:3b  (3.2B · Q4_K_M · 128k ctx)" """
+        parts = [
+            self.details.get("parameter_size") or "",
+            self.details.get("quantization_level") or "",
+            _format_context(self.details.get("context_length")),
+        ]
+        meta = " · ".join(p for p in parts if p)
+        marker = "● " if self.resident else "   "
+        return f"{marker}{self.name}  ({meta})" if meta else f"{marker}{self.name}"
+
+class ModelCatalog:
+    """Cached list of installed models with `ollama.show` metadata and `ollama.ps` residency.
+
+    `refresh` runs the Ollama calls on the calling thread; `refresh_async` runs
+    them on a background thread (at most one at a time) and calls the update
+    callback from that thread when something changed and when it finishes. Metadata is cached on disk
+    per digest, so `ollama.show` is only called for new or re-pulled models.
+    """
+
+    def __init__(self, client: Any = ollama, path: Optional[str] = None, ttl: float = DEFAULT_TTL):
+        self.client = client
+        self.path = path or os.path.join(data_dir(), "model_catalog.json")
+        self.ttl = ttl
+        self.models: Dict[str, ModelInfo] = {}
+        self.updated: Optional[float] = None
+        self.error: Optional[str] = None
+        self._details: Dict[str, Dict[str, Any]] = {}  # digest -> details
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._pending = False
+        self._update_callback: Optional[Callable[[], None]] = None
+        self._load()
+
+    def set_update_callback(self, callback: Callable[[], None]) -> None:
+        self._update_callback = callback
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return sorted(self.models, key=str.lower)
+
+    def entries(self) -> List[ModelInfo]:
+        """Models sorted by name"""
+        with self._lock:
+            return [self.models[name] for name in sorted(self.models, key=str.lower)]
+
+    def is_stale(self) -> bool:
+        return self.updated is None or time.time() - self.updated > self.ttl
+
+    def refresh(self, details: bool = True) -> List[str]:
+        """Re-list installed and resident models (and fetch missing metadata); returns model names"""
+        listed = self.client.list()["models"]
+        try:
+            running = {m["model"] for m in self.client.ps()["models"]}
+        except Exception as e:
+            print(f"Failed to get running models: {e}")
+            running = set()
+
+        with self._lock:
+            changed = self._apply_listing(listed, running)
+            self.updated = time.time()
+            self.error = None
+        if changed:
+            self._notify()
+        if details:
+            self._fetch_details()
+        return self.names()
+
+    def refresh_async(self) -> None:
+        """Refresh on a background thread; a request during a refresh queues one more"""
+        with self._lock:
+            if self._refreshing:
+                self._pending = True
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh_loop, daemon=True).start()
+
+    def invalidate(self) -> None:
+        """Models were pulled, removed, loaded or unloaded: refresh in the background"""
+        self.updated = None
+        self.refresh_async()
+
+    def _refresh_loop(self) -> None:
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                self.error = str(e)
+                print(f"Failed to refresh models: {e}")
+            with self._lock:
+                done = not self._pending
+                self._refreshing = not done
+                self._pending = False
+            if done:
+                # Always notify once at the end so "refreshing" states clear
+                self._notify()
+                return
+
+    def _apply_listing(self, listed: List[Any], running: set) -> bool:
+        """Merge a listing into the cache (lock held); returns whether anything visible changed"""
+        models = {}
+        changed = {entry["model"] for entry in listed} != set(self.models)
+        for entry in listed:
+            name, digest = entry["model"], entry["digest"] or ""
+            info = self.models.get(name)
+            if info is None or info.digest != digest:
+                info = ModelInfo(name, digest, entry["size"] or 0)
+                info.details = dict(self._details.get(digest, {}))
+                changed = True
+            if info.resident != (name in running):
+                info.resident = name in running
+                changed = True
+            models[name] = info
+        self.models = models
+        return changed
+
+    def _fetch_details(self) -> None:
+        """Call `ollama.show` for models without cached metadata"""
+        with self._lock:
+            missing = [info for info in self.models.values() if not info.details]
+        if not missing:
+            return
+        for info in missing:
+            try:
+                show = self.client.show(info.name)
+            except Exception as e:
+                print(f"Failed to get details for {info.name}: {e}")
+                continue
+            details = show["details"]
+            info.details = {
+                "family": details["family"] if details else None,
+                "parameter_size": details["parameter_size"] if details else None,
+                "quantization_level": details["quantization_level"] if details else None,
+                "context_length": _context_length(show),
+            }
+            with self._lock:
+                self._details[info.digest] = info.details
+        self._save()
+        self._notify()
+
+    def _notify(self) -> None:
+        if self._update_callback:
+            self._update_callback()
+
+    def _load(self) -> None:
+        """Load cached metadata (per digest) from disk"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._details = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self._details = {}
+
+    def _save(self) -> None:
+        with self._lock:
+            installed = {info.digest for info in self.models.values()}
+            details = {digest: d for digest, d in self._details.items() if digest in installed}
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(details, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Failed to save model catalog: {e}")
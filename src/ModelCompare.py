@@ -0,0 +1,206 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional
+
+from Metrics import TurnMetrics
+
+# Ollama keeps at most OLLAMA_MAX_LOADED_MODELS models loaded (3 per GPU, 3 on CPU by default)
+DEFAULT_MAX_LOADED = 3
+MAX_MODELS = 6  # columns of the compare window
+
+QUEUED, RUNNING, DONE, CANCELLED, FAILED = "queued", "running", "done", "cancelled", "failed"
+
+def resident_capacity(models: List[str], sizes: Mapping[str, int], memory_budget: Optional[int] = None) -> int:
+    """How many of models can be loaded at once.
+
+    Ollama's limit is read from OLLAMA_MAX_LOADED_MODELS (set it here as for
+    the server); with a memory budget, only as many models as fit in it,
+    smallest first, run together.
+    """
+    try:
+        limit = int(os.environ.get("OLLAMA_MAX_LOADED_MODELS") or DEFAULT_MAX_LOADED)
+    except ValueError:
+        limit = DEFAULT_MAX_LOADED
+    if memory_budget:
+        fit, total = 0, 0
+        for size in sorted(sizes.get(model, 0) for model in models):
+            total += size
+            if total > memory_budget:
+                break
+            fit += 1
+        limit = min(limit, fit)
+    return max(1, min(limit, len(models)))
+
+class ModelRun:
+    """One model's side of a comparison: its reply so far, state and metrics"""
+
+    def __init__(self, model: str, backend: str = "ollama"):
+        self.model = model
+        self.state = QUEUED
+        self.parts: List[str] = []
+        self.error: Optional[str] = None
+        self.memory: Optional[int] = None  # bytes resident in Ollama after the reply
+        self.won = False
+        self.turn = TurnMetrics(model, backend, kind="compare")
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+
+    def summary(self) -> str:
+        """State and metrics line shown under the model's reply"""
+        if self.state == FAILED:
+            return f"Failed: {self.error}"
+        parts = [] if self.state == DONE else [self.state.capitalize()]
+        if self.won:
+            parts.append("🏁 first")
+        metrics = self.turn.summary()
+        if metrics:
+            parts.append(metrics)
+        if self.memory:
+            parts.append(f"{self.memory / (1 << 30):.1f} GB")
+        return " · ".join(parts)
+
+class ModelComparison:
+    """Sends one prompt to several models at once and streams every reply.
+
+    At most `capacity` models generate at a time (see resident_capacity);
+    the others wait for a free slot. In race mode the first model to finish
+    wins and the others are cancelled, queued ones before they start.
+    """
+
+    def __init__(self, client: Any, models: List[str], messages: List[Dict[str, Any]],
+                 options: Optional[Callable[[str], Dict[str, Any]]] = None, keep_alive: Any = None,
+                 capacity: int = 1, race: bool = False, backend: str = "ollama", metrics=None):
+        self.client = client
+        self.runs = [ModelRun(model, backend) for model in models]
+        self.messages = messages
+        self.options = options or (lambda model: {})
+        self.keep_alive = keep_alive
+        self.capacity = max(1, capacity)
+        self.race = race
+        self.metrics = metrics
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+        self._streams: Dict[str, Iterator[Any]] = {}  # model -> reply still being streamed
+        self._chunk_callback: Optional[Callable[[ModelRun, str], None]] = None
+        self._update_callback: Optional[Callable[[ModelRun], None]] = None
+        self._done_callback: Optional[Callable[[], None]] = None
+
+    def set_chunk_callback(self, callback: Callable[[ModelRun, str], None]) -> None:
+        """Set callback receiving each streamed chunk of a model (called from thread)"""
+        self._chunk_callback = callback
+
+    def set_update_callback(self, callback: Callable[[ModelRun], None]) -> None:
+        """Set callback run when a model starts, finishes, fails or is cancelled (called from thread)"""
+        self._update_callback = callback
+
+    def set_done_callback(self, callback: Callable[[], None]) -> None:
+        """Set callback run once every model is finished (called from thread)"""
+        self._done_callback = callback
+
+    @property
+    def winner(self) -> Optional[ModelRun]:
+        return next((run for run in self.runs if run.won), None)
+
+    def start(self) -> "ModelComparison":
+        """Start the requests in the background"""
+        threading.Thread(target=self._run_all, daemon=True).start()
+        return self
+
+    def cancel(self) -> None:
+        """Stop every reply still being generated and skip queued models"""
+        self._cancel.set()
+        self._close_streams()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._finished.wait(timeout)
+
+    def _run_all(self) -> None:
+        # The runs start in the order given; each takes a slot until it is finished
+        with ThreadPoolExecutor(max_workers=self.capacity, thread_name_prefix="compare") as pool:
+            list(pool.map(self._run, self.runs))
+        self._finished.set()
+        if self._done_callback:
+            self._done_callback()
+
+    def _run(self, run: ModelRun) -> None:
+        if self._cancel.is_set():
+            self._update(run, CANCELLED)
+            return
+        run.turn.restart()
+        self._update(run, RUNNING)
+        try:
+            self._stream(run)
+        except Exception as e:
+            # A stream closed by cancel() while it was being read may raise
+            if self._cancel.is_set():
+                self._update(run, CANCELLED)
+                return
+            run.error = str(e) or type(e).__name__
+            self._update(run, FAILED)
+            return
+        run.turn.finish()
+        with self._lock:
+            cancelled = self._cancel.is_set()
+            if self.race and not cancelled:
+                run.won = True
+                self._cancel.set()
+        if cancelled:
+            self._update(run, CANCELLED)
+            return
+        if run.won:
+            self._close_streams()
+        run.memory = self._resident().get(run.model)
+        if self.metrics:
+            self.metrics.record(run.turn)
+        self._update(run, DONE)
+
+    def _stream(self, run: ModelRun) -> None:
+        stream = self.client.chat(model=run.model, messages=self.messages, keep_alive=self.keep_alive,
+                                  options=self.options(run.model), stream=True)
+        with self._lock:
+            self._streams[run.model] = stream
+        try:
+            for chunk in stream:
+                if self._cancel.is_set():
+                    break
+                content = chunk["message"]["content"]
+                if content:
+                    run.turn.first_token()
+                    run.parts.append(content)
+                    if self._chunk_callback:
+                        self._chunk_callback(run, content)
+                run.turn.apply_response(chunk)
+        finally:
+            with self._lock:
+                self._streams.pop(run.model, None)
+            # Closing the generator drops the HTTP stream so Ollama stops generating
+            self._close(stream)
+
+    def _close_streams(self) -> None:
+        with self._lock:
+            streams = list(self._streams.values())
+        for stream in streams:
+            self._close(stream)
+
+    @staticmethod
+    def _close(stream: Iterator[Any]) -> None:
+        try:
+            stream.close()
+        except ValueError:
+            # Still waiting on the server in its own thread, which stops at the next chunk
+            pass
+
+    def _resident(self) -> Dict[str, int]:
+        try:
+            return {m["model"]: m["size"] or 0 for m in self.client.ps()["models"]}
+        except Exception:
+            return {}
+
+    def _update(self, run: ModelRun, state: str) -> None:
+        run.state = state
+        if self._update_callback:
+            self._update_callback(run)
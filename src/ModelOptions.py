@@ -0,0 +1,68 @@
+import os
+import time
+from typing import Any, Callable, Dict, Mapping, Optional
+
+from Metrics import NS_PER_SECOND
+
+OPTION_NAMES = ("num_ctx", "num_thread", "num_batch", "num_gpu", "num_predict", "temperature")
+# Fixed when Ollama starts the model runner; a request with other values reloads the model
+LOAD_OPTIONS = ("num_ctx", "num_thread", "num_batch", "num_gpu")
+DEFAULT_PROFILE = "*"  # profile applied to every model, below the model's own
+
+BATCH_CANDIDATES = (128, 256, 512)
+TUNE_PREDICT = 32
+TUNE_PROMPT = "Retell the following notes as one short paragraph.\n" + "\n".join(
+    f"- Note {i}: the assistant keeps answers short, friendly and to the point." for i in range(24)
+)
+
+Profiles = Mapping[str, Mapping[str, Any]]
+
+def options_for(profiles: Optional[Profiles], model: Optional[str]) -> Dict[str, Any]:
+    """Options of a model: the default profile overridden by the model's own (None = server default)"""
+    profiles = profiles or {}
+    options = {**profiles.get(DEFAULT_PROFILE, {}), **profiles.get(model or "", {})}
+    return {name: value for name, value in options.items() if value is not None}
+
+def load_options(options: Mapping[str, Any]) -> Dict[str, Any]:
+    """The options that decide how the model is loaded"""
+    return {name: options[name] for name in LOAD_OPTIONS if options.get(name) is not None}
+
+def thread_candidates() -> tuple:
+    cores = os.cpu_count() or 1
+    return tuple(sorted({max(1, cores // 4), max(1, cores // 2), cores}))
+
+def _measure(client: Any, model: str, options: Dict[str, Any], keep_alive: Any, run: int) -> float:
+    """Seconds spent evaluating the tuning prompt and generating TUNE_PREDICT tokens (load excluded)"""
+    # A distinct first line per run keeps the server's prompt cache from skewing the timing
+    messages = [{"role": "user", "content": f"Run {run}. {TUNE_PROMPT}"}]
+    started = time.perf_counter()
+    response = client.chat(model=model, messages=messages, keep_alive=keep_alive,
+                           options={**options, "num_predict": TUNE_PREDICT, "temperature": 0})
+    wall = time.perf_counter() - started
+    durations = (response.get("prompt_eval_duration") or 0) + (response.get("eval_duration") or 0)
+    if durations:
+        return durations / NS_PER_SECOND
+    return wall - (response.get("load_duration") or 0) / NS_PER_SECOND
+
+def auto_tune(client: Any, model: str, options: Mapping[str, Any], keep_alive: Any = None,
+              on_progress: Optional[Callable[[str], None]] = None) -> Dict[str, int]:
+    """Fastest num_thread, then num_batch, for model on this machine.
+
+    A short sweep: one request per candidate value, num_thread first (with
+    the profile's num_batch), then num_batch with the best num_thread. Every
+    candidate makes Ollama reload the model, which is left out of the timing.
+    """
+    base = load_options(options)
+    sweeps = (("num_thread", thread_candidates()), ("num_batch", BATCH_CANDIDATES))
+    total = sum(len(values) for _, values in sweeps)
+    best: Dict[str, int] = {}
+    run = 0
+    for name, values in sweeps:
+        timings = {}
+        for value in values:
+            run += 1
+            if on_progress:
+                on_progress(f"Auto-tune {run}/{total}: {name}={value}")
+            timings[value] = _measure(client, model, {**base, **best, name: value}, keep_alive, run)
+        best[name] = min(timings, key=timings.get)
+    return best
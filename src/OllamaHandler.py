@@ -1,29 +1,118 @@
+import asyncio
+import json
 import ollama
 import threading
-from typing import List, Dict, Any, Optional, Callable
+import httpx
+from typing import List, Dict, Any, Optional, Callable, Tuple
 from Handler import ChatHandler
+from Dispatcher import RequestDispatcher
+from ContextManager import CHARS_PER_TOKEN, DEFAULT_BUDGET, DEFAULT_PINNED_TURNS
+from ChatSession import ChatSession
+from ResponseCache import is_deterministic
+from Metrics import MetricsRecorder, TurnMetrics
+from ResidencyManager import ResidencyManager
+from ModelOptions import options_for, load_options
+from Tools import TOOLS_PROMPT, as_call
+from Attachments import attachment_message, loaded_names, with_note
+
+DEFAULT_RECENT_TURNS = 20
+ERROR_PREFIX = "⚠️ Error:"
+# Speculative prefill evaluates the prompt and stops after one token
+PREFILL_OPTIONS = {"num_predict": 1}
+PREFILL_CLOSE_TIMEOUT = 2.0
+ATTACHMENT_SHARE = 0.5  # of the context budget, for excerpts of attached files
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a user and Jay, their assistant. "
+    "Merge the existing summary with the new messages into one short summary. "
+    "Keep names, facts, decisions and open questions. Reply with the summary only."
+)
 
 class OllamaHandler(ChatHandler):
     """Handler for Ollama chat functionality"""
     
-    def __init__(self, model: Optional[str] = None, name: Optional[str] = None):
+    backend = "ollama"
+    tool_calling = True  # sends `tools` and answers the model's tool calls
+    model_comparison = True  # compare mode sends a prompt to several models at once
+    
+    def __init__(self, model: Optional[str] = None, name: Optional[str] = None, stream: bool = True, workers: int = 1):
         self.model = model
         self.name = name
-        self.messages = []
+        self.stream = stream
         self._response_callback = None
+        self._chunk_callback = None
+        
+        # Requests are served per session (round-robin across sessions); history is only touched under the lock
+        self.dispatcher = RequestDispatcher(workers)
+        self._history_lock = threading.Lock()
+        
+        # Prompt trimming; older turns are folded into a background summary
+        self.context_budget = DEFAULT_BUDGET
+        self.pinned_turns = DEFAULT_PINNED_TURNS
+        
+        # Persistent history (optional); a session is created on its first turn
+        self.store = None
+        self.recent_turns = DEFAULT_RECENT_TURNS
+        
+        # Keep each model's conversation when switching models (see set_model)
+        self.model_snapshots = False
+        
+        # Optional local tools (ToolRegistry) offered to the model; models that reject them are remembered
+        self.tools = None
+        self._no_tool_models = set()
+        
+        # Open chat sessions (tabs) by key; requests and replies belong to the session they were sent in
+        self.sessions: Dict[int, ChatSession] = {}
+        self._next_session_key = 0
+        self.session = self._add_session()
+        
+        # Optional retrieval memory over past sessions (LongTermMemory)
+        self.memory = None
+        
+        # Optional reply cache for repeated prompts; sampling options decide if it applies
+        self.response_cache = None
+        self._cache_callback = None
+        
+        # Per-model option profiles (ModelOptions), sent as `options` with every request
+        self.option_profiles = {}
+        
+        # Per-turn latency/throughput (TTFT, tok/s, Ollama durations)
+        self.metrics = MetricsRecorder()
+        self._metrics_callback = None
+        
+        # Which models stay loaded (idle timeout, memory budget, pre-warming)
+        self.residency = ResidencyManager()
+        
+        # list/ps/show client for the ModelCatalog
+        self.catalog_client = ollama
+        
+        # Speculative prefill: one cancellable warm-up request at a time
+        self.host = None  # None: OLLAMA_HOST
+        self._prefill_lock = threading.Lock()
+        self._prefill_key = None  # (session, generation, history length, draft) being warmed
+        self._prefill_cancel = None
+        self._prefill_task = None  # future of the in-flight warm-up
+        self._prefill_runner = None  # loop of the warm-ups, shared with their connection pool
+        self._prefill_http = None
+        self._prefill_endpoint = None  # (base URL, headers) of the Ollama server
+        self.prefill_stats = {"warm": 0, "cancelled": 0}
+        self._prefill_callback = None
         
     def initialize(self) -> None:
         """Initialize the Ollama handler"""
         if self.model:
             # Load model into memory
-            ollama.chat(model=self.model, keep_alive=-1)
+            self.residency.activate(self.model, wait=True)
         self.upsert_system_prompt()
     
     def cleanup(self) -> None:
         """Cleanup Ollama resources"""
-        if self.model:
-            import os
-            os.system(f"ollama stop {self.model}")
+        self.cancel_prefill()
+        self._close_prefill()
+        self.dispatcher.shutdown()
+        if self.response_cache:
+            self.response_cache.save()
+        self.residency.shutdown()
     
     def get_available_models(self) -> List[str]:
         """Get list of installed Ollama models"""
@@ -33,73 +122,638 @@ class OllamaHandler(ChatHandler):
         except Exception as e:
             raise Exception(f"Failed to get Ollama models: {e}")
     
+    @property
+    def options(self) -> Dict[str, Any]:
+        """Options of the current model's profile"""
+        return options_for(self.option_profiles, self.model)
+    
+    def set_option_profiles(self, profiles: Dict[str, Dict[str, Any]]) -> None:
+        """Set model -> options profiles (ModelOptions.DEFAULT_PROFILE applies to all models)"""
+        self.option_profiles = profiles
+        self.residency.option_profiles = profiles
+    
     def set_model(self, model: str) -> None:
-        """Set the current model"""
-        self.model = model
-        # Load model into memory
-        ollama.chat(model=self.model, keep_alive=-1)
+        """Set the current model and start a new conversation (see _switch_conversation)"""
+        self.cancel_prefill()
+        previous, self.model = self.model, model
+        # Load it and unload the previous model in the background
+        self.residency.activate(model)
+        self._switch_conversation(previous)
+    
+    def _switch_conversation(self, previous: Optional[str]) -> None:
+        """Start a new conversation in the active session after a model switch.
+        
+        With model snapshots, the conversation is kept for the previous model
+        and the one left with the new model, if any, is picked up again. Its
+        prompt is then byte-identical to before, so the server's cached prefix
+        still applies if the model stayed loaded.
+        """
+        session = self.session
+        snapshot = None
+        if self.model_snapshots:
+            with self._history_lock:
+                if previous and previous != self.model:
+                    session.save_snapshot(previous)
+                snapshot = session.snapshots.pop(self.model, None)
+        self.clear_history()
+        if snapshot:
+            with self._history_lock:
+                session.restore(snapshot)
+            self.upsert_system_prompt(session)
+    
+    def attach_store(self, store, recent_turns: int = DEFAULT_RECENT_TURNS) -> None:
+        """Persist turns to a ConversationStore"""
+        self.store = store
+        self.recent_turns = recent_turns
+    
+    @property
+    def messages(self) -> List[Dict[str, Any]]:
+        """History of the active session"""
+        return self.session.messages
+    
+    @property
+    def session_id(self) -> Optional[int]:
+        """Stored id of the active session (None until its first turn is saved)"""
+        return self.session.session_id
+    
+    @property
+    def context(self):
+        """Context window manager of the active session"""
+        return self.session.context
+    
+    def _add_session(self) -> ChatSession:
+        session = ChatSession(self._next_session_key, self._summarize, self.context_budget, self.pinned_turns)
+        self._next_session_key += 1
+        self.sessions[session.key] = session
+        self.upsert_system_prompt(session)
+        return session
+    
+    def new_session(self, session_id: Optional[int] = None) -> ChatSession:
+        """Open a tab with a stored session (or a new conversation) and make it active"""
+        session = self._add_session()
+        if session_id is not None:
+            self._load_session(session, session_id)
+        self.activate_session(session.key)
+        return session
+    
+    def activate_session(self, key: int) -> None:
+        """Make an open session the active one; the previous one is swapped out once idle"""
+        previous, self.session = self.session, self.sessions[key]
+        if previous is self.session:
+            return
+        self.cancel_prefill()
+        if not self.session.loaded:
+            self._load_session(self.session, self.session.session_id)
+        self._swap_out_if_idle(previous)
+    
+    def close_session(self, key: int) -> None:
+        """Close a tab, dropping its pending requests (its history stays stored)"""
+        session = self.sessions.pop(key)
+        session.generation += 1
+        self.dispatcher.cancel_all(key)
+        if session is self.session:
+            if self.sessions:
+                self.activate_session(max(self.sessions))
+            else:
+                self.new_session()
+    
+    def open_session(self, session_id: Optional[int]) -> None:
+        """Show a stored session in the active tab, loading only its newest turns (None starts a new one).
+        
+        A session that is already open in another tab is activated instead.
+        """
+        for session in self.sessions.values():
+            if session_id is not None and session.session_id == session_id:
+                self.activate_session(session.key)
+                return
         self.clear_history()
+        if session_id is not None and self.store:
+            self._load_session(self.session, session_id)
+    
+    def _load_session(self, session: ChatSession, session_id: int) -> None:
+        """(Re)load a session's title, system prompt and newest turns from the store"""
+        session.session_id = session_id
+        if not self.store:
+            return
+        stored = self.store.get_session(session_id) or {}
+        session.title = stored.get("name")
+        session.system_prompt = stored.get("system_prompt")
+        recent = self.store.load_recent(session_id, 2 * self.recent_turns)
+        with self._history_lock:
+            session.messages = [{"role": m["role"], "content": m["content"]} for m in recent]
+            session.context.reset()
+            session.loaded = True
+        self.upsert_system_prompt(session)
+    
+    def _swap_out_if_idle(self, session: ChatSession) -> None:
+        """Free the history of a background session with nothing pending (it is reloaded from the store)"""
+        if not self.store or session is self.session or session.pending or session.session_id is None:
+            return
+        with self._history_lock:
+            session.swap_out()
+    
+    def _session_done(self, session: ChatSession) -> None:
+        """A request of session finished or was dropped"""
+        with self._history_lock:
+            session.pending -= 1
+        self._swap_out_if_idle(session)
+    
+    def set_session_title(self, key: int, title: str) -> None:
+        session = self.sessions[key]
+        session.title = title
+        if self.store and session.session_id is not None:
+            self.store.rename_session(session.session_id, title)
+    
+    def set_system_prompt(self, key: int, system_prompt: Optional[str]) -> None:
+        """Give a session its own system prompt (None or empty: the default prompt)"""
+        session = self.sessions[key]
+        session.system_prompt = (system_prompt or "").strip() or None
+        self.upsert_system_prompt(session)
+        if self.store and session.session_id is not None:
+            self.store.set_system_prompt(session.session_id, session.system_prompt)
+    
+    def _persist_turn(self, messages: List[Dict[str, Any]], session: Optional[ChatSession] = None) -> None:
+        """Append a finished turn to the store"""
+        session = session or self.session
+        if not self.store:
+            return
+        try:
+            if session.session_id is None:
+                session.session_id = self.store.create_session(
+                    session.title or messages[0]["content"], self.model, session.system_prompt
+                )
+                session.title = self.store.get_session(session.session_id)["name"]
+            self.store.append(session.session_id, messages)
+        except Exception as e:
+            print(f"Failed to save chat history: {e}")
+            return
+        if self.memory:
+            self.memory.schedule()
     
     def set_name(self, name: Optional[str]) -> None:
         """Set user name"""
         self.name = name
-        self.upsert_system_prompt()
+        for session in list(self.sessions.values()):
+            self.upsert_system_prompt(session)
     
-    def set_response_callback(self, callback: Callable[[str], None]) -> None:
-        """Set callback for async responses"""
+    def set_response_callback(self, callback: Callable[[str, int], None]) -> None:
+        """Set callback for async responses (reply, session key)"""
         self._response_callback = callback
     
-    def send_message(self, message: str) -> None:
-        """Send message asynchronously"""
-        # Add user message to history
-        self.messages.append({"role": "user", "content": message})
+    def set_chunk_callback(self, callback: Callable[[str, int], None]) -> None:
+        """Set callback for incremental (streamed) response chunks (chunk, session key)"""
+        self._chunk_callback = callback
+    
+    def set_queue_callback(self, callback: Callable[[int], None]) -> None:
+        """Set callback receiving the number of pending requests"""
+        self.dispatcher.set_depth_callback(callback)
+    
+    def set_context_budget(self, budget: int, pinned_turns: int) -> None:
+        """Set prompt token budget and number of recent turns always kept"""
+        self.context_budget, self.pinned_turns = budget, pinned_turns
+        for session in list(self.sessions.values()):
+            session.context.budget = budget
+            session.context.pinned_turns = pinned_turns
+    
+    def set_workers(self, workers: int) -> None:
+        """Set the number of concurrent generations"""
+        self.dispatcher.set_workers(workers)
+    
+    def is_streaming(self) -> bool:
+        """Whether replies are delivered chunk by chunk"""
+        # Interleaved chunks from parallel workers would garble the transcript
+        return self.stream and self._chunk_callback is not None and self.dispatcher.workers == 1
+    
+    def send_message(self, message: str, attachments: Optional[List[Any]] = None) -> None:
+        """Queue message with optional Attachments; the reply arrives through the response callback"""
+        # A warm-up still evaluating would delay the real request
+        self.cancel_prefill()
+        # History only notes the attachments (see _build_prompt); their excerpts and images go into this turn's prompt
+        user_message = {"role": "user", "content": message}
+        session = self.session
+        with self._history_lock:
+            session.pending += 1
+        generation = session.generation
+        turn = TurnMetrics(self.model, self.backend)
+        
+        def get_response(cancel_event: threading.Event) -> str:
+            turn.restart()
+            prompt = self._build_prompt(user_message, session, attachments)
+            cache_key, cached = self._cached_reply(prompt, session.key)
+            if cached is not None:
+                return cached
+            
+            reply, used_tools = self._reply(prompt, cancel_event, turn, session.key)
+            turn.finish()
+            
+            # Tool results (the clock, files) change, so such replies are not reused
+            if not cancel_event.is_set() and not used_tools:
+                self._cache_reply(cache_key, reply)
+            return reply
         
-        def get_response():
+        def on_done(job) -> None:
             try:
-                response = ollama.chat(model=self.model, messages=self.messages, keep_alive=-1)
-                reply = response['message']['content']
-                
-                # Add AI response to history
-                self.messages.append({"role": "assistant", "content": reply})
-                
-                if self._response_callback:
-                    self._response_callback(reply)
-            except Exception as e:
-                error_msg = f"⚠️ Error: {e}"
-                if self._response_callback:
-                    self._response_callback(error_msg)
-        
-        threading.Thread(target=get_response, daemon=True).start()
+                self._complete_reply(user_message, generation, job.result, job.error, job.cancelled, turn, session)
+            finally:
+                self._session_done(session)
+                for attachment in attachments or []:
+                    attachment.close()
+        
+        self.dispatcher.submit(get_response, on_done, group=session.key)
+    
+    def set_memory(self, memory) -> None:
+        """Recall relevant turns of other sessions from a LongTermMemory (None disables it)"""
+        self.memory = memory
+        if memory:
+            memory.schedule()
+    
+    def _build_prompt(self, user_message: Dict[str, Any], session: Optional[ChatSession] = None,
+                      attachments: Optional[List[Any]] = None) -> List[Dict[str, Any]]:
+        """Snapshot a session's history plus the new message, trimmed to the context budget.
+        
+        With attachments, user_message (as it goes into history) gets a note of the ones that could be read.
+        """
+        session = session or self.session
+        if attachments:
+            # Waits for attachments still being read; older turns make room for the excerpts
+            user_message["content"] = with_note(user_message["content"], loaded_names(attachments))
+            max_chars = int(session.context.budget * ATTACHMENT_SHARE) * CHARS_PER_TOKEN
+            user_message = attachment_message(user_message, attachments, max_chars)
+        with self._history_lock:
+            history = session.messages + [user_message]
+        prompt = session.context.build_prompt(history)
+        
+        snippets = self._recall(user_message["content"], session.session_id)
+        if snippets:
+            # Right before the new message, so the history prefix stays cacheable
+            prompt.insert(len(prompt) - 1, self.memory.message(snippets))
+        return prompt
+    
+    def _recall(self, text: str, session_id: Optional[int]) -> List[str]:
+        if not self.memory:
+            return []
+        try:
+            return self.memory.recall(text, exclude_session=session_id)
+        except Exception as e:
+            print(f"Memory recall failed: {e}")
+            return []
+    
+    def set_response_cache(self, cache) -> None:
+        """Reuse replies from a ResponseCache (None disables caching)"""
+        self.response_cache = cache
+    
+    def set_cache_callback(self, callback: Callable[[str], None]) -> None:
+        """Set callback receiving cache hit/miss stats after each lookup"""
+        self._cache_callback = callback
+    
+    def _cached_reply(self, prompt: List[Dict[str, Any]], key: int):
+        """Return (cache key, cached reply); the key is None when caching does not apply"""
+        # Images are not part of the cache key
+        if not self.response_cache or not is_deterministic(self.options) or "images" in prompt[-1]:
+            return None, None
+        
+        cache_key = self.response_cache.key(self.model, prompt, self.options)
+        reply = self.response_cache.get(cache_key)
+        if self._cache_callback:
+            self._cache_callback(self.response_cache.stats())
+        if reply is not None and self.is_streaming():
+            self._chunk_callback(reply, key)
+        return cache_key, reply
+    
+    def _cache_reply(self, key: Optional[str], reply: str) -> None:
+        if key and reply:
+            self.response_cache.put(key, reply)
+    
+    def set_metrics_callback(self, callback: Callable[[TurnMetrics], None]) -> None:
+        """Set callback receiving the metrics of each completed turn (after the response callback)"""
+        self._metrics_callback = callback
+    
+    def _complete_reply(self, user_message: Dict[str, Any], generation: int, result: Optional[str],
+                        error: Optional[Exception], cancelled: bool, turn: Optional[TurnMetrics] = None,
+                        session: Optional[ChatSession] = None) -> None:
+        """Commit a finished turn to its session's history and report it"""
+        session = session or self.session
+        # History was cleared (or the tab closed) while this request was pending
+        if generation != session.generation:
+            return
+        
+        if error:
+            reply = f"{ERROR_PREFIX} {error}"
+            if self.is_streaming():
+                self._chunk_callback(reply, session.key)
+        elif cancelled and not result:
+            reply = "⏹️ Cancelled."
+        elif cancelled:
+            # A cut-off reply is shown but not kept, so later prompts, summaries and memory never see it as complete
+            reply = f"{result}\n⏹️ Stopped."
+            if self.is_streaming():
+                self._chunk_callback("\n⏹️ Stopped.", session.key)
+        else:
+            reply = result
+            exchange = [user_message, {"role": "assistant", "content": reply}]
+            # Add user message and AI response to history together
+            with self._history_lock:
+                # A swapped-out session reloads this turn from the store
+                if session.loaded:
+                    session.messages.extend(exchange)
+            self._persist_turn(exchange, session)
+        
+        if self._response_callback:
+            self._response_callback(reply, session.key)
+        
+        # Cache hits never reach the model and are not recorded
+        if turn and turn.wall is not None and not error and not cancelled:
+            self.metrics.record(turn)
+            if self._metrics_callback:
+                self._metrics_callback(turn)
+    
+    def hold(self) -> None:
+        """Queue messages without sending them (e.g. while the model warms up)"""
+        self.dispatcher.hold()
+    
+    def release(self) -> None:
+        """Start sending queued messages"""
+        self.dispatcher.release()
+    
+    def cancel_current(self) -> bool:
+        """Stop the reply being generated for the active session"""
+        return self.dispatcher.cancel_current(self.session.key)
+    
+    def cancel_all(self) -> None:
+        """Stop the active session's reply and drop its queued requests"""
+        self.dispatcher.cancel_all(self.session.key)
+    
+    def pending_count(self) -> int:
+        """Number of queued and in-flight requests"""
+        return self.dispatcher.pending_count()
+    
+    def set_tools(self, tools) -> None:
+        """Offer the tools of a ToolRegistry to the model (None disables tool calling)"""
+        self.tools = tools
+        for session in self.sessions.values():
+            self.upsert_system_prompt(session)
+    
+    def _tool_specs(self) -> Optional[List[Dict[str, Any]]]:
+        if not self.tools or not self.tool_calling or self.model in self._no_tool_models:
+            return None
+        return self.tools.specs()
+    
+    def _reply(self, prompt: List[Dict[str, Any]], cancel_event: threading.Event, turn: TurnMetrics,
+               key: int) -> Tuple[str, bool]:
+        """Generate a reply, answering tool calls with one follow-up request.
+        
+        Returns the reply and whether tools were called.
+        """
+        calls = []
+        reply = self._generate(prompt, cancel_event, turn, key, calls)
+        if not calls or cancel_event.is_set():
+            return reply, False
+        
+        # All calls run in parallel; the model then answers from their results without tools
+        results = self.tools.run(calls)
+        follow_up = prompt + [{"role": "assistant", "content": reply, "tool_calls": calls}] + results
+        return reply + self._generate(follow_up, cancel_event, turn, key), True
+    
+    def _generate(self, prompt: List[Dict[str, Any]], cancel_event: threading.Event, turn: TurnMetrics,
+                  key: int, calls: Optional[List[Dict[str, Any]]] = None) -> str:
+        """One request; with `calls`, tools are offered and the model's tool calls are collected there"""
+        tools = self._tool_specs() if calls is not None else None
+        try:
+            if self.is_streaming():
+                return self._stream_reply(prompt, cancel_event, turn, key, tools, calls)
+            return self._chat(prompt, turn, tools, calls)
+        except ollama.ResponseError as e:
+            if not tools or "does not support tools" not in str(e):
+                raise
+            # Nothing was generated yet; ask again without tools
+            self._no_tool_models.add(self.model)
+            return self._generate(prompt, cancel_event, turn, key)
+    
+    def _chat(self, prompt: List[Dict[str, Any]], turn: TurnMetrics, tools: Optional[List[Dict[str, Any]]] = None,
+              calls: Optional[List[Dict[str, Any]]] = None) -> str:
+        """Generate a whole reply in one request"""
+        response = ollama.chat(model=self.model, messages=prompt, keep_alive=self.residency.keep_alive,
+                               options=self.options, tools=tools)
+        turn.first_token()
+        turn.apply_response(response)
+        if calls is not None:
+            calls.extend(as_call(call) for call in response['message'].get('tool_calls') or [])
+        return response['message']['content'] or ""
+    
+    def _stream_reply(self, prompt: List[Dict[str, Any]], cancel_event: threading.Event, turn: TurnMetrics,
+                      key: int, tools: Optional[List[Dict[str, Any]]] = None,
+                      calls: Optional[List[Dict[str, Any]]] = None) -> str:
+        """Stream a reply, forwarding chunks as they arrive, and return the (possibly partial) text"""
+        parts = []
+        
+        stream = ollama.chat(model=self.model, messages=prompt, keep_alive=self.residency.keep_alive,
+                             options=self.options, tools=tools, stream=True)
+        try:
+            for chunk in stream:
+                if cancel_event.is_set():
+                    break
+                message = chunk['message']
+                self._add_chunk(parts, message['content'], turn, key)
+                if calls is not None:
+                    calls.extend(as_call(call) for call in message.get('tool_calls') or [])
+                turn.apply_response(chunk)
+        finally:
+            # Closing the generator drops the HTTP stream so Ollama stops generating
+            stream.close()
+        
+        return "".join(parts)
+    
+    def _add_chunk(self, parts: List[str], content: Optional[str], turn: TurnMetrics, key: int) -> None:
+        """Record and forward one streamed chunk of session `key`"""
+        if not content:
+            return
+        turn.first_token()
+        parts.append(content)
+        self._chunk_callback(content, key)
     
     def clear_history(self) -> None:
-        """Clear chat history"""
-        self.messages.clear()
-        self.upsert_system_prompt()
+        """Start a new conversation in the active session (its own system prompt is kept)"""
+        session = self.session
+        session.generation += 1
+        self.cancel_all()
+        self.cancel_prefill()
+        with self._history_lock:
+            session.messages.clear()
+            session.loaded = True
+        session.session_id = None
+        session.title = None
+        session.context.reset()
+        self.upsert_system_prompt(session)
+    
+    def set_prefill_callback(self, callback: Callable[[str], None]) -> None:
+        """Set callback receiving prefill warm/cancelled counts after each warm-up"""
+        self._prefill_callback = callback
+    
+    def prefill(self, draft: str) -> None:
+        """Warm the server's prompt cache with the history plus the draft message (runs in background).
+
+        The real request shares the warmed prefix, so only the rest of the
+        message needs evaluation. Skipped while replies are pending.
+        """
+        if not self.model or not draft or self.pending_count():
+            return
+        session = self.session
+        # The same draft on the same history was already warmed (or is being warmed)
+        key = (session.key, session.generation, len(session.messages), draft)
+        cancel = threading.Event()
+        with self._prefill_lock:
+            if key == self._prefill_key:
+                return
+            self._cancel_prefill_locked()
+            self._prefill_key = key
+            self._prefill_cancel = cancel
+            self._prefill_task = asyncio.run_coroutine_threadsafe(
+                self._warm({"role": "user", "content": draft}, session, cancel), self._prefill_loop()
+            )
+    
+    def cancel_prefill(self) -> None:
+        """Abort the in-flight warm-up, if any"""
+        with self._prefill_lock:
+            self._cancel_prefill_locked()
+            self._prefill_key = None
+    
+    def _cancel_prefill_locked(self) -> None:
+        if self._prefill_cancel:
+            self._prefill_cancel.set()
+        if self._prefill_task:
+            # Cancelling the task closes the connection, so the server stops evaluating
+            self._prefill_task.cancel()
+            self._prefill_task = None
     
-    def get_system_prompt(self) -> str:
-        """Generate system prompt"""
-        prompt = (
-            "You are Jay, a helpful personal assistant. \n"
-            "Role: provide accurate, concise answers. \n"
-            "Constraints: \n"
-            "- Keep short replies unless asked to expand.\n"
-            "- If the user explicitly asks for more detail or explanation, provide longer, structured responses.\n"
-            "- If you are not sure about your answer, DO NOT answer. DO NOT take a guess and DO NOT make assumptions."
-        )
+    def _prefill_loop(self) -> asyncio.AbstractEventLoop:
+        """Loop running the warm-ups, started on first use"""
+        # asyncio, because only it can abort a request that is still waiting for its response
+        if self._prefill_runner is None:
+            self._prefill_runner = asyncio.new_event_loop()
+            threading.Thread(target=self._prefill_runner.run_forever, daemon=True).start()
+        return self._prefill_runner
+    
+    async def _warm(self, user_message: Dict[str, Any], session: ChatSession, cancel: threading.Event) -> None:
+        turn = TurnMetrics(self.model, self.backend, kind="prefill")
+        try:
+            # Memory recall makes a blocking embedding request: build the prompt off the UI thread
+            prompt = await asyncio.get_running_loop().run_in_executor(None, self._build_prompt, user_message, session)
+            if not cancel.is_set():
+                turn.restart()
+                await self._send_prefill(prompt, turn)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            if not cancel.is_set():
+                print(f"Prefill failed: {e}")
+        finally:
+            with self._prefill_lock:
+                if self._prefill_cancel is cancel:
+                    self._prefill_task = None
+        turn.finish()
+        
+        if cancel.is_set():
+            self.prefill_stats["cancelled"] += 1
+        else:
+            self.prefill_stats["warm"] += 1
+            self.metrics.record(turn)
+        if self._prefill_callback:
+            self._prefill_callback(f"prefill {self.prefill_stats['warm']} warm / {self.prefill_stats['cancelled']} cancelled")
+    
+    async def _send_prefill(self, prompt: List[Dict[str, Any]], turn: TurnMetrics) -> None:
+        """Send the warm-up request over the warm-up loop's pooled connection"""
+        base_url, headers, path, body = self._prefill_request(prompt)
+        if self._prefill_http is None:
+            self._prefill_http = httpx.AsyncClient(base_url=base_url, headers=headers, timeout=None)
+        async with self._prefill_http.stream("POST", path, json=body) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                turn.first_token()
+                turn.apply_response(self._prefill_counters(line))
+    
+    def _close_prefill(self) -> None:
+        """Close the warm-up connection and stop its loop"""
+        loop, self._prefill_runner = self._prefill_runner, None
+        if loop is None:
+            return
+        if self._prefill_http is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(self._prefill_http.aclose(), loop).result(PREFILL_CLOSE_TIMEOUT)
+            except Exception:
+                pass
+            self._prefill_http = None
+        loop.call_soon_threadsafe(loop.stop)
+    
+    def _prefill_request(self, prompt: List[Dict[str, Any]]) -> Tuple[str, Dict[str, str], str, Dict[str, Any]]:
+        """Base URL, headers, path and body of a warm-up request"""
+        if self._prefill_endpoint is None:
+            http = ollama.Client(host=self.host)._client
+            self._prefill_endpoint = (str(http.base_url), dict(http.headers))
+            http.close()
+        base_url, headers = self._prefill_endpoint
+        return base_url, headers, "/api/chat", {
+            "model": self.model, "messages": prompt, "stream": True,
+            # The load options must match the chat requests, or the warm-up would reload the model
+            "keep_alive": self.residency.keep_alive, "options": {**load_options(self.options), **PREFILL_OPTIONS},
+        }
+    
+    def _prefill_counters(self, line: str) -> Dict[str, Any]:
+        """Metric counters from one line of the warm-up response"""
+        return json.loads(line) if line else {}
+    
+    def _summarize(self, summary: str, messages: List[Dict[str, Any]]) -> str:
+        """Fold messages into the running summary (runs in background)"""
+        # Same runner as the chat (load options only), without the reply length and sampling limits
+        response = ollama.chat(model=self.model, messages=self._summary_prompt(summary, messages),
+                               keep_alive=self.residency.keep_alive, options=load_options(self.options))
+        return response['message']['content'].strip()
+    
+    def _summary_prompt(self, summary: str, messages: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """Build the request that merges messages into the summary"""
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        return [
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": f"Existing summary:\n{summary or '(none)'}\n\nNew messages:\n{transcript}"},
+        ]
+    
+    def get_system_prompt(self, session: Optional[ChatSession] = None) -> str:
+        """Generate system prompt (a session's own prompt replaces the default one)"""
+        if session and session.system_prompt:
+            prompt = session.system_prompt
+        else:
+            prompt = (
+                "You are Jay, a helpful personal assistant. \n"
+                "Role: provide accurate, concise answers. \n"
+                "Constraints: \n"
+                "- Keep short replies unless asked to expand.\n"
+                "- If the user explicitly asks for more detail or explanation, provide longer, structured responses.\n"
+                "- If you are not sure about your answer, DO NOT answer. DO NOT take a guess and DO NOT make assumptions."
+            )
+            if self.tools and self.tool_calling:
+                prompt += "\n" + TOOLS_PROMPT
         
         if self.name:
             prompt += f"\nThe user's name is {self.name}."
         
         return prompt
     
-    def upsert_system_prompt(self) -> None:
-        """Update system prompt in message history"""
-        sys_text = self.get_system_prompt().strip()
+    def upsert_system_prompt(self, session: Optional[ChatSession] = None) -> None:
+        """Update system prompt in a session's message history (default: the active session).
+        
+        The prompt is replaced in place and only if its text changed, so the
+        prefix sent to the server stays byte-identical and its prompt cache hits.
+        """
+        session = session or self.session
+        sys_text = self.get_system_prompt(session).strip()
         
         if not sys_text.endswith((".", "!", "?")):
             sys_text += "."
         
-        # Remove existing system messages
-        self.messages = [m for m in self.messages if m.get("role") != "system"]
-        # Insert as first message
-        self.messages.insert(0, {"role": "system", "content": sys_text})
\ No newline at end of file
+        with self._history_lock:
+            messages = session.messages
+            if messages and messages[0].get("role") == "system":
+                if messages[0]["content"] != sys_text:
+                    # A new dict: snapshots and prompts built earlier keep the old one
+                    messages[0] = {"role": "system", "content": sys_text}
+            else:
+                messages.insert(0, {"role": "system", "content": sys_text})
\ No newline at end of file
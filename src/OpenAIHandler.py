@@ -0,0 +1,222 @@
+import base64
+import json
+import threading
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+import httpx
+from OllamaHandler import OllamaHandler, PREFILL_OPTIONS
+from Metrics import TurnMetrics, NS_PER_SECOND
+
+DEFAULT_BASE_URL = "http://127.0.0.1:8080/v1"  # llama.cpp server default
+DEFAULT_TIMEOUT = 120.0
+CONNECT_TIMEOUT = 5.0
+
+# Ollama option name -> OpenAI request field
+OPTION_FIELDS = {
+    "temperature": "temperature",
+    "top_p": "top_p",
+    "seed": "seed",
+    "stop": "stop",
+    "num_predict": "max_tokens",
+}
+
+def _counters(payload: Mapping[str, Any]) -> Dict[str, int]:
+    """Ollama-style metric counters from OpenAI `usage` and llama.cpp `timings`"""
+    counters = {}
+    usage = payload.get("usage") or {}
+    if usage:
+        counters["prompt_eval_count"] = usage.get("prompt_tokens")
+        counters["eval_count"] = usage.get("completion_tokens")
+    timings = payload.get("timings") or {}
+    if timings:
+        counters["prompt_eval_count"] = timings.get("prompt_n")
+        counters["eval_count"] = timings.get("predicted_n")
+        if timings.get("prompt_ms") is not None:
+            counters["prompt_eval_duration"] = int(timings["prompt_ms"] * NS_PER_SECOND / 1000)
+        if timings.get("predicted_ms") is not None:
+            counters["eval_duration"] = int(timings["predicted_ms"] * NS_PER_SECOND / 1000)
+    return {name: value for name, value in counters.items() if value is not None}
+
+def _image_url(image: bytes) -> str:
+    """data: URL of an attached image (Attachments re-encodes them as PNG or JPEG)"""
+    kind = "png" if image.startswith(b"\x89PNG") else "jpeg"
+    return f"data:image/{kind};base64,{base64.b64encode(image).decode('ascii')}"
+
+def _message(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Chat-completions message: Ollama-style `images` become image_url content parts"""
+    images = message.get("images")
+    if not images:
+        return message
+    parts = [{"type": "text", "text": message["content"]}]
+    parts += [{"type": "image_url", "image_url": {"url": _image_url(image)}} for image in images]
+    return {**{k: v for k, v in message.items() if k != "images"}, "content": parts}
+
+class OpenAIClient:
+    """Minimal client for an OpenAI-compatible server (llama.cpp server, vLLM, ...).
+
+    Besides chat, it answers `list`, `ps` and `show` in the shape ModelCatalog
+    expects from the ollama module. Every served model counts as loaded.
+    """
+
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, api_key: Optional[str] = None,
+                 timeout: float = DEFAULT_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.http = httpx.Client(base_url=self.base_url, headers=headers,
+                                 timeout=httpx.Timeout(timeout, connect=CONNECT_TIMEOUT))
+        self._models: Dict[str, Dict[str, Any]] = {}
+
+    def models(self) -> List[Dict[str, Any]]:
+        """Entries of GET /models"""
+        response = self.http.get("/models")
+        response.raise_for_status()
+        models = response.json().get("data") or []
+        self._models = {m["id"]: m for m in models}
+        return models
+
+    def list(self) -> Dict[str, Any]:
+        return {"models": [
+            {"model": m["id"], "digest": f"{self.base_url}/{m['id']}", "size": 0} for m in self.models()
+        ]}
+
+    def ps(self) -> Dict[str, Any]:
+        return self.list()
+
+    def show(self, model: str) -> Dict[str, Any]:
+        """Context length as reported by llama.cpp (meta.n_ctx_train) or vLLM (max_model_len)"""
+        entry = self._models.get(model, {})
+        context = entry.get("max_model_len") or (entry.get("meta") or {}).get("n_ctx_train")
+        return {"details": None, "modelinfo": {"server.context_length": context} if context else {}}
+
+    def request_body(self, model: str, messages: List[Dict[str, Any]], options: Optional[Mapping[str, Any]],
+                     stream: bool) -> Dict[str, Any]:
+        """Chat completion request with Ollama-style options and images mapped to OpenAI fields"""
+        request = {"model": model, "messages": [_message(m) for m in messages], "stream": stream}
+        for name, field in OPTION_FIELDS.items():
+            if options and options.get(name) is not None:
+                request[field] = options[name]
+        if stream:
+            request["stream_options"] = {"include_usage": True}
+        return request
+
+    def chat(self, model: str, messages: List[Dict[str, Any]],
+             options: Optional[Mapping[str, Any]] = None) -> Dict[str, Any]:
+        """POST /chat/completions and return the response body"""
+        response = self.http.post("/chat/completions", json=self.request_body(model, messages, options, False))
+        response.raise_for_status()
+        return response.json()
+
+    def chat_stream(self, model: str, messages: List[Dict[str, Any]],
+                    options: Optional[Mapping[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+        """Streamed chat completion: yields each server-sent event; closing the generator drops the connection"""
+        request = self.request_body(model, messages, options, True)
+        with self.http.stream("POST", "/chat/completions", json=request) as response:
+            if response.is_error:
+                response.read()
+                response.raise_for_status()
+            for line in response.iter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                yield json.loads(data)
+
+    def close(self) -> None:
+        self.http.close()
+
+class OpenAIHandler(OllamaHandler):
+    """Chat handler for OpenAI-compatible local servers.
+
+    Queueing, history, context trimming, storage, caching and metrics are
+    shared with OllamaHandler; only the requests differ. The server decides
+    which models are loaded, so there is no residency management.
+    """
+
+    backend = "openai"
+    tool_calling = False  # servers differ too much in tool call support
+    model_comparison = False  # compare mode uses the Ollama client (ps, keep_alive)
+
+    def __init__(self, model: Optional[str] = None, name: Optional[str] = None, stream: bool = True,
+                 workers: int = 1, base_url: str = DEFAULT_BASE_URL, api_key: Optional[str] = None,
+                 timeout: float = DEFAULT_TIMEOUT):
+        super().__init__(model, name, stream, workers)
+        self.client = OpenAIClient(base_url, api_key, timeout)
+        self.catalog_client = self.client
+
+    def initialize(self) -> None:
+        """Models are loaded by the server; only prepare the history"""
+        self.upsert_system_prompt()
+
+    def cleanup(self) -> None:
+        self.cancel_prefill()
+        self._close_prefill()
+        self.dispatcher.shutdown()
+        if self.response_cache:
+            self.response_cache.save()
+        self.client.close()
+
+    def get_available_models(self) -> List[str]:
+        """Get list of models served by the endpoint"""
+        try:
+            return sorted([m["id"] for m in self.client.models()], key=str.lower)
+        except Exception as e:
+            raise Exception(f"Failed to get models from {self.client.base_url}: {e}")
+
+    def set_model(self, model: str) -> None:
+        """Set the current model"""
+        self.cancel_prefill()
+        previous, self.model = self.model, model
+        self._switch_conversation(previous)
+
+    def _chat(self, prompt: List[Dict[str, Any]], turn: TurnMetrics, tools: Optional[List[Dict[str, Any]]] = None,
+              calls: Optional[List[Dict[str, Any]]] = None) -> str:
+        response = self.client.chat(self.model, prompt, self.options)
+        turn.first_token()
+        turn.apply_response(_counters(response))
+        return response["choices"][0]["message"]["content"] or ""
+
+    def _stream_reply(self, prompt: List[Dict[str, Any]], cancel_event: threading.Event, turn: TurnMetrics,
+                      key: int, tools: Optional[List[Dict[str, Any]]] = None,
+                      calls: Optional[List[Dict[str, Any]]] = None) -> str:
+        parts = []
+        chunks = 0
+        reported = False
+
+        stream = self.client.chat_stream(self.model, prompt, self.options)
+        try:
+            for event in stream:
+                if cancel_event.is_set():
+                    break
+                for choice in event.get("choices") or []:
+                    content = (choice.get("delta") or {}).get("content")
+                    if content:
+                        chunks += 1
+                    self._add_chunk(parts, content, turn, key)
+                counters = _counters(event)
+                if counters:
+                    turn.apply_response(counters)
+                    reported = True
+        finally:
+            stream.close()
+
+        # Servers without usage reporting stream roughly one token per event
+        if not reported and chunks:
+            turn.apply_response({"eval_count": chunks})
+        return "".join(parts)
+
+    def _prefill_request(self, prompt: List[Dict[str, Any]]) -> Tuple[str, Dict[str, str], str, Dict[str, Any]]:
+        # llama.cpp keeps the evaluated prompt in its slot cache (cache_prompt)
+        body = self.client.request_body(self.model, prompt, PREFILL_OPTIONS, True)
+        body["cache_prompt"] = True
+        return self.client.base_url, dict(self.client.http.headers), "/chat/completions", body
+
+    def _prefill_counters(self, line: str) -> Dict[str, Any]:
+        data = line[len("data:"):].strip() if line.startswith("data:") else ""
+        if not data or data == "[DONE]":
+            return {}
+        return _counters(json.loads(data))
+
+    def _summarize(self, summary: str, messages: List[Dict[str, Any]]) -> str:
+        response = self.client.chat(self.model, self._summary_prompt(summary, messages))
+        return (response["choices"][0]["message"]["content"] or "").strip()
@@ -0,0 +1,26 @@
+import os
+
+APP_NAME = "jay"
+
+def data_dir() -> str:
+    """Per-user data directory ($XDG_DATA_HOME/jay), created on demand"""
+    base = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    path = os.path.join(base, APP_NAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def config_dir() -> str:
+    """Per-user config directory ($XDG_CONFIG_HOME/jay), created on demand"""
+    base = os.environ.get("XDG_CONFIG_HOME") or os.path.join(os.path.expanduser("~"), ".config")
+    path = os.path.join(base, APP_NAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def runtime_dir() -> str:
+    """Per-user directory for sockets ($XDG_RUNTIME_DIR/jay, else run/ in the data directory), created on demand"""
+    base = os.environ.get("XDG_RUNTIME_DIR")
+    path = os.path.join(base, APP_NAME) if base else os.path.join(data_dir(), "run")
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    # Only this user may reach the sockets inside, even if the directory already existed
+    os.chmod(path, 0o700)
+    return path
@@ -0,0 +1,146 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+import ollama
+from ModelOptions import options_for, load_options
+
+DEFAULT_IDLE_TIMEOUT = 30 * 60  # seconds a model stays loaded after its last request
+MAX_RECENT = 8
+SHUTDOWN_TIMEOUT = 2.0
+
+class ResidencyManager:
+    """Decides which models stay loaded in Ollama's memory.
+
+    - Every request carries `keep_alive` = the idle timeout, so Ollama unloads
+      models nobody used for that long (None keeps them loaded indefinitely).
+    - Switching models unloads the previous one in the background. With a
+      memory budget, the previous model may stay resident while everything
+      fits; least recently used models are evicted once loaded models exceed it.
+    - With a budget, the next likely model (most recently used besides the
+      current one) is pre-warmed in the background if it fits.
+
+    Loaded models and their sizes come from `ollama.ps`.
+    """
+
+    def __init__(self, client: Any = ollama, idle_timeout: Optional[float] = DEFAULT_IDLE_TIMEOUT,
+                 memory_budget: Optional[int] = None, prewarm: bool = True):
+        self.client = client
+        self.idle_timeout = idle_timeout
+        self.memory_budget = memory_budget  # bytes
+        self.prewarm_enabled = prewarm
+        self.option_profiles: Dict[str, Dict[str, Any]] = {}  # load with the options chats will use
+        self.current: Optional[str] = None
+        self.recent: List[str] = []  # most recently activated first
+        self._owned = set()  # models this app loaded
+        self._lock = threading.Lock()
+        self._change_callback: Optional[Callable[[], None]] = None
+
+    @property
+    def keep_alive(self) -> float:
+        """keep_alive value for requests (-1 keeps the model loaded, 0 unloads it after each request)"""
+        return -1 if self.idle_timeout is None else self.idle_timeout
+
+    def set_change_callback(self, callback: Callable[[], None]) -> None:
+        """Set callback run (from a background thread) after models were loaded or unloaded"""
+        self._change_callback = callback
+
+    def activate(self, model: str, wait: bool = False) -> None:
+        """Make model the current one: load it, release the previous one, then pre-warm"""
+        previous = self.current
+        self.current = model
+        self.recent = [model] + [m for m in self.recent if m != model][:MAX_RECENT - 1]
+
+        def switch():
+            with self._lock:
+                try:
+                    self.load(model)
+                except Exception as e:
+                    print(f"Failed to load {model}: {e}")
+                    if wait:
+                        raise
+                if previous and previous != model and self.memory_budget is None:
+                    self.unload(previous)
+                self.enforce_budget()
+                self.prewarm()
+            self._notify()
+
+        if wait:
+            switch()
+        else:
+            threading.Thread(target=switch, daemon=True).start()
+
+    def load(self, model: str) -> None:
+        """Load model into memory (a chat request without messages)"""
+        self.client.chat(model=model, keep_alive=self.keep_alive,
+                         options=load_options(options_for(self.option_profiles, model)))
+        self._owned.add(model)
+
+    def unload(self, model: str) -> None:
+        try:
+            self.client.chat(model=model, keep_alive=0)
+        except Exception as e:
+            print(f"Failed to unload {model}: {e}")
+        self._owned.discard(model)
+
+    def resident(self) -> Dict[str, int]:
+        """Loaded models and their memory use in bytes"""
+        try:
+            return {m["model"]: m["size"] or 0 for m in self.client.ps()["models"]}
+        except Exception as e:
+            print(f"Failed to get running models: {e}")
+            return {}
+
+    def next_likely(self) -> Optional[str]:
+        """Most recently used model other than the current one"""
+        return next((m for m in self.recent if m != self.current), None)
+
+    def enforce_budget(self) -> None:
+        """Unload least recently used models until loaded models fit the memory budget"""
+        if self.memory_budget is None:
+            return
+        loaded = self.resident()
+        total = sum(loaded.values())
+        # Models loaded by someone else or never used here go first, then oldest first
+        ranked = sorted(loaded, key=lambda m: self.recent.index(m) if m in self.recent else len(self.recent),
+                        reverse=True)
+        for model in ranked:
+            if total <= self.memory_budget:
+                break
+            if model == self.current:
+                continue
+            self.unload(model)
+            total -= loaded[model]
+
+    def prewarm(self) -> None:
+        """Load the next likely model if it fits the memory budget"""
+        candidate = self.next_likely()
+        # With an idle timeout of 0 a pre-warmed model would be unloaded again right away
+        if not self.prewarm_enabled or self.memory_budget is None or not candidate or self.idle_timeout == 0:
+            return
+        loaded = self.resident()
+        if candidate in loaded:
+            return
+        try:
+            sizes = {m["model"]: m["size"] or 0 for m in self.client.list()["models"]}
+        except Exception as e:
+            print(f"Failed to get model sizes: {e}")
+            return
+        if candidate not in sizes or sum(loaded.values()) + sizes[candidate] > self.memory_budget:
+            return
+        try:
+            self.load(candidate)
+        except Exception as e:
+            print(f"Failed to pre-warm {candidate}: {e}")
+
+    def shutdown(self, timeout: float = SHUTDOWN_TIMEOUT) -> None:
+        """Unload the models this app loaded without blocking exit for long"""
+        threads = [threading.Thread(target=self.unload, args=(model,), daemon=True) for model in list(self._owned)]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + timeout
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+    def _notify(self) -> None:
+        if self._change_callback:
+            self._change_callback()
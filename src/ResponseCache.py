@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Mapping, Optional
+from Paths import data_dir
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_WINDOW = 3  # trailing messages (including the new one) that make up the key
+SAVE_EVERY = 16
+
+def is_deterministic(options: Optional[Mapping[str, Any]]) -> bool:
+    """Whether sampling options allow reusing a reply: temperature 0 or a fixed seed.
+
+    An unset temperature means the server default (0.8 for Ollama), which samples.
+    """
+    options = options or {}
+    return options.get("seed") is not None or options.get("temperature") == 0
+
+class ResponseCache:
+    """LRU cache of replies keyed on model, system prompt and the recent message window.
+
+    Entries expire after `ttl` seconds, the least recently used entry is evicted
+    past `max_entries`, and the cache is persisted to a JSON file between runs.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 ttl: float = DEFAULT_TTL, window: int = DEFAULT_WINDOW):
+        self.path = path or os.path.join(data_dir(), "response_cache.json")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.window = window
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._unsaved = 0
+        self.load()
+
+    def key(self, model: str, messages: List[Dict[str, Any]], options: Optional[Mapping[str, Any]] = None) -> str:
+        """Hash of model, request options, every system message (prompt, summary, recall) and the trailing window"""
+        system = [m["content"] for m in messages if m.get("role") == "system"]
+        recent = [(m["role"], m["content"]) for m in messages if m.get("role") != "system"][-self.window:]
+        # num_predict, num_ctx and the like change the reply (e.g. a cut-off one)
+        payload = json.dumps([model, dict(sorted((options or {}).items())), system, recent],
+                             ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.time() - entry["time"] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry["reply"]
+
+    def put(self, key: str, reply: str) -> None:
+        with self._lock:
+            self._entries[key] = {"reply": reply, "time": time.time()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._unsaved += 1
+            save = self._unsaved >= SAVE_EVERY
+        if save:
+            self.save()
+
+    def stats(self) -> str:
+        return f"cache {self.hits} hit / {self.misses} miss"
+
+    def load(self) -> None:
+        """Load unexpired entries from disk"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        now = time.time()
+        with self._lock:
+            for key, entry in entries[-self.max_entries:]:
+                if now - entry["time"] <= self.ttl:
+                    self._entries[key] = entry
+
+    def save(self) -> None:
+        """Write entries (LRU order) to disk atomically"""
+        with self._lock:
+            entries = list(self._entries.items())
+            self._unsaved = 0
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Failed to save response cache: {e}")
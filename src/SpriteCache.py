@@ -0,0 +1,82 @@
+from PIL import Image, ImageEnhance, ImageOps, ImageTk
+from typing import Callable, Dict, List, Tuple
+
+IDLE_SPRITE = "assets/jay.png"
+ACTIVE_SPRITE = "assets/jay-active.png"
+FRAME_MS = 120
+
+def _bob(offsets: List[int]) -> Callable[[Image.Image], List[Image.Image]]:
+    """Frames shifting the sprite vertically by the given pixel offsets"""
+    def frames(image: Image.Image) -> List[Image.Image]:
+        result = []
+        for dy in offsets:
+            frame = Image.new(image.mode, image.size)
+            frame.paste(image, (0, dy))
+            result.append(frame)
+        return result
+    return frames
+
+def _pulse(levels: List[float], grayscale: bool = False) -> Callable[[Image.Image], List[Image.Image]]:
+    """Frames cycling the sprite brightness"""
+    def frames(image: Image.Image) -> List[Image.Image]:
+        alpha = image.getchannel("A")
+        rgb = ImageOps.grayscale(image).convert("RGB") if grayscale else image.convert("RGB")
+        result = []
+        for level in levels:
+            frame = ImageEnhance.Brightness(rgb).enhance(level).convert("RGBA")
+            frame.putalpha(alpha)
+            result.append(frame)
+        return result
+    return frames
+
+def _tint(color: Tuple[int, int, int], amount: float) -> Callable[[Image.Image], List[Image.Image]]:
+    """Single frame blended towards a color"""
+    def frames(image: Image.Image) -> List[Image.Image]:
+        image = image.convert("RGBA")
+        overlay = Image.new("RGBA", image.size, color + (255,))
+        tinted = Image.blend(image, overlay, amount)
+        tinted.putalpha(image.getchannel("A"))
+        return [tinted]
+    return frames
+
+# state -> (source sprite, frame generator)
+STATES = {
+    "idle": (IDLE_SPRITE, lambda image: [image]),
+    "active": (ACTIVE_SPRITE, lambda image: [image]),
+    "thinking": (ACTIVE_SPRITE, _bob([0, -2, -4, -2])),
+    "streaming": (ACTIVE_SPRITE, _pulse([1.0, 1.1, 1.2, 1.1])),
+    "error": (IDLE_SPRITE, _tint((220, 40, 40), 0.35)),
+    "loading": (IDLE_SPRITE, _pulse([0.7, 0.85, 1.0, 0.85], grayscale=True)),
+}
+
+class SpriteCache:
+    """Decoded, scaled character sprites per state and size.
+
+    Source images are decoded once and every (state, size) pair is turned into
+    PhotoImage frames once, so state changes and animation only swap images.
+    Must be used from the Tk thread after the root window exists.
+    """
+
+    def __init__(self):
+        self._sources: Dict[str, Image.Image] = {}
+        self._frames: Dict[Tuple[str, Tuple[int, int]], List[ImageTk.PhotoImage]] = {}
+
+    def preload(self, size: Tuple[int, int]) -> None:
+        """Build frames for every state at this size"""
+        for state in STATES:
+            self.frames(state, size)
+
+    def frames(self, state: str, size: Tuple[int, int]) -> List[ImageTk.PhotoImage]:
+        """PhotoImage frames for a state (a single frame for static states)"""
+        key = (state, size)
+        if key not in self._frames:
+            path, make_frames = STATES[state]
+            image = self._source(path).resize(size)
+            self._frames[key] = [ImageTk.PhotoImage(frame) for frame in make_frames(image)]
+        return self._frames[key]
+
+    def _source(self, path: str) -> Image.Image:
+        if path not in self._sources:
+            with Image.open(path) as image:
+                self._sources[path] = image.convert("RGBA")
+        return self._sources[path]
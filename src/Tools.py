@@ -0,0 +1,286 @@
+import ast
+import json
+import math
+import operator
+import os
+import shutil
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+DEFAULT_TIMEOUT = 5.0  # seconds per call
+MAX_WORKERS = 4
+CACHE_SIZE = 256
+READ_LIMIT = 8000  # characters returned by read_file
+MAX_EXPONENT = 10000
+MAX_RESULT_BITS = 100000
+TOOLS_PROMPT = (
+    "- For the current date or time, arithmetic and anything else the available tools cover, "
+    "use them instead of guessing."
+)
+
+CLIPBOARD_COMMANDS = (
+    ("pbpaste",),
+    ("wl-paste", "--no-newline"),
+    ("xclip", "-selection", "clipboard", "-o"),
+    ("xsel", "--clipboard", "--output"),
+    ("powershell", "-NoProfile", "-Command", "Get-Clipboard"),
+)
+
+class Tool:
+    """A local function the model may call.
+
+    `parameters` maps argument names to (JSON type, description); `pure`
+    tools always give the same result for the same arguments, so their
+    results are cached.
+    """
+
+    def __init__(self, name: str, description: str, run: Callable[..., str],
+                 parameters: Optional[Dict[str, Tuple[str, str]]] = None, required: Tuple[str, ...] = (),
+                 pure: bool = False, timeout: float = DEFAULT_TIMEOUT):
+        self.name = name
+        self.description = description
+        self.run = run
+        self.parameters = parameters or {}
+        self.required = required
+        self.pure = pure
+        self.timeout = timeout
+
+    def spec(self) -> Dict[str, Any]:
+        """Ollama `tools` entry"""
+        return {"type": "function", "function": {
+            "name": self.name,
+            "description": self.description,
+            "parameters": {
+                "type": "object",
+                "properties": {name: {"type": kind, "description": text}
+                               for name, (kind, text) in self.parameters.items()},
+                "required": list(self.required),
+            },
+        }}
+
+def as_call(call: Any) -> Dict[str, Any]:
+    """Plain dict of a tool call from a chat response"""
+    function = call["function"]
+    arguments = function.get("arguments") or {}
+    if isinstance(arguments, str):
+        arguments = json.loads(arguments or "{}")
+    return {"function": {"name": function["name"], "arguments": dict(arguments)}}
+
+class ToolRegistry:
+    """Local tools offered to the model, run on a shared thread pool.
+
+    The calls of one response run in parallel, each bounded by its tool's
+    timeout; a call that overruns is reported to the model as timed out and
+    left to finish in the background. Results of pure tools are cached.
+    """
+
+    def __init__(self, tools: Optional[List[Tool]] = None, workers: int = MAX_WORKERS,
+                 cache_size: int = CACHE_SIZE):
+        self.tools: Dict[str, Tool] = {}
+        for tool in tools or []:
+            self.register(tool)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tool")
+
+    def register(self, tool: Tool) -> None:
+        self.tools[tool.name] = tool
+
+    def set_timeouts(self, timeouts: Mapping[str, float]) -> None:
+        """Override the timeout of tools by name"""
+        for name, timeout in timeouts.items():
+            if name in self.tools:
+                self.tools[name].timeout = timeout
+
+    def specs(self) -> List[Dict[str, Any]]:
+        return [tool.spec() for tool in self.tools.values()]
+
+    def run(self, calls: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """Run tool calls in parallel; returns one tool message per call, in call order"""
+        started = time.monotonic()
+        pending = []
+        for call in calls:
+            name, arguments = call["function"]["name"], call["function"]["arguments"]
+            tool = self.tools.get(name)
+            if tool is None:
+                pending.append((name, None, f"Error: unknown tool {name}"))
+                continue
+            cached = self._cached(tool, arguments)
+            if cached is not None:
+                pending.append((name, None, cached))
+            else:
+                pending.append((name, self._pool.submit(self._call, tool, arguments), None))
+
+        messages = []
+        for name, future, result in pending:
+            if future is not None:
+                # Every call's timeout counts from the start, not from when the previous result came in
+                remaining = started + self.tools[name].timeout - time.monotonic()
+                try:
+                    result = future.result(timeout=max(0.0, remaining))
+                except FutureTimeout:
+                    result = f"Error: {name} timed out"
+            messages.append({"role": "tool", "content": result, "tool_name": name})
+        return messages
+
+    def _call(self, tool: Tool, arguments: Dict[str, Any]) -> str:
+        try:
+            result = str(tool.run(**arguments))
+        except Exception as e:
+            return f"Error: {e}"
+        if tool.pure:
+            with self._lock:
+                self._cache[self._key(tool, arguments)] = result
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return result
+
+    def _cached(self, tool: Optional[Tool], arguments: Dict[str, Any]) -> Optional[str]:
+        if tool is None or not tool.pure:
+            return None
+        key = self._key(tool, arguments)
+        with self._lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+            return result
+
+    @staticmethod
+    def _key(tool: Tool, arguments: Dict[str, Any]) -> Tuple[str, str]:
+        return tool.name, json.dumps(arguments, sort_keys=True, default=str)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+def current_time(timezone: str = "") -> str:
+    """Local time, or the time in an IANA time zone such as Asia/Tokyo"""
+    try:
+        now = datetime.now(ZoneInfo(timezone)) if timezone else datetime.now().astimezone()
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"unknown time zone {timezone!r} (use an IANA name like Europe/Paris)")
+    return now.strftime("%A %Y-%m-%d %H:%M:%S %Z (UTC%z)")
+
+_OPERATORS = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod, ast.Pow: operator.pow,
+    ast.USub: operator.neg, ast.UAdd: operator.pos,
+}
+_NAMES = {"pi": math.pi, "e": math.e, "tau": math.tau}
+_FUNCTIONS = {
+    "sqrt": math.sqrt, "exp": math.exp, "log": math.log, "log10": math.log10, "log2": math.log2,
+    "sin": math.sin, "cos": math.cos, "tan": math.tan, "asin": math.asin, "acos": math.acos, "atan": math.atan,
+    "floor": math.floor, "ceil": math.ceil, "factorial": math.factorial,
+    "abs": abs, "round": round, "min": min, "max": max,
+}
+
+def _evaluate(node: ast.AST) -> Any:
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return node.value
+    if isinstance(node, ast.Name) and node.id in _NAMES:
+        return _NAMES[node.id]
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _OPERATORS:
+        return _OPERATORS[type(node.op)](_evaluate(node.operand))
+    if isinstance(node, ast.BinOp) and type(node.op) in _OPERATORS:
+        left, right = _evaluate(node.left), _evaluate(node.right)
+        if isinstance(node.op, ast.Pow) and (abs(right) > MAX_EXPONENT or
+                                             abs(left) > 1 and right * math.log2(abs(left)) > MAX_RESULT_BITS):
+            raise ValueError("result too large")
+        return _OPERATORS[type(node.op)](left, right)
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in _FUNCTIONS
+            and not node.keywords):
+        args = [_evaluate(arg) for arg in node.args]
+        if node.func.id == "factorial" and args and args[0] > MAX_EXPONENT:
+            raise ValueError("argument too large")
+        return _FUNCTIONS[node.func.id](*args)
+    raise ValueError(f"unsupported expression: {ast.unparse(node)}")
+
+def calculate(expression: str) -> str:
+    """Evaluate an arithmetic expression (no names beyond math constants and functions)"""
+    return str(_evaluate(ast.parse(expression.replace("^", "**"), mode="eval")))
+
+def _size(size: int) -> str:
+    for unit in ("bytes", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size} {unit}" if unit == "bytes" else f"{size:.1f} {unit}"
+        size /= 1024
+
+def allowed_path(path: str, roots: Sequence[str]) -> str:
+    """Real path of path if it lies in one of the folders in roots (symlinks resolved)"""
+    real = os.path.realpath(os.path.expanduser(path))
+    for root in roots:
+        root = os.path.realpath(os.path.expanduser(root))
+        try:
+            if os.path.commonpath([real, root]) == root:
+                return real
+        except ValueError:  # another drive
+            continue
+    raise PermissionError(f"{path} is outside the folders allowed in tool_paths")
+
+def file_info(path: str) -> str:
+    """Type, size and modification time of a file or directory"""
+    path = os.path.abspath(os.path.expanduser(path))
+    stat = os.stat(path)
+    modified = datetime.fromtimestamp(stat.st_mtime).astimezone().strftime("%Y-%m-%d %H:%M:%S %Z")
+    if os.path.isdir(path):
+        return f"{path}: directory with {len(os.listdir(path))} entries, modified {modified}"
+    return f"{path}: file of {_size(stat.st_size)} ({stat.st_size} bytes), modified {modified}"
+
+def read_file(path: str, max_chars: int = READ_LIMIT) -> str:
+    """Start of a text file (at most max_chars characters)"""
+    path = os.path.abspath(os.path.expanduser(path))
+    max_chars = max(1, min(int(max_chars), READ_LIMIT))
+    with open(path, "rb") as f:
+        data = f.read(max_chars * 4 + 1)
+    if b"\0" in data[:4096]:
+        raise ValueError(f"{path} is not a text file")
+    text = data.decode("utf-8", errors="replace")
+    if len(text) > max_chars or os.path.getsize(path) > len(data):
+        return text[:max_chars] + f"\n[truncated; the file has {os.path.getsize(path)} bytes]"
+    return text
+
+def read_clipboard() -> str:
+    """Text on the clipboard, read with the platform's command-line tool"""
+    for command in CLIPBOARD_COMMANDS:
+        if shutil.which(command[0]):
+            result = subprocess.run(command, capture_output=True, timeout=DEFAULT_TIMEOUT)
+            if result.returncode == 0:
+                return result.stdout.decode("utf-8", errors="replace")[:READ_LIMIT] or "(the clipboard is empty)"
+    raise RuntimeError("no clipboard tool found (install wl-clipboard, xclip or xsel)")
+
+def default_tools(paths: Sequence[str] = (), clipboard: bool = False) -> List[Tool]:
+    """The clock and the calculator; file tools only inside paths, the clipboard only if allowed"""
+    tools = [
+        Tool("current_time", "Current date and time, locally or in another time zone.", current_time,
+             {"timezone": ("string", "IANA time zone, e.g. Asia/Tokyo; empty for local time")}, timeout=1.0),
+        Tool("calculate", "Evaluate an arithmetic expression, e.g. 2**10 / 3 or sqrt(2) * pi.", calculate,
+             {"expression": ("string", "The expression")}, ("expression",), pure=True, timeout=2.0),
+    ]
+    if paths:
+        # The folders are bound here, not passed as arguments the model could set
+        folders = ", ".join(paths)
+
+        def info(path: str) -> str:
+            return file_info(allowed_path(path, paths))
+
+        def read(path: str, max_chars: int = READ_LIMIT) -> str:
+            return read_file(allowed_path(path, paths), max_chars)
+
+        tools += [
+            Tool("file_info", f"Size, type and modification time of a file or directory in {folders}.", info,
+                 {"path": ("string", "Path of the file or directory (~ allowed)")}, ("path",)),
+            Tool("read_file", f"Read the start of a text file in {folders}.", read,
+                 {"path": ("string", "Path of the file (~ allowed)"),
+                  "max_chars": ("integer", f"Maximum characters to return (up to {READ_LIMIT})")}, ("path",)),
+        ]
+    if clipboard:
+        tools.append(Tool("read_clipboard", "Text currently on the clipboard.", read_clipboard, timeout=3.0))
+    return tools
@@ -0,0 +1,180 @@
+import time
+import tkinter as tk
+from tkinter import scrolledtext
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_MAX_LINES = 2000
+PAGE_SIZE = 20
+
+class TranscriptView:
+    """Chat transcript that keeps only a window of recent messages in the Tk widget.
+
+    Every message is kept as a record; the widget renders records[first:]. Once
+    the widget grows past max_lines the oldest rendered messages are removed, and
+    scrolling to the top pages them back in (and, past the first record, asks
+    older_provider for earlier stored messages).
+    """
+
+    def __init__(self, parent: tk.Widget, font: tuple, max_lines: int = DEFAULT_MAX_LINES,
+                 older_provider: Optional[Callable[[int, int], List[Dict[str, Any]]]] = None, **options):
+        self.text = scrolledtext.ScrolledText(parent, font=font, wrap=tk.WORD, state=tk.DISABLED, **options)
+        self.text.configure(yscrollcommand=self._on_scroll)
+        bold = (font[0], font[1], "bold")
+        self.text.tag_config("user_tag", foreground="#2c5aa0", font=bold)
+        self.text.tag_config("companion_tag", foreground="#e91e63", font=bold)
+        self.text.tag_config("meta_tag", foreground="#999999", font=(font[0], font[1] - 2))
+
+        self.max_lines = max_lines
+        self.older_provider = older_provider
+        self.records = []
+        self.first = 0
+        self.line_counts = []  # lines of each rendered record, parallel to records[first:]
+        self.stream_record = None
+        self.last_reply = None
+        self._paging = False
+        self._exhausted = False
+
+    def pack(self, **kwargs) -> None:
+        self.text.pack(**kwargs)
+
+    def clear(self) -> None:
+        """Remove every message"""
+        self._edit(lambda: self.text.delete("1.0", tk.END))
+        self.records = []
+        self.first = 0
+        self.line_counts = []
+        self.stream_record = None
+        self.last_reply = None
+        self._exhausted = False
+
+    def set_messages(self, records: List[Dict[str, Any]]) -> None:
+        """Replace the transcript with stored records (role, content, created, id)"""
+        self.clear()
+        for record in records:
+            self._append(dict(record))
+
+    def add(self, role: str, content: str, created: Optional[float] = None) -> None:
+        """Append a message"""
+        record = {"role": role, "content": content, "created": created or time.time()}
+        self._append(record)
+        if role == "assistant":
+            self._mark_last_reply(record, "end-3c")
+
+    def annotate_last_reply(self, meta: str) -> None:
+        """Add a small metadata line (e.g. timing) under the latest reply"""
+        record = self.last_reply
+        if not record or record.get("meta"):
+            return
+        record["meta"] = meta
+        index = self._rendered_index(record)
+        if index is None:
+            return
+        self._edit(lambda: self.text.insert("last_reply", "\n", (), meta, "meta_tag"))
+        self.line_counts[index] += 1
+
+    def _mark_last_reply(self, record: Dict[str, Any], index: str) -> None:
+        # Marks the end of the reply's content, where annotations go
+        self.last_reply = record
+        self.text.mark_set("last_reply", index)
+        self.text.mark_gravity("last_reply", tk.LEFT)
+
+    def _rendered_index(self, record: Dict[str, Any]) -> Optional[int]:
+        """Position of a record in line_counts, or None if it is not rendered"""
+        for index in range(len(self.records) - 1, self.first - 1, -1):
+            if self.records[index] is record:
+                return index - self.first
+        return None
+
+    def begin_stream(self) -> None:
+        """Open an empty assistant message that stream chunks are written into"""
+        self.stream_record = {"role": "assistant", "content": "", "created": time.time()}
+        self._append(self.stream_record)
+        # Chunks go in before the message's trailing blank line, so later messages stay below
+        self.text.mark_set("stream_end", "end-3c")
+        self.text.mark_gravity("stream_end", tk.RIGHT)
+
+    def append_stream(self, text: str) -> None:
+        """Append text to the open streamed message"""
+        record = self.stream_record
+        record["content"] += text
+        self._edit(lambda: self.text.insert("stream_end", text))
+        self.line_counts[self._rendered_index(record)] += text.count("\n")
+        self._trim()
+        self.text.see(tk.END)
+
+    def end_stream(self) -> None:
+        if self.stream_record:
+            self._mark_last_reply(self.stream_record, "stream_end")
+        self.stream_record = None
+
+    def total_lines(self) -> int:
+        return sum(self.line_counts)
+
+    def _render(self, record: Dict[str, Any]) -> tuple:
+        """Insert arguments (text, tags, ...) for one record"""
+        timestamp = datetime.fromtimestamp(record["created"]).strftime("%H:%M")
+        if record["role"] == "user":
+            header, tag = f"[{timestamp}] You: ", "user_tag"
+        else:
+            header, tag = f"[{timestamp}] Jay: ", "companion_tag"
+        parts = (header, tag, f"\n{record['content']}", ())
+        if record.get("meta"):
+            parts += ("\n", (), record["meta"], "meta_tag")
+        return parts + ("\n\n", ())
+
+    def _lines(self, record: Dict[str, Any]) -> int:
+        return 3 + record["content"].count("\n") + (1 if record.get("meta") else 0)
+
+    def _edit(self, change: Callable[[], None]) -> None:
+        self.text.config(state=tk.NORMAL)
+        change()
+        self.text.config(state=tk.DISABLED)
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        self.records.append(record)
+        self.line_counts.append(self._lines(record))
+        self._edit(lambda: self.text.insert(tk.END, *self._render(record)))
+        self._trim()
+        self.text.see(tk.END)
+
+    def _trim(self) -> None:
+        """Drop the oldest rendered messages while the widget is over its line cap"""
+        total = self.total_lines()
+        while total > self.max_lines and len(self.line_counts) > 1 and self.records[self.first] is not self.stream_record:
+            lines = self.line_counts.pop(0)
+            self._edit(lambda: self.text.delete("1.0", f"{lines + 1}.0"))
+            self.first += 1
+            total -= lines
+
+    def _on_scroll(self, first: str, last: str) -> None:
+        self.text.vbar.set(first, last)
+        if float(first) <= 0.0 and not self._paging and self.records:
+            self._paging = True
+            self.text.after_idle(self._page_older)
+
+    def _page_older(self) -> None:
+        """Render the previous page of messages above the current view"""
+        try:
+            if self.first == 0:
+                oldest_id = self.records[0].get("id")
+                if oldest_id is None or not self.older_provider or self._exhausted:
+                    return
+                older = self.older_provider(oldest_id, PAGE_SIZE)
+                if not older:
+                    self._exhausted = True
+                    return
+                self.records[0:0] = older
+                self.first = len(older)
+
+            count = min(PAGE_SIZE, self.first)
+            page = self.records[self.first - count:self.first]
+            for record in reversed(page):
+                self._edit(lambda: self.text.insert("1.0", *self._render(record)))
+            counts = [self._lines(r) for r in page]
+            self.line_counts[0:0] = counts
+            self.first -= count
+            # Keep the previously visible top line in place
+            self.text.yview(f"{sum(counts) + 1}.0")
+        finally:
+            self._paging = False
@@ -1,41 +1,129 @@
+import re
+import threading
 import tkinter as tk
-from tkinter import scrolledtext, messagebox
-from datetime import datetime
-from PIL import Image, ImageTk
-from typing import Callable, Optional
+from tkinter import messagebox, filedialog, simpledialog, ttk
+from typing import Callable, Optional, Tuple
 from Handler import Handler
+from TranscriptView import TranscriptView, DEFAULT_MAX_LINES
+from SpriteCache import SpriteCache, FRAME_MS
+from ModelOptions import OPTION_NAMES
+from Attachments import PASTE_LIMIT, IMAGE_EXTENSIONS, with_note
+
+try:
+    # Optional: dropping files on the chat window (pip install tkinterdnd2)
+    from tkinterdnd2 import DND_FILES, TkinterDnD
+except ImportError:
+    TkinterDnD = None
 
 GEOMETRY = "100x100"
 fontsize = 11
+STREAM_FLUSH_MS = 50
+ERROR_STATE_MS = 3000
+METRICS_REFRESH_MS = 2000
+TYPING_PAUSE_MS = 600
+TAB_LABEL_CHARS = 16
+DRAG_FRAME_MS = 16  # drag moves are applied at most once per display frame
+GEOMETRY_SAVE_MS = 500  # quiet time after a move/resize before it is reported
+DEFAULT_BUBBLE_SIZE = (750, 500)
+SCREEN_MARGIN = 120  # default character offset from the bottom-right corner
+ATTACH_FILETYPES = [
+    ("Text, PDF and images", " ".join(["*.txt", "*.log", "*.md", "*.csv", "*.json", "*.py", "*.pdf"] +
+                                      [f"*{ext}" for ext in sorted(IMAGE_EXTENSIONS)])),
+    ("All files", "*"),
+]
 to_tuple = lambda s: tuple(map(int, s.split('x')))
 
 class WindowHandler(Handler):
     """Handler for GUI window management"""
     
     def __init__(self):
-        self.root = tk.Tk()
+        self.root = TkinterDnD.Tk() if TkinterDnD else tk.Tk()
         self.chat_window = None
         self.chat_visible = False
-        self.chat_bubble_width = 750
-        self.chat_bubble_height = 500
+        self.chat_bubble_width, self.chat_bubble_height = DEFAULT_BUBBLE_SIZE
+        self.chat_bubble_position = None  # (x, y); None: centered
+        self.position = None  # character (x, y); None: bottom-right
+        self._drag_origin = None
+        self._drag_target = None
+        self._drag_job = None
+        self._geometry_job = None
         
         # Callbacks
         self.on_message_send = None
         self.on_settings_save = None
         self.on_clear_chat = None
         self.on_close_app = None
+        self.on_cancel = None
+        self.on_history_request = None
+        self.on_list_sessions = None
+        self.on_switch_session = None
+        self.on_older_history_request = None
+        self.on_metrics_open = None
+        self.on_typing_pause = None
+        self.on_auto_tune = None
+        self.on_geometry_change = None
+        self.on_tab_select = None
+        self.on_tab_new = None
+        self.on_tab_close = None
+        self.on_tab_rename = None
+        self.on_tab_system_prompt = None
+        self.on_attach_files = None
+        self.on_paste_text = None
+        self.on_attachment_remove = None
+        self.on_compare_open = None
+        self.on_compare_start = None
+        self.on_compare_stop = None
+        self.typing_pause_ms = TYPING_PAUSE_MS
+        self._typing_job = None
         
         # UI elements
         self.char_frame = None
         self.char_label = None
         self.char_image = None
+        self.status_badge = None
+        
+        # Character sprites: activity (thinking, streaming, error, loading) overrides idle/active
+        self.sprites = SpriteCache()
+        self.activity = None
+        self._frame_index = 0
+        self._animation_job = None
+        self._activity_reset_job = None
+        self._queue_depth = 0
         self.chat_history = None
+        self.transcript = None
+        self.transcript_max_lines = DEFAULT_MAX_LINES
         self.entry = None
+        self.attachment_bar = None
+        self._attachments = []  # (name, label) of the files attached to the next message
         self.model_name_label = None
+        self.queue_label = None
+        self.tab_bar = None
+        self._tabs = []  # (key, label, pending, system prompt)
+        self.active_tab = None
+        self._tab_partials = {}  # tab -> text streamed so far
+        self.status_label = None
+        self._status_segments = {}
+        self.settings_win = None
+        self._settings_model_menu = None
+        self._settings_model_var = None
+        self._settings_status = None
+        self._settings_profiles = {}
+        self._settings_option_vars = {}
+        self.compare_win = None
+        self._compare_results = None
+        self._compare_status = None
+        self._compare_columns = {}  # model -> (header, text, stats)
+        self._compare_buffer = []  # (model, chunk) not yet shown
+        self._compare_flush_pending = False
 
         # Current model name
         self.current_model = None
         
+        # Streamed reply chunks are batched into one Tk update per flush
+        self._stream_lock = threading.Lock()
+        self._stream_buffer = []
+        self._stream_flush_pending = False
+        
     def initialize(self) -> None:
         """Initialize the window handler"""
         self.setup_window()
@@ -64,42 +152,97 @@ class WindowHandler(Handler):
         except:
             pass
         
-        # Position at bottom-right
-        screen_width = self.root.winfo_screenwidth()
-        screen_height = self.root.winfo_screenheight()
-        x = screen_width - 120
-        y = screen_height - 120
+        # Saved position (kept on screen), else bottom-right
+        x, y = self.position or self.default_position()
+        x, y = self._on_screen(self.root, x, y, *to_tuple(GEOMETRY))
         self.root.geometry(f"{GEOMETRY}+{x}+{y}")
         
         # Make draggable
         self.root.bind("<Button-1>", self.start_drag)
         self.root.bind("<B1-Motion>", self.drag)
+        self.root.bind("<ButtonRelease-1>", self.stop_drag)
         self.root.bind("<Button-3>", self.show_context_menu)
     
+    def default_position(self) -> Tuple[int, int]:
+        """Character position near the bottom-right corner"""
+        return self.root.winfo_screenwidth() - SCREEN_MARGIN, self.root.winfo_screenheight() - SCREEN_MARGIN
+    
+    @staticmethod
+    def _on_screen(win, x: int, y: int, width: int, height: int) -> Tuple[int, int]:
+        """Clamp a position so the window stays on screen (e.g. after a resolution change)"""
+        x = min(max(x, 0), max(win.winfo_screenwidth() - width, 0))
+        y = min(max(y, 0), max(win.winfo_screenheight() - height, 0))
+        return x, y
+    
+    def restore_geometry(self, position: Optional[Tuple[int, int]], bubble_size: Tuple[int, int],
+                         bubble_position: Optional[Tuple[int, int]]) -> None:
+        """Use saved positions and chat bubble size (call before initialize)"""
+        self.position = tuple(position) if position else None
+        self.chat_bubble_width, self.chat_bubble_height = bubble_size
+        self.chat_bubble_position = tuple(bubble_position) if bubble_position else None
+    
     def setup_character(self) -> None:
         """Setup character display"""
         self.char_frame = tk.Frame(self.root, bg='black', width=100, height=100)
         self.char_frame.pack(pady=5)
         
-        image = Image.open("assets/jay.png")
-        image = image.resize(to_tuple(GEOMETRY))
-        self.char_image = ImageTk.PhotoImage(image)
+        self.sprites.preload(to_tuple(GEOMETRY))
+        self.char_image = self.sprites.frames("idle", to_tuple(GEOMETRY))[0]
         
         self.char_label = tk.Label(self.char_frame, image=self.char_image)
         self.char_label.pack()
         self.char_label.bind("<Button-1>", self.toggle_chat_bubble)
     
+    def character_state(self) -> str:
+        """Sprite state to show: current activity, else idle/active by chat visibility"""
+        if self.activity:
+            return self.activity
+        return "active" if self.chat_visible else "idle"
+    
     def change_character(self) -> None:
         """Change character image based on chat state"""
-        if self.chat_visible:
-            image = Image.open("assets/jay-active.png")
-        else:
-            image = Image.open("assets/jay.png")
-        
-        image = image.resize(to_tuple(GEOMETRY))
-        self.char_image = ImageTk.PhotoImage(image)
+        if not self.char_label:
+            return
+        if self._animation_job:
+            self.root.after_cancel(self._animation_job)
+            self._animation_job = None
+        self._frame_index = 0
+        self._animate()
+    
+    def _animate(self) -> None:
+        """Show the next frame; animated states reschedule themselves on one timer"""
+        frames = self.sprites.frames(self.character_state(), to_tuple(GEOMETRY))
+        self.char_image = frames[self._frame_index % len(frames)]
         self.char_label.configure(image=self.char_image)
-        self.char_label.image = self.char_image
+        self._frame_index += 1
+        if len(frames) > 1:
+            self._animation_job = self.root.after(FRAME_MS, self._animate)
+        else:
+            self._animation_job = None
+    
+    def set_activity(self, activity: Optional[str], reset_after_ms: Optional[int] = None) -> None:
+        """Set the character activity state (None returns to idle/active)"""
+        if self._activity_reset_job:
+            self.root.after_cancel(self._activity_reset_job)
+            self._activity_reset_job = None
+        if reset_after_ms:
+            self._activity_reset_job = self.root.after(reset_after_ms, lambda: self.set_activity(None))
+        if activity != self.activity:
+            self.activity = activity
+            self.change_character()
+    
+    def set_warming_up(self, warming_up: bool) -> None:
+        """Show or hide the "warming up" state on the character"""
+        self.set_activity("loading" if warming_up else None)
+        if warming_up:
+            if not self.status_badge:
+                self.status_badge = tk.Label(
+                    self.char_frame, text="warming up…", font=("Arial", fontsize - 3),
+                    bg="#ffd54f", fg="#333333"
+                )
+            self.status_badge.place(relx=0.5, rely=1.0, anchor="s")
+        elif self.status_badge:
+            self.status_badge.place_forget()
     
     def create_chat_window(self) -> None:
         """Create chat window"""
@@ -113,9 +256,15 @@ class WindowHandler(Handler):
         self.chat_window.resizable(True, True)
         
         self.set_chat_bubble_size(self.chat_bubble_width, self.chat_bubble_height)
-        self.center_window(self.chat_window)
+        if self.chat_bubble_position:
+            x, y = self._on_screen(self.chat_window, *self.chat_bubble_position,
+                                   self.chat_bubble_width, self.chat_bubble_height)
+            self.chat_window.geometry(f"+{x}+{y}")
+        else:
+            self.center_window(self.chat_window)
         
         self.chat_window.protocol("WM_DELETE_WINDOW", self.hide_chat_bubble)
+        self.chat_window.bind("<Configure>", self._chat_window_configured)
         
         # Model name label
         self.model_name_label = tk.Label(self.chat_window, text="", font=("Arial", fontsize))
@@ -123,24 +272,51 @@ class WindowHandler(Handler):
             self.model_name_label.config(text=self.current_model)
         self.model_name_label.pack(pady=5)
         
+        # Queue depth label (empty while idle)
+        self.queue_label = tk.Label(self.chat_window, text="", font=("Arial", fontsize - 2), fg="#666666", bg='#f0f0f0')
+        self.queue_label.pack()
+        
+        # Session tabs
+        self.tab_bar = tk.Frame(self.chat_window, bg='#f0f0f0')
+        self.tab_bar.pack(fill='x', padx=2)
+        self._render_tabs()
+        
         # Chat frame
         bubble_frame = tk.Frame(self.chat_window, bg='white', relief='raised', bd=1)
         bubble_frame.pack(fill='both', expand=True, padx=2, pady=2)
         
-        # Chat history
-        self.chat_history = scrolledtext.ScrolledText(
-            bubble_frame, height=10, width=35, font=("Arial", fontsize),
-            bg='#f8f9fa', wrap=tk.WORD, state=tk.DISABLED
+        # Chat history (only recent messages are kept in the widget)
+        self.transcript = TranscriptView(
+            bubble_frame, font=("Arial", fontsize), max_lines=self.transcript_max_lines,
+            older_provider=self.request_older_history, height=10, width=35, bg='#f8f9fa'
         )
-        self.chat_history.pack(fill='both', expand=True, padx=5, pady=5)
+        self.transcript.pack(fill='both', expand=True, padx=5, pady=5)
+        self.chat_history = self.transcript.text
+        
+        # Files attached to the next message
+        self.attachment_bar = tk.Frame(bubble_frame, bg='white')
+        self.attachment_bar.pack(fill='x', padx=5)
+        self._render_attachments()
         
         # Input frame
         input_frame = tk.Frame(bubble_frame, bg='white')
         input_frame.pack(fill='x', padx=5, pady=5)
         
+        attach_btn = tk.Button(
+            input_frame, text="📎", command=self.choose_attachments,
+            bg='#e0e0e0', font=("Arial", fontsize), relief='flat', cursor="hand2"
+        )
+        attach_btn.pack(side='left', padx=(0, 5))
+        
         self.entry = tk.Entry(input_frame, font=("Arial", fontsize), relief='solid', bd=1)
         self.entry.pack(side='left', fill='x', expand=True, padx=(0, 5))
         self.entry.bind("<Return>", self.handle_message_send)
+        self.entry.bind("<KeyRelease>", self._schedule_typing_pause)
+        # Large pastes become attachments instead of freezing the entry
+        self.entry.bind("<<Paste>>", self._on_paste)
+        if TkinterDnD:
+            self.chat_window.drop_target_register(DND_FILES)
+            self.chat_window.dnd_bind("<<Drop>>", self._on_drop)
         
         send_btn = tk.Button(
             input_frame, text="Send", command=self.handle_message_send,
@@ -149,8 +325,20 @@ class WindowHandler(Handler):
         )
         send_btn.pack(side='right')
         
+        stop_btn = tk.Button(
+            input_frame, text="Stop", command=self.handle_cancel,
+            bg='#e0e0e0', font=("Arial", fontsize),
+            relief='flat', cursor="hand2"
+        )
+        stop_btn.pack(side='right', padx=(0, 5))
+        
+        # Status line (cache and performance stats)
+        self.status_label = tk.Label(bubble_frame, text="", font=("Arial", fontsize - 3), fg="#888888", bg='white', anchor="w")
+        self.status_label.pack(fill='x', padx=5)
+        self._render_status()
+        
         self.chat_window.after(100, lambda: self.entry.focus_force())
-        self.add_welcome_message()
+        self.show_history(self.on_history_request() if self.on_history_request else [])
     
     def set_chat_bubble_size(self, width: int, height: int) -> None:
         """Set chat bubble size"""
@@ -159,6 +347,32 @@ class WindowHandler(Handler):
         if self.chat_window:
             self.chat_window.geometry(f"{width}x{height}")
     
+    def _chat_window_configured(self, event) -> None:
+        """Chat bubble moved or resized: remember it once the user stops"""
+        # Child widgets report their own Configure events through the toplevel binding
+        if event.widget is not self.chat_window:
+            return
+        if self._geometry_job:
+            self.root.after_cancel(self._geometry_job)
+        self._geometry_job = self.root.after(GEOMETRY_SAVE_MS, self._store_chat_geometry)
+    
+    def _store_chat_geometry(self) -> None:
+        self._geometry_job = None
+        if not self.chat_window or not self.chat_visible:
+            return
+        # "WxH+X+Y"; Tk writes negative offsets (other monitors) as "+-X"
+        match = re.match(r"(\d+)x(\d+)\+(-?\d+)\+(-?\d+)", self.chat_window.geometry())
+        if not match:
+            return
+        width, height, x, y = map(int, match.groups())
+        self.chat_bubble_width, self.chat_bubble_height = width, height
+        self.chat_bubble_position = (x, y)
+        self._geometry_changed()
+    
+    def _geometry_changed(self) -> None:
+        if self.on_geometry_change:
+            self.on_geometry_change()
+    
     def center_window(self, win: tk.Toplevel) -> None:
         """Center window on screen"""
         win.update_idletasks()
@@ -174,6 +388,72 @@ class WindowHandler(Handler):
         """Add welcome message"""
         self.add_message("Companion", "Welcome back!")
     
+    def show_history(self, messages: list) -> None:
+        """Replace the transcript with stored messages (dicts with id, role, content, created)"""
+        self._discard_stream_buffer()
+        if self.transcript:
+            self.transcript.set_messages(messages)
+        self.add_welcome_message()
+        # The active tab's reply may still be streaming
+        partial = self._tab_partials.get(self.active_tab)
+        if partial and self.transcript:
+            self.transcript.begin_stream()
+            self.transcript.append_stream(partial)
+    
+    def set_tabs(self, tabs: list, active: Optional[int]) -> None:
+        """Show session tabs ((key, label, pending requests, system prompt)) with `active` selected"""
+        if active != self.active_tab:
+            # Chunks still buffered belong to the tab being left
+            self._flush_stream()
+        self._tabs = list(tabs)
+        self.active_tab = active
+        self._render_tabs()
+    
+    def _render_tabs(self) -> None:
+        if not self.tab_bar:
+            return
+        for child in self.tab_bar.winfo_children():
+            child.destroy()
+        for key, label, pending, _ in self._tabs:
+            text = label if len(label) <= TAB_LABEL_CHARS else label[:TAB_LABEL_CHARS - 1] + "…"
+            active = key == self.active_tab
+            tab = tk.Button(
+                self.tab_bar, text=f"{text} •" if pending else text, font=("Arial", fontsize - 2),
+                relief="sunken" if active else "raised", bg="white" if active else "#e0e0e0", cursor="hand2",
+                command=lambda k=key: self.on_tab_select(k) if self.on_tab_select and k != self.active_tab else None
+            )
+            tab.pack(side="left", padx=(0, 2))
+            tab.bind("<Button-3>", lambda event, k=key: self._show_tab_menu(event, k))
+        tk.Button(self.tab_bar, text="+", font=("Arial", fontsize - 2), relief="flat", cursor="hand2",
+                  command=lambda: self.on_tab_new() if self.on_tab_new else None).pack(side="left")
+    
+    def _show_tab_menu(self, event, key: int) -> None:
+        """Rename, system prompt and close for one tab"""
+        label, system_prompt = next(((t[1], t[3]) for t in self._tabs if t[0] == key), ("", None))
+        
+        def rename():
+            name = simpledialog.askstring("Rename", "Tab name:", initialvalue=label, parent=self.chat_window)
+            if name and name.strip() and self.on_tab_rename:
+                self.on_tab_rename(key, name.strip())
+        
+        def edit_system_prompt():
+            prompt = simpledialog.askstring("System Prompt", "System prompt for this tab (empty: default):",
+                                            initialvalue=system_prompt or "", parent=self.chat_window)
+            if prompt is not None and self.on_tab_system_prompt:
+                self.on_tab_system_prompt(key, prompt)
+        
+        menu = tk.Menu(self.chat_window, tearoff=0)
+        menu.add_command(label="Rename…", command=rename)
+        menu.add_command(label="System Prompt…", command=edit_system_prompt)
+        menu.add_command(label="Close Tab", command=lambda: self.on_tab_close(key) if self.on_tab_close else None)
+        menu.tk_popup(event.x_root, event.y_root)
+    
+    def request_older_history(self, before_id: int, limit: int) -> list:
+        """Stored messages older than before_id, for paging the transcript"""
+        if not self.on_older_history_request:
+            return []
+        return self.on_older_history_request(before_id, limit)
+    
     def toggle_chat_bubble(self, event=None) -> None:
         """Toggle chat bubble visibility"""
         if self.chat_visible:
@@ -201,34 +481,99 @@ class WindowHandler(Handler):
     
     def add_message(self, sender: str, message: str) -> None:
         """Add message to chat history"""
-        if not self.chat_window or not hasattr(self, 'chat_history'):
+        if not self.chat_window or not self.transcript:
             return
         
-        timestamp = datetime.now().strftime("%H:%M")
-        self.chat_history.config(state=tk.NORMAL)
+        self.transcript.add("user" if sender == "You" else "assistant", message)
+    
+    def append_stream_chunk(self, chunk: str, tab: Optional[int] = None) -> None:
+        """Queue a streamed reply chunk of a tab (safe to call from worker threads)"""
+        with self._stream_lock:
+            self._stream_buffer.append((tab, chunk))
+            if self._stream_flush_pending:
+                return
+            self._stream_flush_pending = True
+        self.root.after(STREAM_FLUSH_MS, self._flush_stream)
+    
+    def _flush_stream(self) -> None:
+        """Write buffered chunks into the open reply"""
+        with self._stream_lock:
+            chunks = list(self._stream_buffer)
+            self._stream_buffer.clear()
+            self._stream_flush_pending = False
+        
+        # Replies of background tabs are kept until their tab is shown
+        for tab, chunk in chunks:
+            if tab is not None:
+                self._tab_partials[tab] = self._tab_partials.get(tab, "") + chunk
+        text = "".join(chunk for tab, chunk in chunks if tab is None or tab == self.active_tab)
+        if not text or not self.chat_window or not self.transcript:
+            return
         
-        if sender == "You":
-            self.chat_history.insert(tk.END, f"[{timestamp}] You: ", "user_tag")
-            self.chat_history.insert(tk.END, f"\n{message}\n\n")
-        else:
-            self.chat_history.insert(tk.END, f"[{timestamp}] Jay: ", "companion_tag")
-            self.chat_history.insert(tk.END, f"\n{message}\n\n")
+        if self.activity != "streaming":
+            self.set_activity("streaming")
+        if not self.transcript.stream_record:
+            self.transcript.begin_stream()
+        self.transcript.append_stream(text)
+    
+    def _discard_stream_buffer(self) -> None:
+        with self._stream_lock:
+            self._stream_buffer.clear()
+    
+    def finish_stream_message(self, message: str, error: bool = False, tab: Optional[int] = None) -> None:
+        """Close the streamed reply, or add the whole message if nothing was streamed"""
+        self._flush_stream()
+        self._tab_partials.pop(tab, None)
+        if tab is not None and tab != self.active_tab:
+            # Shown from the stored history when the tab is opened
+            return
         
-        self.chat_history.tag_config("user_tag", foreground="#2c5aa0", font=("Arial", fontsize, "bold"))
-        self.chat_history.tag_config("companion_tag", foreground="#e91e63", font=("Arial", fontsize, "bold"))
+        if self.transcript and self.transcript.stream_record:
+            self.transcript.end_stream()
+        else:
+            self.add_message("Companion", message)
         
-        self.chat_history.config(state=tk.DISABLED)
-        self.chat_history.see(tk.END)
+        if error:
+            self.set_activity("error", reset_after_ms=ERROR_STATE_MS)
+        else:
+            self.set_activity("thinking" if self._queue_depth > 1 else None)
+    
+    def show_turn_metrics(self, summary: str) -> None:
+        """Show a finished turn's timing under its reply and on the status line"""
+        if not summary:
+            return
+        if self.transcript:
+            self.transcript.annotate_last_reply(summary)
+        self.set_status("perf", summary)
     
     def clear_chat_display(self) -> None:
         """Clear chat display"""
-        if self.chat_window and hasattr(self, 'chat_history'):
-            self.chat_history.config(state=tk.NORMAL)
-            self.chat_history.delete("1.0", tk.END)
-            self.chat_history.config(state=tk.DISABLED)
+        self._discard_stream_buffer()
+        self._tab_partials.pop(self.active_tab, None)
+        if self.chat_window and self.transcript:
+            self.transcript.clear()
+    
+    def _schedule_typing_pause(self, event=None) -> None:
+        """Debounce keystrokes: report the draft once typing pauses"""
+        if not self.on_typing_pause:
+            return
+        self._cancel_typing_pause()
+        self._typing_job = self.root.after(self.typing_pause_ms, self._typing_paused)
+    
+    def _cancel_typing_pause(self) -> None:
+        if self._typing_job:
+            self.root.after_cancel(self._typing_job)
+            self._typing_job = None
+    
+    def _typing_paused(self) -> None:
+        self._typing_job = None
+        draft = self.entry.get().strip()
+        if draft and not draft.startswith("/"):
+            self.on_typing_pause(draft)
     
     def handle_message_send(self, event=None) -> None:
         """Handle message sending"""
+        self._cancel_typing_pause()
         message = self.entry.get().strip()
         self.entry.delete(0, tk.END)
         
@@ -236,29 +581,150 @@ class WindowHandler(Handler):
             if self.on_clear_chat:
                 self.on_clear_chat()
             return
+        elif message == "/stop":
+            self.handle_cancel()
+            return
         elif message == "/bye":
             if self.on_clear_chat:
                 self.on_clear_chat()
             self.toggle_chat_bubble()
             return
-        elif message and self.on_message_send:
-            self.add_message("You", message)
-            self.on_message_send(message)
+        else:
+            # Files alone can be sent too; ones that failed to load are not
+            names = [name for name, _, failed in self._attachments if not failed]
+            if (message or names) and self.on_message_send:
+                self.add_message("You", with_note(message, names))
+                self.on_message_send(message)
+    
+    def choose_attachments(self) -> None:
+        """Pick files to attach to the next message"""
+        paths = filedialog.askopenfilenames(parent=self.chat_window, title="Attach files", filetypes=ATTACH_FILETYPES)
+        if paths and self.on_attach_files:
+            self.on_attach_files(list(paths))
+    
+    def _on_drop(self, event) -> str:
+        if self.on_attach_files:
+            self.on_attach_files(list(self.root.tk.splitlist(event.data)))
+        return event.action
+    
+    def _on_paste(self, event=None) -> Optional[str]:
+        try:
+            text = self.root.clipboard_get()
+        except tk.TclError:
+            return None
+        if len(text) <= PASTE_LIMIT or not self.on_paste_text:
+            return None
+        self.on_paste_text(text)
+        return "break"
+    
+    def show_attachments(self, attachments: list) -> None:
+        """Show the (name, label, failed) of each file attached to the next message"""
+        self._attachments = list(attachments)
+        self._render_attachments()
+    
+    def _render_attachments(self) -> None:
+        if not self.attachment_bar:
+            return
+        for child in self.attachment_bar.winfo_children():
+            child.destroy()
+        for index, (_, label, _) in enumerate(self._attachments):
+            chip = tk.Frame(self.attachment_bar, bg='#e8eef7')
+            chip.pack(side='left', padx=(0, 4), pady=(2, 0))
+            tk.Label(chip, text=f"📎 {label}", font=("Arial", fontsize - 2), bg='#e8eef7').pack(side='left')
+            tk.Button(
+                chip, text="✕", font=("Arial", fontsize - 3), relief='flat', bg='#e8eef7', cursor="hand2",
+                command=lambda i=index: self.on_attachment_remove and self.on_attachment_remove(i)
+            ).pack(side='left')
+    
+    def handle_cancel(self) -> None:
+        """Handle stop request for the reply in progress"""
+        if self.on_cancel:
+            self.on_cancel()
     
-    def open_settings(self, current_model: str, current_name: str, available_models: list) -> None:
-        """Open settings window"""
+    def update_queue_depth(self, depth: int) -> None:
+        """Show how many requests are waiting or in progress"""
+        self._queue_depth = depth
+        if depth > 0 and self.activity is None:
+            self.set_activity("thinking")
+        elif depth == 0 and self.activity in ("thinking", "streaming"):
+            self.set_activity(None)
+        if not self.queue_label:
+            return
+        if depth <= 0:
+            self.queue_label.config(text="")
+        elif depth == 1:
+            self.queue_label.config(text="Thinking…")
+        else:
+            self.queue_label.config(text=f"Thinking… ({depth - 1} queued)")
+    
+    def set_status(self, key: str, text: Optional[str]) -> None:
+        """Set one segment of the status line (None removes it)"""
+        if text:
+            self._status_segments[key] = text
+        else:
+            self._status_segments.pop(key, None)
+        self._render_status()
+    
+    def _render_status(self) -> None:
+        if self.status_label:
+            self.status_label.config(text="  ·  ".join(self._status_segments.values()))
+    
+    def open_settings(self, current_model: str, current_name: str, models: list, status: str = "",
+                      backends: Optional[list] = None, current_backend: Optional[str] = None,
+                      profiles: Optional[dict] = None) -> None:
+        """Open settings window with the cached model list ((name, label) pairs) and option profiles"""
+        if self.settings_win and self.settings_win.winfo_exists():
+            self.settings_win.lift()
+            self.update_settings_models(models, status)
+            return
         settings_win = tk.Toplevel(self.root)
         settings_win.title("Settings")
-        settings_win.geometry("300x600")
+        settings_win.geometry("300x720")
         settings_win.resizable(False, False)
         settings_win.wm_attributes("-topmost", True)
+        self.settings_win = settings_win
+        
+        # Backend setting
+        backend_var = tk.StringVar(value=current_backend or "")
+        if backends:
+            tk.Label(settings_win, text="Backend:").pack(anchor="w", padx=10, pady=(10, 0))
+            backend_menu = tk.OptionMenu(settings_win, backend_var, *backends)
+            backend_menu.config(width=25)
+            backend_menu.pack(fill="x", padx=10, pady=5)
         
         # Model setting
         tk.Label(settings_win, text="Ollama Model:").pack(anchor="w", padx=10, pady=(10, 0))
         model_var = tk.StringVar(value=current_model)
-        model_menu = tk.OptionMenu(settings_win, model_var, *available_models)
+        model_menu = tk.OptionMenu(settings_win, model_var, current_model)
         model_menu.config(width=25)
         model_menu.pack(fill="x", padx=10, pady=5)
+        self._settings_model_var = model_var
+        self._settings_model_menu = model_menu
+        self._settings_status = tk.Label(settings_win, fg="gray", font=("Arial", 9), justify="left", wraplength=280)
+        self._settings_status.pack(anchor="w", padx=10)
+        self.update_settings_models(models, status)
+        
+        # Options of the selected model (blank: server default)
+        tk.Label(settings_win, text="Model options (blank = default):").pack(anchor="w", padx=10, pady=(10, 0))
+        options_frame = tk.Frame(settings_win)
+        options_frame.pack(fill="x", padx=10, pady=5)
+        self._settings_profiles = dict(profiles or {})
+        self._settings_option_vars = {}
+        for i, option in enumerate(OPTION_NAMES):
+            row, column = divmod(i, 2)
+            tk.Label(options_frame, text=option, font=("Arial", 9)).grid(row=row, column=2 * column, sticky="w")
+            var = tk.StringVar()
+            tk.Entry(options_frame, textvariable=var, width=7).grid(row=row, column=2 * column + 1, padx=(2, 8), pady=2)
+            self._settings_option_vars[option] = var
+        model_var.trace_add("write", lambda *_: self._show_settings_options(model_var.get()))
+        self._show_settings_options(current_model)
+        
+        def auto_tune():
+            if self.on_auto_tune:
+                self.on_auto_tune(model_var.get())
+        
+        tk.Button(settings_win, text="Auto-tune threads/batch", command=auto_tune,
+                 bg="#4a90e2", fg="white").pack(anchor="w", padx=10, pady=(0, 5))
         
         # Name setting
         tk.Label(settings_win, text="Your Name:").pack(anchor="w", padx=10, pady=(10, 0))
@@ -266,8 +732,13 @@ class WindowHandler(Handler):
         tk.Entry(settings_win, textvariable=name_var, width=30).pack(fill="x", padx=10, pady=5)
         
         def save_settings():
+            try:
+                options = self._settings_options()
+            except ValueError as e:
+                messagebox.showerror("Settings", str(e), parent=settings_win)
+                return
             if self.on_settings_save:
-                self.on_settings_save(model_var.get(), name_var.get().strip() or None)
+                self.on_settings_save(model_var.get(), name_var.get().strip() or None, backend_var.get() or None, options)
             settings_win.destroy()
         
         # Buttons
@@ -281,6 +752,212 @@ class WindowHandler(Handler):
         
         self.center_window(settings_win)
     
+    def _show_settings_options(self, model: str) -> None:
+        options = self._settings_profiles.get(model, {})
+        for option, var in self._settings_option_vars.items():
+            value = options.get(option)
+            var.set("" if value is None else str(value))
+    
+    def _settings_options(self) -> dict:
+        """Options entered in the settings window (raises ValueError for non-numbers)"""
+        options = {}
+        for option, var in self._settings_option_vars.items():
+            text = var.get().strip()
+            if not text:
+                continue
+            try:
+                options[option] = float(text) if option == "temperature" else int(text)
+            except ValueError:
+                raise ValueError(f"{option} must be a number, got '{text}'")
+        return options
+    
+    def update_settings_options(self, model: str, options: dict) -> None:
+        """Show a model's new options (e.g. after auto-tune) in an open settings window"""
+        if not (self.settings_win and self.settings_win.winfo_exists()):
+            return
+        self._settings_profiles[model] = options
+        if self._settings_model_var.get() == model:
+            self._show_settings_options(model)
+    
+    def set_settings_status(self, text: str) -> None:
+        """Show a line of progress or status below the model menu"""
+        if self.settings_win and self.settings_win.winfo_exists():
+            self._settings_status.config(text=text)
+    
+    def update_settings_models(self, models: list, status: str = "") -> None:
+        """Refresh the model menu of an open settings window in place"""
+        if not (self.settings_win and self.settings_win.winfo_exists()):
+            return
+        menu = self._settings_model_menu["menu"]
+        menu.delete(0, "end")
+        for name, label in models:
+            menu.add_command(label=label, command=lambda n=name: self._settings_model_var.set(n))
+        self._settings_status.config(text=status)
+    
+    def open_metrics(self, rows_provider: Callable[[], list], columns: list, export_callback: Callable[[str], int]) -> None:
+        """Open the metrics window: per-model p50/p95, refreshed while open"""
+        metrics_win = tk.Toplevel(self.root)
+        metrics_win.title("Metrics")
+        metrics_win.geometry("820x260")
+        metrics_win.wm_attributes("-topmost", True)
+        
+        headings = ["Model", "Turns"] + [f"{c} p50 / p95" for c in columns]
+        table = ttk.Treeview(metrics_win, columns=headings, show="headings", height=8)
+        for heading in headings:
+            table.heading(heading, text=heading)
+            table.column(heading, width=200 if heading == "Model" else 100, anchor="w" if heading == "Model" else "e")
+        table.pack(fill="both", expand=True, padx=10, pady=(10, 5))
+        
+        def fmt(value) -> str:
+            return "-" if value is None else f"{value:.2f}"
+        
+        def refresh():
+            if not metrics_win.winfo_exists():
+                return
+            table.delete(*table.get_children())
+            for row in rows_provider():
+                values = [row["model"], row["turns"]]
+                values += [f"{fmt(row[c][0])} / {fmt(row[c][1])}" for c in columns]
+                table.insert("", tk.END, values=values)
+            metrics_win.after(METRICS_REFRESH_MS, refresh)
+        
+        def export():
+            path = filedialog.asksaveasfilename(
+                parent=metrics_win, defaultextension=".csv",
+                filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl")]
+            )
+            if path:
+                try:
+                    count = export_callback(path)
+                    messagebox.showinfo("Metrics", f"Exported {count} turns to {path}", parent=metrics_win)
+                except OSError as e:
+                    messagebox.showerror("Metrics", f"Export failed: {e}", parent=metrics_win)
+        
+        tk.Button(metrics_win, text="Export…", command=export, bg="#4a90e2", fg="white", width=12).pack(pady=(0, 10))
+        refresh()
+    
+    def open_compare(self, models: list, selected: list, max_models: int) -> None:
+        """Open the compare window: one prompt sent to the checked models ((name, label) pairs), replies side by side"""
+        if self.compare_win and self.compare_win.winfo_exists():
+            self.compare_win.lift()
+            return
+        compare_win = tk.Toplevel(self.root)
+        compare_win.title("Compare Models")
+        compare_win.geometry("1000x640")
+        compare_win.wm_attributes("-topmost", True)
+        self.compare_win = compare_win
+        
+        tk.Label(compare_win, text=f"Models (up to {max_models}):").pack(anchor="w", padx=10, pady=(10, 0))
+        models_frame = tk.Frame(compare_win)
+        models_frame.pack(fill="x", padx=10)
+        model_vars = {}
+        for i, (name, label) in enumerate(models):
+            var = tk.BooleanVar(value=name in selected)
+            tk.Checkbutton(models_frame, text=label, variable=var, anchor="w").grid(row=i // 3, column=i % 3, sticky="w")
+            model_vars[name] = var
+        
+        tk.Label(compare_win, text="Prompt:").pack(anchor="w", padx=10, pady=(10, 0))
+        prompt = tk.Text(compare_win, height=3, wrap="word", font=("Arial", fontsize))
+        prompt.pack(fill="x", padx=10, pady=5)
+        
+        controls = tk.Frame(compare_win)
+        controls.pack(fill="x", padx=10)
+        race_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(controls, text="Race: keep the first complete answer, stop the others",
+                       variable=race_var).pack(side="left")
+        
+        def start():
+            chosen = [name for name, var in model_vars.items() if var.get()]
+            text = prompt.get("1.0", "end").strip()
+            if not chosen or not text:
+                messagebox.showinfo("Compare Models", "Check at least one model and enter a prompt.", parent=compare_win)
+                return
+            if len(chosen) > max_models:
+                messagebox.showinfo("Compare Models", f"Check at most {max_models} models.", parent=compare_win)
+                return
+            if self.on_compare_start:
+                self.on_compare_start(chosen, text, race_var.get())
+        
+        def stop():
+            if self.on_compare_stop:
+                self.on_compare_stop()
+        
+        def close():
+            stop()
+            compare_win.destroy()
+        
+        tk.Button(controls, text="Stop", command=stop, bg="#4a90e2", fg="white", width=10).pack(side="right", padx=(5, 0))
+        tk.Button(controls, text="Compare", command=start, bg="#4a90e2", fg="white", width=10).pack(side="right")
+        self._compare_status = tk.Label(compare_win, fg="gray", font=("Arial", 9), anchor="w")
+        self._compare_status.pack(fill="x", padx=10, pady=(5, 0))
+        self._compare_results = tk.Frame(compare_win)
+        self._compare_results.pack(fill="both", expand=True, padx=10, pady=(5, 10))
+        compare_win.protocol("WM_DELETE_WINDOW", close)
+        self.center_window(compare_win)
+    
+    def start_compare(self, models: list, status: str = "") -> None:
+        """Replace the compare results with an empty column per model"""
+        if not (self.compare_win and self.compare_win.winfo_exists()):
+            return
+        with self._stream_lock:
+            self._compare_buffer.clear()
+        # A new frame, so no column weights of a previous comparison are left
+        self._compare_results.destroy()
+        self._compare_results = tk.Frame(self.compare_win)
+        self._compare_results.pack(fill="both", expand=True, padx=10, pady=(5, 10))
+        self._compare_columns = {}
+        self._compare_status.config(text=status)
+        self._compare_results.rowconfigure(1, weight=1)
+        for column, model in enumerate(models):
+            self._compare_results.columnconfigure(column, weight=1, uniform="compare")
+            header = tk.Label(self._compare_results, text=model, font=("Arial", 10, "bold"))
+            header.grid(row=0, column=column, sticky="ew")
+            text = tk.Text(self._compare_results, wrap="word", font=("Arial", fontsize), state="disabled")
+            text.grid(row=1, column=column, sticky="nsew", padx=2)
+            stats = tk.Label(self._compare_results, text="Queued", fg="gray", font=("Arial", 9),
+                             justify="left", anchor="w", wraplength=200)
+            stats.grid(row=2, column=column, sticky="ew")
+            self._compare_columns[model] = (header, text, stats)
+    
+    def append_compare_chunk(self, model: str, chunk: str) -> None:
+        """Queue a streamed chunk of a compared model (safe to call from worker threads)"""
+        with self._stream_lock:
+            self._compare_buffer.append((model, chunk))
+            if self._compare_flush_pending:
+                return
+            self._compare_flush_pending = True
+        self.root.after(STREAM_FLUSH_MS, self._flush_compare)
+    
+    def _flush_compare(self) -> None:
+        with self._stream_lock:
+            chunks = list(self._compare_buffer)
+            self._compare_buffer.clear()
+            self._compare_flush_pending = False
+        texts = {}
+        for model, chunk in chunks:
+            texts[model] = texts.get(model, "") + chunk
+        for model, text in texts.items():
+            if model in self._compare_columns and self.compare_win.winfo_exists():
+                widget = self._compare_columns[model][1]
+                widget.config(state="normal")
+                widget.insert("end", text)
+                widget.see("end")
+                widget.config(state="disabled")
+    
+    def update_compare(self, model: str, summary: str, won: bool = False) -> None:
+        """Show a compared model's state and metrics (the race winner is highlighted)"""
+        if model not in self._compare_columns or not self.compare_win.winfo_exists():
+            return
+        self._flush_compare()
+        header, _, stats = self._compare_columns[model]
+        stats.config(text=summary)
+        if won:
+            header.config(bg="#4a90e2", fg="white")
+    
+    def set_compare_status(self, text: str) -> None:
+        if self.compare_win and self.compare_win.winfo_exists():
+            self._compare_status.config(text=text)
+    
     def update_model_label(self, model: str) -> None:
         """Update model name label"""
         self.current_model = model
@@ -289,36 +966,77 @@ class WindowHandler(Handler):
             self.model_name_label.config(text=self.current_model)
     
     def reset_chat_bubble_size(self) -> None:
-        """Reset chat bubble to default size"""
-        if self.chat_visible:
-            self.set_chat_bubble_size(self.chat_bubble_width, self.chat_bubble_height)
+        """Move the character to its default spot and reset the chat bubble size and placement"""
+        self.position = None
+        x, y = self.default_position()
+        self.root.geometry(f"+{x}+{y}")
+        self.chat_bubble_position = None
+        self.set_chat_bubble_size(*DEFAULT_BUBBLE_SIZE)
+        if self.chat_window:
             self.center_window(self.chat_window)
+        self._geometry_changed()
     
     def show_context_menu(self, event) -> None:
         """Show context menu"""
         menu = tk.Menu(self.root, tearoff=0)
         menu.add_command(label="Clear Chat", command=lambda: self.on_clear_chat() if self.on_clear_chat else None)
+        if self.on_list_sessions:
+            menu.add_cascade(label="Sessions", menu=self.build_sessions_menu(menu))
         menu.add_command(label="Settings", command=self.handle_settings)
+        if self.on_metrics_open:
+            menu.add_command(label="Metrics", command=self.on_metrics_open)
+        if self.on_compare_open:
+            menu.add_command(label="Compare Models", command=self.on_compare_open)
         menu.add_command(label="Reset Position", command=self.reset_chat_bubble_size)
         menu.add_separator()
         menu.add_command(label="Close", command=lambda: self.on_close_app() if self.on_close_app else None)
         menu.tk_popup(event.x_root, event.y_root)
     
+    def build_sessions_menu(self, parent: tk.Menu) -> tk.Menu:
+        """Submenu listing stored sessions, newest first"""
+        sessions_menu = tk.Menu(parent, tearoff=0)
+        sessions_menu.add_command(label="New Session", command=lambda: self.on_clear_chat() if self.on_clear_chat else None)
+        sessions_menu.add_separator()
+        
+        for session_id, label, active in self.on_list_sessions():
+            sessions_menu.add_command(
+                label=f"● {label}" if active else f"   {label}",
+                command=lambda sid=session_id: self.on_switch_session(sid) if self.on_switch_session else None
+            )
+        return sessions_menu
+    
     def handle_settings(self) -> None:
         """Handle settings menu click"""
         # This will be connected by the main app
         pass
     
     def start_drag(self, event) -> None:
-        """Start drag operation"""
-        self.start_x = event.x
-        self.start_y = event.y
+        """Start drag operation (the window position is queried once, not per motion event)"""
+        self._drag_origin = (self.root.winfo_x() - event.x_root, self.root.winfo_y() - event.y_root)
+        self._drag_target = None
     
     def drag(self, event) -> None:
-        """Handle drag operation"""
-        x = self.root.winfo_x() + event.x - self.start_x
-        y = self.root.winfo_y() + event.y - self.start_y
-        self.root.geometry(f"+{x}+{y}")
+        """Track the pointer; the window follows once per frame"""
+        if not self._drag_origin:
+            return
+        self._drag_target = (self._drag_origin[0] + event.x_root, self._drag_origin[1] + event.y_root)
+        if not self._drag_job:
+            self._drag_job = self.root.after(DRAG_FRAME_MS, self._apply_drag)
+    
+    def _apply_drag(self) -> None:
+        self._drag_job = None
+        if self._drag_target:
+            self.root.geometry(f"+{self._drag_target[0]}+{self._drag_target[1]}")
+    
+    def stop_drag(self, event) -> None:
+        """Place the window at the final position and remember it"""
+        if self._drag_job:
+            self.root.after_cancel(self._drag_job)
+            self._apply_drag()
+        moved, self._drag_origin, self._drag_target = self._drag_target, None, None
+        if moved:
+            self.position = moved
+            self._geometry_changed()
     
     def run(self) -> None:
         """Run the main event loop"""
@@ -328,11 +1046,62 @@ class WindowHandler(Handler):
     def set_message_callback(self, callback: Callable[[str], None]) -> None:
         self.on_message_send = callback
     
-    def set_settings_callback(self, callback: Callable[[str, str], None]) -> None:
+    def set_typing_callback(self, callback: Optional[Callable[[str], None]], pause_ms: int = TYPING_PAUSE_MS) -> None:
+        """Set callback receiving the draft after a typing pause (None disables it)"""
+        self.on_typing_pause = callback
+        self.typing_pause_ms = pause_ms
+    
+    def set_settings_callback(self, callback: Callable[[str, str, Optional[str], Optional[dict]], None]) -> None:
         self.on_settings_save = callback
     
+    def set_tab_callbacks(self, select: Callable[[int], None], new: Callable[[], None], close: Callable[[int], None],
+                          rename: Callable[[int, str], None], system_prompt: Callable[[int, str], None]) -> None:
+        self.on_tab_select = select
+        self.on_tab_new = new
+        self.on_tab_close = close
+        self.on_tab_rename = rename
+        self.on_tab_system_prompt = system_prompt
+    
+    def set_attachment_callbacks(self, attach: Callable[[list], None], paste: Callable[[str], None],
+                                 remove: Callable[[int], None]) -> None:
+        """Set callbacks for attaching files, pasting large text and removing an attachment"""
+        self.on_attach_files = attach
+        self.on_paste_text = paste
+        self.on_attachment_remove = remove
+    
+    def set_geometry_callback(self, callback: Callable[[], None]) -> None:
+        """Set callback run after the character or chat bubble was moved or resized"""
+        self.on_geometry_change = callback
+    
+    def set_auto_tune_callback(self, callback: Callable[[str], None]) -> None:
+        """Set callback starting an options sweep for a model"""
+        self.on_auto_tune = callback
+    
+    def set_compare_callbacks(self, open_compare: Callable[[], None], start: Callable[[list, str, bool], None],
+                              stop: Callable[[], None]) -> None:
+        """Set callbacks opening the compare window and starting/stopping a comparison (models, prompt, race)"""
+        self.on_compare_open = open_compare
+        self.on_compare_start = start
+        self.on_compare_stop = stop
+    
     def set_clear_callback(self, callback: Callable[[], None]) -> None:
         self.on_clear_chat = callback
     
     def set_close_callback(self, callback: Callable[[], None]) -> None:
-        self.on_close_app = callback
\ No newline at end of file
+        self.on_close_app = callback
+    
+    def set_cancel_callback(self, callback: Callable[[], None]) -> None:
+        self.on_cancel = callback
+    
+    def set_history_callback(self, callback: Callable[[], list]) -> None:
+        self.on_history_request = callback
+    
+    def set_metrics_callback(self, callback: Callable[[], None]) -> None:
+        self.on_metrics_open = callback
+    
+    def set_older_history_callback(self, callback: Callable[[int, int], list]) -> None:
+        self.on_older_history_request = callback
+    
+    def set_session_callbacks(self, list_callback: Callable[[], list], switch_callback: Callable[[int], None]) -> None:
+        self.on_list_sessions = list_callback
+        self.on_switch_session = switch_callback
\ No newline at end of file
@@ -0,0 +1,533 @@
+import time
+_STARTED = time.perf_counter()
+
+# Only the standard library is imported up front: talking to a running daemon
+# needs nothing else. The backend, config and store are imported when Jay runs
+# in this process; tkinter and PIL never are (PIL only for an attached image).
+import argparse
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from Paths import runtime_dir
+
+SOCKET_NAME = "jay.sock"
+CONNECT_TIMEOUT = 0.5
+STDIN_NAME = "stdin"
+STDIN_PATH = "-"
+HELP = "/clear starts a new conversation, /model [NAME] shows or switches the model, /bye quits; Ctrl-C stops a reply"
+
+def default_socket() -> str:
+    return os.path.join(runtime_dir(), SOCKET_NAME)
+
+def status(text: str) -> None:
+    """Progress and errors go to stderr, so stdout only carries replies"""
+    print(text, file=sys.stderr, flush=True)
+
+class TerminalChat:
+    """A chat backend driven synchronously: `ask` sends a message and blocks until its reply.
+
+    Turns run one at a time; chunks go to the `on_chunk` of the turn (the
+    whole reply when it was not streamed, e.g. a cached one).
+    """
+
+    def __init__(self, backend: Optional[str] = None, model: Optional[str] = None):
+        from Backends import DEFAULT_BACKEND, create_backend
+        from Config import ConfigStore
+        from ConversationStore import ConversationStore
+        from OllamaHandler import ERROR_PREFIX
+
+        self.config = config = ConfigStore().load()
+        self.backend = backend or config.backend
+        try:
+            self.handler = create_backend(self.backend, **config.backends.get(self.backend, {}))
+        except ValueError as e:
+            status(str(e))
+            self.backend = DEFAULT_BACKEND
+            self.handler = create_backend(self.backend)
+        self.error_prefix = ERROR_PREFIX
+        self.model = model or config.model
+        self.store = ConversationStore()
+        self.tools = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._reply = ""
+        self._streamed = False
+        self._on_chunk: Optional[Callable[[str], None]] = None
+        self.configure()
+
+    def configure(self) -> None:
+        """Apply the settings of config.json that matter without a window"""
+        config, handler = self.config, self.handler
+        handler.name = config.name
+        handler.attach_store(self.store, config.history_turns)
+        handler.set_option_profiles(
+            {model: profile.model_dump(exclude_none=True) for model, profile in config.model_options.items()}
+        )
+        handler.set_context_budget(config.context_budget, config.pinned_turns)
+        handler.model_snapshots = config.model_snapshots
+        handler.residency.idle_timeout = config.idle_timeout
+        handler.residency.prewarm_enabled = False
+        if config.tools:
+            from Tools import ToolRegistry, default_tools
+            self.tools = ToolRegistry(default_tools(config.tool_paths, config.tool_clipboard))
+            self.tools.set_timeouts(config.tool_timeouts)
+            handler.set_tools(self.tools)
+        if config.memory:
+            from LongTermMemory import LongTermMemory, ollama_embedder
+            handler.set_memory(LongTermMemory(self.store, ollama_embedder(config.memory_model),
+                                              model=config.memory_model, top_k=config.memory_top_k))
+        handler.set_chunk_callback(self._handle_chunk)
+        handler.set_response_callback(self._handle_response)
+
+    def start(self, new: bool = False) -> None:
+        """Pick and load the model, then continue the latest stored conversation (unless new)"""
+        models = self.handler.get_available_models()
+        if not models:
+            raise RuntimeError(f"the {self.backend} backend does not serve any models")
+        if self.model not in models:
+            if self.model:
+                status(f"{self.model} is not available, using {models[0]}")
+            self.model = models[0]
+        self.handler.model = self.model
+        status(f"Loading {self.model}…")
+        self.handler.initialize()
+        if not new:
+            self.handler.open_session(self.store.latest_session())
+
+    def ask(self, message: str, on_chunk: Callable[[str], None],
+            attachments: Optional[List[Any]] = None) -> Tuple[str, bool]:
+        """Send message and wait for the reply; returns (reply, failed). Ctrl-C stops the reply."""
+        with self._lock:
+            self._done.clear()
+            self._streamed = False
+            self._on_chunk = on_chunk
+            self.handler.send_message(message, attachments)
+            try:
+                self._done.wait()
+            except KeyboardInterrupt:
+                self.cancel()
+                self._done.wait()
+            if not self._streamed:
+                on_chunk(self._reply)
+            return self._reply, self._reply.startswith(self.error_prefix)
+
+    def cancel(self) -> None:
+        self.handler.cancel_current()
+
+    def _handle_chunk(self, chunk: str, tab: int = None) -> None:
+        self._streamed = True
+        if self._on_chunk:
+            self._on_chunk(chunk)
+
+    def _handle_response(self, reply: str, tab: int = None) -> None:
+        self._reply = reply
+        self._done.set()
+
+    def clear(self) -> str:
+        with self._lock:
+            self.handler.clear_history()
+        return "New conversation."
+
+    def set_model(self, model: Optional[str]) -> Tuple[str, bool]:
+        """Switch to model (None: report the current one); returns (message, failed)"""
+        if not model or model == self.model:
+            return f"Model: {self.model}", False
+        try:
+            models = self.handler.get_available_models()
+        except Exception as e:
+            return str(e), True
+        if model not in models:
+            return f"{model} is not available (installed: {', '.join(models)})", True
+        with self._lock:
+            self.model = model
+            self.handler.set_model(model)
+        return f"Model: {model}", False
+
+    def close(self) -> None:
+        self.handler.cleanup()
+        if self.tools:
+            self.tools.shutdown()
+        self.store.close()
+
+def read_attachments(paths: List[str], stdin_text: Optional[str]) -> List[Any]:
+    """Attachments of files and piped input, read now"""
+    from Attachments import Attachment
+    attachments = []
+    for path in paths:
+        try:
+            attachments.append(Attachment.from_path(path))
+        except OSError as e:
+            status(f"Skipping {path}: {e.strerror or e}")
+    if stdin_text:
+        attachments.append(Attachment.from_text(stdin_text, STDIN_NAME))
+    for attachment in attachments:
+        attachment.load()
+        if attachment.error:
+            status(f"Skipping {attachment.name}: {attachment.error}")
+    return [a for a in attachments if not a.error]
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):
+    """One client connection: JSON requests and replies, one per line.
+
+    Requests are {"prompt", "model"?, "new"?, "files"?, "stdin"?} or
+    {"command": "clear" | "model" | "stop", "model"?}; a prompt is answered
+    with {"chunk"} lines and then {"done", "failed"}, a command with {"done", "failed"}.
+    """
+
+    def handle(self) -> None:
+        chat: TerminalChat = self.server.chat
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("expected an object")
+            except ValueError as e:
+                self.send({"done": f"Bad request: {e}", "failed": True})
+                continue
+            try:
+                self.answer(chat, request)
+            except OSError:
+                # The client went away (e.g. Ctrl-C)
+                return
+
+    def answer(self, chat: "TerminalChat", request: Dict[str, Any]) -> None:
+        command = request.get("command")
+        if command == "stop":
+            self.send({"done": "Stopping.", "failed": False})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return
+        if command == "clear" or request.get("new"):
+            message = chat.clear()
+            if command:
+                self.send({"done": message, "failed": False})
+                return
+        if command == "model" or request.get("model"):
+            message, failed = chat.set_model(request.get("model"))
+            if command or failed:
+                self.send({"done": message, "failed": failed})
+                return
+        if command:
+            self.send({"done": f"Unknown command {command}", "failed": True})
+            return
+
+        def on_chunk(chunk: str) -> None:
+            try:
+                self.send({"chunk": chunk})
+            except OSError:
+                chat.cancel()
+
+        attachments = read_attachments(request.get("files") or [], request.get("stdin"))
+        reply, failed = chat.ask(str(request.get("prompt", "")), on_chunk, attachments)
+        self.send({"done": reply, "failed": failed})
+
+    def send(self, message: Dict[str, Any]) -> None:
+        self.wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+class ChatDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Keeps a TerminalChat (model loaded, history in memory) for CLI calls on a Unix socket"""
+
+    daemon_threads = True
+
+    def __init__(self, path: str, chat: TerminalChat):
+        self.chat = chat
+        # Only this user may talk to the daemon: the socket is created 0600, never briefly open to others
+        umask = os.umask(0o177)
+        try:
+            super().__init__(path, DaemonRequestHandler)
+        finally:
+            os.umask(umask)
+
+class DaemonClient:
+    """The TerminalChat interface over a connection to a running daemon"""
+
+    def __init__(self, sock: socket.socket, path: str):
+        self.sock = sock
+        self.path = path
+        self.lines = sock.makefile("rb")
+
+    @staticmethod
+    def _open(path: str) -> Optional[socket.socket]:
+        if not hasattr(socket, "AF_UNIX"):
+            return None
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(CONNECT_TIMEOUT)
+        try:
+            sock.connect(path)
+        except OSError:
+            sock.close()
+            return None
+        sock.settimeout(None)
+        return sock
+
+    @classmethod
+    def connect(cls, path: str) -> Optional["DaemonClient"]:
+        """Client of the daemon at path, or None if none is running"""
+        sock = cls._open(path)
+        return cls(sock, path) if sock else None
+
+    def reconnect(self) -> None:
+        """Open a new connection (after a reply was stopped by closing the old one)"""
+        self.close()
+        sock = self._open(self.path)
+        if sock is None:
+            raise ConnectionError("the daemon is no longer running")
+        self.sock, self.lines = sock, sock.makefile("rb")
+
+    def request(self, message: Dict[str, Any], on_chunk: Optional[Callable[[str], None]] = None) -> Tuple[str, bool]:
+        self.sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+        streamed = False
+        for line in self.lines:
+            answer = json.loads(line)
+            if "chunk" in answer:
+                streamed = True
+                if on_chunk:
+                    on_chunk(answer["chunk"])
+                continue
+            if on_chunk and not streamed:
+                on_chunk(answer["done"])
+            return answer["done"], answer["failed"]
+        raise ConnectionError("the daemon closed the connection")
+
+    def ask(self, message: str, on_chunk: Callable[[str], None], files: Optional[List[str]] = None,
+            stdin_text: Optional[str] = None, **options: Any) -> Tuple[str, bool]:
+        request = {"prompt": message, **options}
+        if files:
+            # The daemon runs on this machine and reads the files itself
+            request["files"] = [os.path.abspath(path) for path in files]
+        if stdin_text:
+            request["stdin"] = stdin_text
+        try:
+            return self.request(request, on_chunk)
+        except KeyboardInterrupt:
+            # Closing the connection makes the daemon stop the reply
+            self.close()
+            raise
+
+    def clear(self) -> str:
+        return self.request({"command": "clear"})[0]
+
+    def set_model(self, model: Optional[str]) -> Tuple[str, bool]:
+        return self.request({"command": "model", "model": model})
+
+    def stop(self) -> str:
+        return self.request({"command": "stop"})[0]
+
+    def close(self) -> None:
+        self.lines.close()
+        self.sock.close()
+
+def write_chunk(chunk: str) -> None:
+    sys.stdout.write(chunk)
+    sys.stdout.flush()
+
+def serve(path: str, args: argparse.Namespace) -> int:
+    """Run the daemon in the foreground until Ctrl-C, SIGTERM or `--stop`"""
+    import signal
+
+    if not hasattr(socket, "AF_UNIX"):
+        status("The daemon needs Unix domain sockets, which this platform does not have.")
+        return 1
+    client = DaemonClient.connect(path)
+    if client:
+        client.close()
+        status(f"A daemon is already running on {path}")
+        return 1
+    if os.path.exists(path):
+        os.unlink(path)  # left behind by a daemon that did not exit cleanly
+
+    chat = TerminalChat(args.backend, args.model)
+    # The point of the daemon is a loaded model: keep it until the daemon exits
+    chat.handler.residency.idle_timeout = None
+    try:
+        chat.start(new=args.new)
+        server = ChatDaemon(path, chat)
+    except Exception as e:
+        status(f"Failed to start: {e}")
+        chat.close()
+        return 1
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    status(f"Serving {chat.model} on {path} (Ctrl-C stops)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
+        chat.close()
+    return 0
+
+def compare(chat: TerminalChat, models: List[str], prompt: str, race: bool) -> int:
+    """Send prompt to models at once; print each reply as it finishes, then every model's metrics"""
+    from ModelCompare import DONE, ModelComparison, resident_capacity
+    from ModelOptions import options_for
+
+    handler = chat.handler
+    if not handler.model_comparison:
+        status(f"Comparing models needs an Ollama backend, not {chat.backend}.")
+        return 1
+    residency = handler.residency
+    try:
+        sizes = {m["model"]: m["size"] or 0 for m in residency.client.list()["models"]}
+    except Exception as e:
+        status(f"Error: {e}")
+        return 1
+    missing = [model for model in models if model not in sizes]
+    if missing:
+        status(f"Not installed: {', '.join(missing)}")
+        return 1
+    budget = chat.config.memory_budget_mb * 1024 * 1024 if chat.config.memory_budget_mb else None
+    capacity = resident_capacity(models, sizes, budget)
+    messages = [{"role": "system", "content": handler.get_system_prompt()}, {"role": "user", "content": prompt}]
+    comparison = ModelComparison(residency.client, models, messages,
+                                 options=lambda model: options_for(handler.option_profiles, model),
+                                 keep_alive=residency.keep_alive, capacity=capacity, race=race, backend=chat.backend)
+    lock = threading.Lock()
+
+    def finished(run) -> None:
+        if run.state == DONE and (run.won or not race):
+            with lock:
+                print(f"── {run.model} ──\n{run.text.strip()}\n", flush=True)
+
+    comparison.set_update_callback(finished)
+    status(f"Asking {len(models)} models, {capacity} at a time…")
+    comparison.start()
+    try:
+        comparison.wait()
+    except KeyboardInterrupt:
+        comparison.cancel()
+        comparison.wait()
+    for run in comparison.runs:
+        status(f"{run.model}: {run.summary()}")
+    return 0 if any(run.state == DONE for run in comparison.runs) else 1
+
+def repl(chat) -> int:
+    """Read messages until /bye or end of input, streaming each reply"""
+    try:
+        import readline  # line editing and history where available
+    except ImportError:
+        pass
+    status(HELP)
+    while True:
+        try:
+            message = input("> ").strip()
+        except EOFError:
+            print()
+            return 0
+        except KeyboardInterrupt:
+            print()
+            continue
+        if not message:
+            continue
+        command, _, argument = message.partition(" ")
+        if command in ("/bye", "/exit", "/quit"):
+            return 0
+        if command == "/clear":
+            status(chat.clear())
+        elif command == "/model":
+            status(chat.set_model(argument.strip() or None)[0])
+        elif command == "/help":
+            status(HELP)
+        else:
+            try:
+                chat.ask(message, write_chunk)
+            except KeyboardInterrupt:
+                # Only a daemon client gets here: the reply was stopped by closing its connection
+                try:
+                    chat.reconnect()
+                except ConnectionError as e:
+                    status(str(e))
+                    return 1
+            except ConnectionError as e:
+                status(str(e))
+                return 1
+            print()
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Jay - AI companion in the terminal (no window)")
+    parser.add_argument("-p", "--prompt", help="send one message, print the reply and exit")
+    parser.add_argument("-f", "--file", action="append", default=[],
+                        help="attach a file to --prompt, - for standard input (repeatable)")
+    parser.add_argument("-m", "--model", help="model to use (default: the one in config.json)")
+    parser.add_argument("--backend", help="chat backend (default: the one in config.json)")
+    parser.add_argument("--compare", metavar="MODELS", help="send --prompt to these comma-separated models at once")
+    parser.add_argument("--race", action="store_true", help="with --compare: keep the first complete answer only")
+    parser.add_argument("--new", action="store_true", help="start a new conversation instead of continuing the latest")
+    parser.add_argument("--serve", action="store_true", help="run a daemon that keeps the model and history loaded")
+    parser.add_argument("--stop", action="store_true", help="stop a running daemon")
+    parser.add_argument("--no-daemon", action="store_true", help="run in this process even if a daemon is running")
+    parser.add_argument("--socket", default=None, help="daemon socket path (default: $XDG_RUNTIME_DIR/jay/jay.sock)")
+    parser.add_argument("--timing", action="store_true", help="print the time until the model was ready")
+    args = parser.parse_args()
+    path = args.socket or default_socket()
+
+    if args.serve:
+        return serve(path, args)
+    if args.compare:
+        if args.prompt is None:
+            parser.error("--compare needs --prompt")
+        chat = TerminalChat(args.backend)
+        try:
+            return compare(chat, list(dict.fromkeys(m.strip() for m in args.compare.split(",") if m.strip())),
+                           args.prompt, args.race)
+        finally:
+            chat.close()
+    stdin_text = sys.stdin.read() if STDIN_PATH in args.file else None
+    files = [path for path in args.file if path != STDIN_PATH]
+
+    client = None if args.no_daemon else DaemonClient.connect(path)
+    if args.stop:
+        if client is None:
+            status(f"No daemon is running on {path}")
+            return 1
+        status(client.stop())
+        return 0
+
+    if client:
+        if args.timing:
+            status(f"Connected to the daemon in {time.perf_counter() - _STARTED:.3f}s")
+        try:
+            if args.prompt is None:
+                if args.new:
+                    client.clear()
+                if args.model:
+                    status(client.set_model(args.model)[0])
+                return repl(client)
+            _, failed = client.ask(args.prompt, write_chunk, files, stdin_text,
+                                   model=args.model, new=args.new)
+            print()
+            return 1 if failed else 0
+        except KeyboardInterrupt:
+            print()
+            return 130
+        except ConnectionError as e:
+            status(str(e))
+            return 1
+        finally:
+            client.close()
+
+    chat = TerminalChat(args.backend, args.model)
+    try:
+        chat.start(new=args.new)
+        if args.timing:
+            status(f"Ready in {time.perf_counter() - _STARTED:.3f}s")
+        if args.prompt is None:
+            return repl(chat)
+        _, failed = chat.ask(args.prompt, write_chunk, read_attachments(files, stdin_text))
+        print()
+        return 1 if failed else 0
+    except Exception as e:
+        status(f"Error: {e}")
+        return 1
+    finally:
+        chat.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,25 +1,183 @@
-import json
+import time
+_STARTED = time.perf_counter()
+
+import argparse
 import sys
+import threading
 from tkinter import messagebox
-from OllamaHandler import OllamaHandler
 from WindowHandler import WindowHandler
-
-CONFIG_FILE = "config.json"
+from Metrics import StartupTimer, TurnMetrics, MetricsRecorder, SUMMARY_COLUMNS
+from ConversationStore import ConversationStore
+from OllamaHandler import ERROR_PREFIX
+from ResponseCache import ResponseCache
+from ModelCatalog import ModelCatalog
+from Backends import DEFAULT_BACKEND, backend_names, create_backend
+from Config import AppConfig, ConfigStore, OptionProfile
+from ModelOptions import OPTION_NAMES, auto_tune, options_for
+from Tools import ToolRegistry, default_tools
+from Attachments import Attachment
+from ModelCompare import MAX_MODELS, ModelComparison, resident_capacity
+from pydantic import ValidationError
+NO_MODELS_MESSAGE = (
+    "No Ollama models are installed. Please install at least one model using:\n\n"
+    "ollama pull <model_name>\n\n"
+    "For example: ollama pull llama3.2:3b"
+)
 
 class DesktopCompanion():
-    def __init__(self):
-        self.ollama_handler = OllamaHandler()
-        self.window_handler = WindowHandler()
+    def __init__(self, fast_start: bool = None, timer: StartupTimer = None, show_timing: bool = False):
+        self.timer = timer or StartupTimer()
+        self.show_timing = show_timing
         
         # Load config first
+        self.config_store = ConfigStore()
+        self.config = self.config_store.load()
+        
+        # Metrics and history outlive backend switches
+        self.metrics = MetricsRecorder()
+        self.store = ConversationStore()
+        self.memory = self.create_memory()
+        self.tools = self.create_tools()
+        self.attachments = []  # attached to the next message
+        self.comparison = None
+        self.create_chat_handler(self.config.backend)
+        
+        with self.timer.phase("tk init"):
+            self.window_handler = WindowHandler()
+        self.window_handler.restore_geometry(
+            self.config.window_position, self.config.chat_bubble_size, self.config.chat_bubble_position
+        )
+        
+        # Reopen the tabs of the last run (newest turns only), or the most recent session
+        latest = self.store.latest_session()
+        self.restore_tabs(self.config.open_sessions or [latest], self.config.active_session or latest)
+        if fast_start is None:
+            fast_start = self.config.fast_start
+        
+        if fast_start:
+            # Show the character right away; list and warm the model in the background
+            self.apply_config(self.config.model or None)
+            self.chat_handler.hold()
+            with self.timer.phase("window"):
+                self.window_handler.initialize()
+            self.window_handler.set_warming_up(True)
+            self.setup_callbacks()
+            threading.Thread(target=self.warm_up, daemon=True).start()
+            return
+        
         self.load_config()
         
         # Initialize handlers
-        self.ollama_handler.initialize()
-        self.window_handler.initialize()
+        with self.timer.phase("model load"):
+            self.chat_handler.initialize()
+        with self.timer.phase("window"):
+            self.window_handler.initialize()
         
         # Connect callbacks
         self.setup_callbacks()
+        self.report_timing()
+    
+    def create_chat_handler(self, backend: str):
+        """Create the chat backend and its model catalog (not yet loaded or connected to the window)"""
+        try:
+            self.chat_handler = create_backend(backend, **self.config.backends.get(backend, {}))
+        except ValueError as e:
+            print(e)
+            backend = DEFAULT_BACKEND
+            self.chat_handler = create_backend(backend)
+        self.backend = backend
+        self.chat_handler.metrics = self.metrics
+        self.chat_handler.attach_store(self.store, self.config.history_turns)
+        self.chat_handler.set_memory(self.memory)
+        self.chat_handler.set_tools(self.tools)
+        self.catalog = ModelCatalog(self.chat_handler.catalog_client)
+    
+    def create_memory(self):
+        """Retrieval memory over past sessions, if enabled (embeddings always come from Ollama)"""
+        if not self.config.memory:
+            return None
+        from LongTermMemory import LongTermMemory, ollama_embedder
+        model = self.config.memory_model
+        return LongTermMemory(self.store, ollama_embedder(model), model=model, top_k=self.config.memory_top_k)
+    
+    def create_tools(self):
+        """Local tools the model may call, if enabled"""
+        if not self.config.tools:
+            return None
+        tools = ToolRegistry(default_tools(self.config.tool_paths, self.config.tool_clipboard))
+        tools.set_timeouts(self.config.tool_timeouts)
+        return tools
+    
+    def warm_up(self, on_error=None):
+        """List models and load the selected one (runs in background)"""
+        on_error = on_error or self.fail
+        try:
+            with self.timer.phase("model list"):
+                available_models = self.catalog.refresh(details=False)
+        except Exception as e:
+            self.window_handler.root.after(0, lambda: on_error("Error", f"Failed to connect to {self.backend}: {e}"))
+            return
+        if not available_models:
+            self.window_handler.root.after(0, lambda: on_error("No Models Found", self.no_models_message()))
+            return
+        
+        self.apply_config(self.choose_model(available_models))
+        try:
+            with self.timer.phase("model load"):
+                self.chat_handler.initialize()
+        except Exception as e:
+            self.window_handler.root.after(0, lambda: on_error("Error", f"Failed to load {self.chat_handler.model}: {e}"))
+            return
+        self.window_handler.root.after(0, self.handle_ready)
+    
+    def no_models_message(self) -> str:
+        if self.backend.startswith("ollama"):
+            return NO_MODELS_MESSAGE
+        return f"The {self.backend} backend does not serve any models."
+    
+    def switch_backend(self, backend: str, fallback: str = None, tabs: tuple = None):
+        """Replace the chat backend and warm it up in the background (fallback is restored on failure).
+        
+        With tabs (from session_tabs) the new backend reopens those sessions instead of starting a new chat.
+        """
+        self.chat_handler.cleanup()
+        self.create_chat_handler(backend)
+        self.config.backend = self.backend
+        self.apply_config(None)
+        self.chat_handler.hold()
+        self.connect_chat_handler()
+        self.window_handler.set_warming_up(True)
+        if tabs is None:
+            self.handle_clear_chat()
+        else:
+            self.restore_tabs(*tabs)
+        self.refresh_tabs()
+        
+        def on_error(title: str, message: str):
+            messagebox.showerror(title, message)
+            if fallback:
+                self.switch_backend(fallback, tabs=tabs)
+        
+        threading.Thread(target=self.warm_up, args=(on_error,), daemon=True).start()
+    
+    def handle_ready(self):
+        """Model is loaded: leave the warming-up state and send queued messages"""
+        self.window_handler.set_warming_up(False)
+        self.window_handler.update_model_label(self.chat_handler.model)
+        self.chat_handler.release()
+        self.catalog.refresh_async()
+        self.report_timing()
+    
+    def fail(self, title: str, message: str):
+        """Show a fatal startup error and exit"""
+        messagebox.showerror(title, message)
+        self.handle_close_app()
+        sys.exit(1)
+    
+    def report_timing(self):
+        """Print the startup timing breakdown if requested"""
+        if self.show_timing:
+            print(self.timer.report())
         
     def setup_callbacks(self):
         """Setup callbacks between handlers"""
@@ -28,105 +186,524 @@ class DesktopCompanion():
         self.window_handler.set_clear_callback(self.handle_clear_chat)
         self.window_handler.set_close_callback(self.handle_close_app)
         self.window_handler.set_settings_callback(self.handle_settings_save)
-        
-        # Ollama -> Window (async response)
-        self.ollama_handler.set_response_callback(self.handle_response)
+        self.window_handler.set_cancel_callback(self.handle_cancel)
+        self.window_handler.set_history_callback(self.get_session_history)
+        self.window_handler.set_session_callbacks(self.list_sessions, self.handle_switch_session)
+        self.window_handler.set_attachment_callbacks(
+            self.handle_attach_files, self.handle_paste_text, self.handle_attachment_remove
+        )
+        self.window_handler.set_tab_callbacks(
+            self.handle_tab_select, self.handle_tab_new, self.handle_tab_close,
+            self.handle_tab_rename, self.handle_tab_system_prompt
+        )
+        self.window_handler.set_older_history_callback(self.get_older_history)
+        self.window_handler.set_metrics_callback(self.handle_metrics_open)
+        self.window_handler.set_compare_callbacks(
+            self.handle_compare_open, self.handle_compare_start, self.handle_compare_stop
+        )
+        self.window_handler.set_auto_tune_callback(self.handle_auto_tune)
+        self.window_handler.set_geometry_callback(self.save_config)
+        self.config_store.set_change_callback(self.handle_config_change)
+        self.config_store.watch()
         
         # Override settings handler in window
         self.window_handler.handle_settings = self.handle_settings_open
         
-        # Update model label
-        self.window_handler.update_model_label(self.ollama_handler.model)
+        self.connect_chat_handler()
+    
+    def connect_chat_handler(self):
+        """Route the chat backend's callbacks to the window"""
+        self.chat_handler.set_response_callback(self.handle_response)
+        self.chat_handler.set_chunk_callback(self.handle_chunk)
+        self.chat_handler.set_queue_callback(self.handle_queue_depth)
+        self.chat_handler.set_cache_callback(self.handle_cache_stats)
+        self.chat_handler.set_metrics_callback(self.handle_turn_metrics)
+        self.chat_handler.set_prefill_callback(self.handle_prefill_stats)
+        self.catalog.set_update_callback(self.handle_catalog_update)
+        self.chat_handler.residency.set_change_callback(self.catalog.invalidate)
+        
+        # Update model label and tabs
+        self.window_handler.update_model_label(self.chat_handler.model)
+        self.refresh_tabs()
     
     def handle_message(self, message: str):
-        """Handle message from window"""
-        self.ollama_handler.send_message(message)
+        """Handle message from window, with the files attached so far"""
+        attachments = [a for a in self.attachments if not a.error]
+        self.attachments = []
+        self.render_attachments()
+        self.chat_handler.send_message(message, attachments)
+    
+    def handle_attach_files(self, paths: list):
+        """Read (or downscale) attached files in the background"""
+        for path in paths:
+            try:
+                attachment = Attachment.from_path(path)
+            except OSError as e:
+                messagebox.showerror("Attach File", f"Cannot attach {path}: {e}")
+                continue
+            self.attachments.append(attachment.start(self.handle_attachment_ready))
+        self.render_attachments()
+    
+    def handle_paste_text(self, text: str):
+        """A large paste is attached instead of typed"""
+        self.attachments.append(Attachment.from_text(text).start(self.handle_attachment_ready))
+        self.render_attachments()
+    
+    def handle_attachment_ready(self, attachment: Attachment):
+        """An attachment was read (called from thread)"""
+        self.window_handler.root.after(0, self.render_attachments)
+    
+    def handle_attachment_remove(self, index: int):
+        if 0 <= index < len(self.attachments):
+            self.attachments.pop(index)
+        self.render_attachments()
+    
+    def render_attachments(self):
+        self.window_handler.show_attachments([(a.name, a.label, bool(a.error)) for a in self.attachments])
+    
+    def handle_typing_pause(self, draft: str):
+        """Warm the prompt cache with the history and the draft"""
+        self.chat_handler.prefill(draft)
+    
+    def handle_prefill_stats(self, stats: str):
+        """Handle prefill warm/cancelled counts (called from thread)"""
+        self.window_handler.root.after(0, lambda: self.window_handler.set_status("prefill", stats))
+    
+    def handle_chunk(self, chunk: str, tab: int):
+        """Handle streamed response chunk of a session tab (called from thread)"""
+        self.window_handler.append_stream_chunk(chunk, tab)
+    
+    def handle_response(self, response: str, tab: int):
+        """Handle response of a session tab (called from thread)"""
+        error = response.startswith(ERROR_PREFIX)
+        
+        def finish():
+            self.window_handler.finish_stream_message(response, error, tab)
+            self.refresh_tabs()  # a new session got its title
+        self.window_handler.root.after(0, finish)
+    
+    def handle_queue_depth(self, depth: int):
+        """Handle request queue changes (called from thread)"""
+        def update():
+            self.window_handler.update_queue_depth(depth)
+            self.refresh_tabs()
+        self.window_handler.root.after(0, update)
+    
+    def handle_cache_stats(self, stats: str):
+        """Handle response cache hit/miss update (called from thread)"""
+        self.window_handler.root.after(0, lambda: self.window_handler.set_status("cache", stats))
+    
+    def handle_turn_metrics(self, turn: TurnMetrics):
+        """Handle metrics of a finished turn (called from thread)"""
+        summary = turn.summary()
+        self.window_handler.root.after(0, lambda: self.window_handler.show_turn_metrics(summary))
+    
+    def handle_metrics_open(self):
+        """Open the rolling metrics view"""
+        self.window_handler.open_metrics(
+            self.metrics.summary_rows,
+            [label for label, _ in SUMMARY_COLUMNS],
+            self.metrics.export
+        )
     
-    def handle_response(self, response: str):
-        """Handle response from ollama (called from thread)"""
-        self.window_handler.root.after(0, lambda: self.window_handler.add_message("Companion", response))
+    def handle_compare_open(self):
+        """Open the compare window with the installed models (recently used ones checked)"""
+        if not self.chat_handler.model_comparison:
+            messagebox.showinfo("Compare Models", f"Comparing models needs an Ollama backend, not {self.backend}.")
+            return
+        models = [(info.name, info.label()) for info in self.catalog.entries()]
+        names = {name for name, _ in models}
+        recent = [model for model in self.chat_handler.residency.recent if model in names]
+        self.window_handler.open_compare(models, recent[:2] or [self.chat_handler.model], MAX_MODELS)
+    
+    def handle_compare_start(self, models: list, prompt: str, race: bool):
+        """Send prompt to models at once, as many at a time as can stay loaded"""
+        if self.comparison:
+            self.comparison.cancel()
+        residency = self.chat_handler.residency
+        sizes = {info.name: info.size for info in self.catalog.entries()}
+        capacity = resident_capacity(models, sizes, residency.memory_budget)
+        profiles = self.option_profiles()
+        messages = [
+            {"role": "system", "content": self.chat_handler.get_system_prompt()},
+            {"role": "user", "content": prompt},
+        ]
+        comparison = ModelComparison(
+            residency.client, models, messages,
+            options=lambda model: options_for(profiles, model),
+            keep_alive=residency.keep_alive,
+            capacity=capacity,
+            race=race,
+            backend=self.backend,
+            metrics=self.metrics
+        )
+        window = self.window_handler
+        
+        # A comparison replaced by a newer one must not write into the new columns
+        def chunk(run, text):
+            if self.comparison is comparison:
+                window.append_compare_chunk(run.model, text)
+        
+        def update(run):
+            summary, won = run.summary(), run.won
+            if self.comparison is comparison:
+                window.root.after(0, lambda: window.update_compare(run.model, summary, won))
+        
+        def done():
+            # Compared models may have pushed loaded models past the memory budget
+            residency.enforce_budget()
+            winner = comparison.winner
+            status = f"{winner.model} answered first" if winner else "Done"
+            if self.comparison is comparison:
+                window.root.after(0, lambda: window.set_compare_status(status))
+        
+        comparison.set_chunk_callback(chunk)
+        
+        comparison.set_update_callback(update)
+        comparison.set_done_callback(done)
+        self.comparison = comparison
+        window.start_compare(models, f"Running {capacity} at a time" if capacity < len(models) else "Running")
+        comparison.start()
+    
+    def handle_compare_stop(self):
+        if self.comparison:
+            self.comparison.cancel()
+    
+    def handle_cancel(self):
+        """Handle stop request"""
+        self.chat_handler.cancel_current()
+    
+    def get_session_history(self) -> list:
+        """Messages of the current session to show in the transcript"""
+        session_id = self.chat_handler.session_id
+        if session_id is None:
+            return []
+        return self.store.load_recent(session_id, 2 * self.chat_handler.recent_turns)
+    
+    def get_older_history(self, before_id: int, limit: int) -> list:
+        """Stored messages before before_id, for transcript paging"""
+        session_id = self.chat_handler.session_id
+        if session_id is None:
+            return []
+        return self.store.load_recent(session_id, limit, before_id)
+    
+    def list_sessions(self) -> list:
+        """(id, label, active) for the sessions menu"""
+        return [
+            (s["id"], s["name"], s["id"] == self.chat_handler.session_id)
+            for s in self.store.list_sessions(limit=15)
+        ]
+    
+    def handle_switch_session(self, session_id: int):
+        """Show a stored session (in its tab if it is open, else in the active tab)"""
+        self.chat_handler.open_session(session_id)
+        self.show_active_tab()
     
     def handle_clear_chat(self):
         """Handle clear chat request"""
-        self.ollama_handler.clear_history()
+        self.chat_handler.clear_history()
         self.window_handler.clear_chat_display()
         self.window_handler.add_welcome_message()
+        self.refresh_tabs()
+    
+    def session_tabs(self) -> tuple:
+        """(stored session ids of the open tabs, id of the active one)"""
+        ids = [s.session_id for s in self.chat_handler.sessions.values() if s.session_id is not None]
+        return ids, self.chat_handler.session_id
+    
+    def restore_tabs(self, session_ids: list, active: int = None):
+        """Open stored sessions as tabs; the others are swapped out until shown"""
+        session_ids = [i for i in session_ids if i is not None and self.store.get_session(i)]
+        self.chat_handler.open_session(session_ids[0] if session_ids else None)
+        for session_id in session_ids[1:]:
+            self.chat_handler.new_session(session_id)
+        if active in session_ids:
+            self.chat_handler.open_session(active)
+    
+    def refresh_tabs(self):
+        """Redraw the tab bar"""
+        handler = self.chat_handler
+        tabs = [(s.key, s.label, s.pending, s.system_prompt) for s in handler.sessions.values()]
+        self.window_handler.set_tabs(tabs, handler.session.key)
+    
+    def show_active_tab(self):
+        """Select the active session's tab and show its history"""
+        self.refresh_tabs()
+        self.window_handler.show_history(self.get_session_history())
+    
+    def handle_tab_select(self, key: int):
+        self.chat_handler.activate_session(key)
+        self.show_active_tab()
+    
+    def handle_tab_new(self):
+        self.chat_handler.new_session()
+        self.show_active_tab()
+    
+    def handle_tab_close(self, key: int):
+        self.chat_handler.close_session(key)
+        self.show_active_tab()
+    
+    def handle_tab_rename(self, key: int, title: str):
+        self.chat_handler.set_session_title(key, title)
+        self.refresh_tabs()
+    
+    def handle_tab_system_prompt(self, key: int, system_prompt: str):
+        self.chat_handler.set_system_prompt(key, system_prompt)
+        self.refresh_tabs()
     
     def handle_settings_open(self):
-        """Handle settings window opening"""
-        try:
-            available_models = self.ollama_handler.get_available_models()
-            self.window_handler.open_settings(
-                self.ollama_handler.model,
-                self.ollama_handler.name or "",
-                available_models
-            )
-        except Exception as e:
-            messagebox.showerror("Error", f"Could not load models: {e}")
+        """Open settings with the cached model list and refresh it in the background"""
+        refreshing = self.catalog.is_stale()
+        self.window_handler.open_settings(
+            self.chat_handler.model,
+            self.chat_handler.name or "",
+            *self.settings_models(refreshing),
+            backend_names(),
+            self.backend,
+            self.option_profiles()
+        )
+        if refreshing:
+            self.catalog.refresh_async()
+    
+    def settings_models(self, refreshing: bool = False) -> tuple:
+        """(name, label) pairs for the settings model menu and a status line"""
+        models = [(info.name, info.label()) for info in self.catalog.entries()]
+        if refreshing:
+            status = "Refreshing model list…"
+        elif self.catalog.error:
+            status = f"Could not load models: {self.catalog.error}"
+        else:
+            status = "● = loaded in memory"
+        return models, status
+    
+    def handle_catalog_update(self):
+        """Model catalog changed (called from thread)"""
+        self.window_handler.root.after(0, lambda: self.window_handler.update_settings_models(*self.settings_models()))
     
-    def handle_settings_save(self, model: str, name: str):
+    def handle_settings_save(self, model: str, name: str, backend: str = None, options: dict = None):
         """Handle settings save"""
-        self.ollama_handler.set_model(model)
-        self.ollama_handler.set_name(name)
+        if options is not None and not self.set_option_profile(model, options):
+            return
+        if backend and backend != self.backend:
+            # The model list belongs to the old backend; the new one picks its saved or first model
+            self.config.name = name
+            self.switch_backend(backend, fallback=self.backend)
+            self.save_config()
+            return
+        # Only a model switch starts a new conversation (or picks up that model's snapshot)
+        if model != self.chat_handler.model:
+            self.chat_handler.set_model(model)
+            self.show_active_tab()
+        if name != self.chat_handler.name:
+            self.chat_handler.set_name(name)
         self.save_config()
-        self.handle_clear_chat()
         self.window_handler.update_model_label(model)
     
+    def option_profiles(self) -> dict:
+        """model -> options without unset values"""
+        return {model: profile.model_dump(exclude_none=True) for model, profile in self.config.model_options.items()}
+    
+    def set_option_profile(self, model: str, options: dict) -> bool:
+        """Store a model's options from settings (options the window doesn't show are kept)"""
+        kept = {k: v for k, v in self.option_profiles().get(model, {}).items() if k not in OPTION_NAMES}
+        try:
+            profile = OptionProfile.model_validate({**kept, **options})
+        except ValidationError as e:
+            messagebox.showerror("Settings", f"Invalid options for {model}:\n{e}")
+            return False
+        profiles = dict(self.config.model_options)
+        if profile.model_dump(exclude_none=True):
+            profiles[model] = profile
+        else:
+            profiles.pop(model, None)
+        self.config.model_options = profiles
+        self.chat_handler.set_option_profiles(self.option_profiles())
+        return True
+    
+    def handle_auto_tune(self, model: str):
+        """Sweep num_thread and num_batch for model in the background and save the fastest"""
+        if not self.backend.startswith("ollama"):
+            self.window_handler.set_settings_status(f"Auto-tune needs an Ollama backend, not {self.backend}")
+            return
+        root = self.window_handler.root
+        
+        def progress(text: str):
+            root.after(0, lambda: self.window_handler.set_settings_status(text))
+        
+        def tune():
+            try:
+                best = auto_tune(self.chat_handler.residency.client, model,
+                                 options_for(self.option_profiles(), model),
+                                 self.chat_handler.residency.keep_alive, progress)
+            except Exception as e:
+                progress(f"Auto-tune failed: {e}")
+                return
+            root.after(0, lambda: self.finish_auto_tune(model, best))
+        
+        progress(f"Auto-tuning {model}…")
+        threading.Thread(target=tune, daemon=True).start()
+    
+    def finish_auto_tune(self, model: str, best: dict):
+        """Save the fastest num_thread/num_batch found for model"""
+        options = {**self.option_profiles().get(model, {}), **best}
+        if not self.set_option_profile(model, options):
+            return
+        self.save_config()
+        if model == self.chat_handler.model:
+            # Reload now with the new options instead of on the next message
+            self.chat_handler.residency.activate(model)
+        self.window_handler.update_settings_options(model, options)
+        self.window_handler.set_settings_status(
+            "Fastest: " + ", ".join(f"{name}={value}" for name, value in best.items())
+        )
+    
     def handle_close_app(self):
         """Handle app close"""
-        self.ollama_handler.cleanup()
+        self.save_config()
+        self.config_store.close()
+        if self.comparison:
+            self.comparison.cancel()
+        self.chat_handler.cleanup()
+        if self.tools:
+            self.tools.shutdown()
+        self.store.close()
         self.window_handler.cleanup()
     
     def load_config(self):
         """Load configuration"""
         try:
-            available_models = self.ollama_handler.get_available_models()
+            with self.timer.phase("model list"):
+                available_models = self.catalog.refresh(details=False)
             if not available_models:
-                messagebox.showerror(
-                    "No Models Found",
-                    "No Ollama models are installed. Please install at least one model using:\n\n"
-                    "ollama pull <model_name>\n\n"
-                    "For example: ollama pull llama3.2:3b"
-                )
+                messagebox.showerror("No Models Found", self.no_models_message())
                 sys.exit(1)
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to connect to Ollama: {e}")
+            messagebox.showerror("Error", f"Failed to connect to {self.backend}: {e}")
             sys.exit(1)
         
-        try:
-            with open(CONFIG_FILE, "r") as f:
-                config = json.load(f)
-                saved_model = config.get("model", "")
-                
-                if saved_model in available_models:
-                    model = saved_model
-                else:
-                    model = available_models[0]
-                
-                name = config.get("name", None)
-        except FileNotFoundError:
-            model = available_models[0]
-            name = None
-        
-        self.ollama_handler.model = model
-        self.ollama_handler.name = name
+        self.apply_config(self.choose_model(available_models))
+    
+    def choose_model(self, available_models: list) -> str:
+        """Saved model if still installed, otherwise the first one"""
+        saved_model = self.config.model
+        if saved_model in available_models:
+            return saved_model
+        return available_models[0]
+    
+    def apply_config(self, model: str):
+        """Apply loaded configuration to the handlers"""
+        self.chat_handler.model = model
+        self.chat_handler.name = self.config.name
+        self.apply_handler_config()
+        self.apply_window_config()
+    
+    def apply_handler_config(self):
+        """Apply settings that can change while the app runs (no model or backend switch)"""
+        config = self.config
+        self.chat_handler.set_option_profiles(self.option_profiles())
+        self.chat_handler.recent_turns = config.history_turns
+        self.chat_handler.model_snapshots = config.model_snapshots
+        self.chat_handler.set_workers(config.workers)
+        self.chat_handler.set_context_budget(config.context_budget, config.pinned_turns)
+        self.chat_handler.metrics.log_path = config.metrics_log or None
+        residency = self.chat_handler.residency
+        residency.idle_timeout = config.idle_timeout
+        residency.memory_budget = config.memory_budget_mb * 1024 * 1024 if config.memory_budget_mb else None
+        residency.prewarm_enabled = config.prewarm
+        residency.recent = config.recent_models or residency.recent
+        cache = self.chat_handler.response_cache
+        if config.response_cache and not cache:
+            self.chat_handler.set_response_cache(ResponseCache(
+                max_entries=config.response_cache_size,
+                ttl=config.response_cache_ttl
+            ))
+        elif not config.response_cache and cache:
+            cache.save()
+            self.chat_handler.set_response_cache(None)
+    
+    def apply_window_config(self):
+        """Apply window settings"""
+        window = self.window_handler
+        window.transcript_max_lines = self.config.transcript_max_lines
+        if self.config.speculative_prefill:
+            window.set_typing_callback(self.handle_typing_pause, self.config.prefill_pause_ms)
+        else:
+            window.set_typing_callback(None)
+    
+    def handle_config_change(self, config: AppConfig):
+        """config.json was edited outside the app (called from thread)"""
+        self.window_handler.root.after(0, lambda: self.reload_config(config))
+    
+    def reload_config(self, config: AppConfig):
+        """Apply an edited config in place, keeping the conversation"""
+        previous, self.config = self.config, config
+        session_id = self.chat_handler.session_id
+        if config.backend != self.backend or config.backends.get(self.backend) != previous.backends.get(self.backend):
+            # The new backend continues the open sessions
+            self.switch_backend(config.backend, fallback=self.backend, tabs=self.session_tabs())
+            return
+        if config.memory != previous.memory or config.memory_model != previous.memory_model:
+            self.memory = self.create_memory()
+            self.chat_handler.set_memory(self.memory)
+        elif self.memory:
+            self.memory.top_k = config.memory_top_k
+        if any(getattr(config, key) != getattr(previous, key) for key in ("tools", "tool_paths", "tool_clipboard")):
+            if self.tools:
+                self.tools.shutdown()
+            self.tools = self.create_tools()
+            self.chat_handler.set_tools(self.tools)
+        elif self.tools:
+            self.tools.set_timeouts(config.tool_timeouts)
+        if config.name != self.chat_handler.name:
+            self.chat_handler.set_name(config.name)
+        if config.model and config.model != self.chat_handler.model and config.model in self.catalog.names():
+            self.chat_handler.set_model(config.model)
+            if self.chat_handler.session_id is None:
+                # No snapshot of that model: keep going with the current session
+                self.chat_handler.open_session(session_id)
+            self.window_handler.update_model_label(config.model)
+        self.apply_handler_config()
+        self.apply_window_config()
     
     def save_config(self):
-        """Save configuration"""
-        config = {
-            "model": self.ollama_handler.model,
-            "name": self.ollama_handler.name
-        }
-        with open(CONFIG_FILE, "w") as f:
-            json.dump(config, f, indent=4)
+        """Save configuration in the background (keys not managed here, like "backends", are kept)"""
+        config = self.config
+        config.backend = self.backend
+        config.model = self.chat_handler.model or config.model
+        config.name = self.chat_handler.name
+        config.workers = self.chat_handler.dispatcher.workers
+        config.context_budget = self.chat_handler.context.budget
+        config.pinned_turns = self.chat_handler.context.pinned_turns
+        config.history_turns = self.chat_handler.recent_turns
+        config.transcript_max_lines = self.window_handler.transcript_max_lines
+        config.window_position = self.window_handler.position
+        config.chat_bubble_size = (self.window_handler.chat_bubble_width, self.window_handler.chat_bubble_height)
+        config.chat_bubble_position = self.window_handler.chat_bubble_position
+        config.metrics_log = self.chat_handler.metrics.log_path
+        config.idle_timeout = self.chat_handler.residency.idle_timeout
+        config.prewarm = self.chat_handler.residency.prewarm_enabled
+        config.recent_models = self.chat_handler.residency.recent
+        config.open_sessions, config.active_session = self.session_tabs()
+        self.config_store.save(config)
     
     def run(self):
         """Run the application"""
         self.window_handler.run()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Jay - AI companion desktop GUI")
+    parser.add_argument("--no-fast-start", action="store_true", help="load the model before showing the window")
+    parser.add_argument("--timing", action="store_true", help="print a startup timing breakdown")
+    args = parser.parse_args()
+    
+    timer = StartupTimer(_STARTED)
+    timer.record("imports", time.perf_counter() - _STARTED)
     try:
-        app = DesktopCompanion()
+        app = DesktopCompanion(
+            fast_start=False if args.no_fast_start else None,
+            timer=timer,
+            show_timing=args.timing
+        )
         app.run()
     except Exception as e:
         print(f"Error starting application: {e}")